@@ -1,22 +1,88 @@
+from django.conf import settings
 from django.contrib import (
     admin,
     messages,
 )
-from django.db.models import QuerySet
+from django.contrib.admin.views.main import (
+    IGNORED_PARAMS,
+    PAGE_VAR,
+    SEARCH_VAR,
+)
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import (
+    F,
+    QuerySet,
+)
 from django.urls import reverse
 from django.utils.html import format_html
 
 from unfold.admin import ModelAdmin  # Замена from django.contrib import admin.ModelAdmin
+from unfold.admin import TabularInline
 
 from core.apps.retail.models import (
     Contact,
+    DebtJob,
+    DebtJobChunk,
     Product,
     Supplier,
 )
 
+from .caching import (
+    bump_data_versions,
+    CONTACTS,
+    get_data_versions,
+    SUPPLIERS,
+)
+from .choices import DebtTransactionChoices
+from .counting import (
+    count_exceeds,
+    EstimatedCountPaginator,
+)
+from .debt import (
+    change_debt,
+    clear_debt,
+    record_debt_change,
+)
+from .jobs import (
+    selection_spec,
+    start_clear_job,
+)
 from .tasks import async_clear_data
 
 
+# Changelist params that do not change the selection, the search does
+SELECTION_IGNORED_PARAMS = {*IGNORED_PARAMS, PAGE_VAR} - {SEARCH_VAR}
+
+
+def contact_cities() -> list[str]:
+    """Distinct contact cities, cached until a contact changes."""
+
+    key = f"retail:admin:contact-cities:{get_data_versions([CONTACTS])[CONTACTS]}"
+    cities = cache.get(key)
+    if cities is None:
+        cities = list(
+            Contact.objects.order_by("city").values_list("city", flat=True).distinct()
+        )
+        cache.set(key, cities, settings.RETAIL_ADMIN_FILTER_TIMEOUT)
+    return cities
+
+
+class ContactCityFilter(admin.SimpleListFilter):
+    """`contact__city` filter with cached choices instead of a DISTINCT scan per page."""
+
+    title = "Город"
+    parameter_name = "contact__city"
+
+    def lookups(self, request, model_admin):
+        return [(city, city) for city in contact_cities()]
+
+    def queryset(self, request, queryset: QuerySet):
+        if self.value():
+            return queryset.filter(contact__city=self.value())
+        return queryset
+
+
 @admin.register(Supplier)
 class NetworkNodeAdmin(ModelAdmin):
     """
@@ -30,21 +96,32 @@ class NetworkNodeAdmin(ModelAdmin):
     - `created`
     Filters:
     - `type_supplier`
-    - `contact__city`
+    - `contact__city` (cached choices)
     Actions:
     - `clear_debt`
+    The parent title is annotated, the parent is chosen by autocomplete
+    and big lists show the estimated count, see counting.py.
     """
 
     list_display = ("pk", "title", "debt", "type_supplier", "supplier_link", "created")
-    list_filter = ("type_supplier", "contact__city")
+    list_filter = ("type_supplier", ContactCityFilter)
+    search_fields = ("title",)
+    autocomplete_fields = ("supplier",)
     actions = ("clear_debt",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        return (
+            super().get_queryset(request).annotate(supplier_title=F("supplier__title"))
+        )
 
     def supplier_link(self, obj: Supplier):
         """Displays link associated supplier in the adminka"""
 
-        if obj.supplier:
-            url = reverse("admin:retail_supplier_change", args=[obj.supplier.id])
-            return format_html("<a href='{}'>{}</a>", url, obj.supplier.title)
+        if obj.supplier_id:
+            url = reverse("admin:retail_supplier_change", args=[obj.supplier_id])
+            return format_html("<a href='{}'>{}</a>", url, obj.supplier_title)
         return "-"
 
     supplier_link.short_description = "Поставщик"
@@ -54,19 +131,36 @@ class NetworkNodeAdmin(ModelAdmin):
         """
         Action to clear debts from selected suppliers.
         Features:
-        - For more than 20 suppliers, launches an async task
+        - For more than 20 suppliers, creates a `DebtJob` with the selection
+          spec and launches an async task, progress is shown in the job
         - For smaller quantities, updates the debt sync
         """
 
-        if queryset.count() > 20:
-            # Async process for more 20 objects
-            supplier_ids = list(queryset.values_list("id", flat=True))
-            async_clear_data.delay(supplier_ids)
+        if count_exceeds(queryset, 20):
+            # Async process for more 20 objects, the task gets only the job id
+            filter_params = None
+            if request.POST.get("select_across") == "1":
+                filter_params = {
+                    param: values
+                    for param, values in request.GET.lists()
+                    if param not in SELECTION_IGNORED_PARAMS
+                }
+            job = start_clear_job(
+                selection_spec(queryset, filter_params), author=request.user
+            )
+            async_clear_data.delay(job.pk)
+            url = reverse("admin:retail_debtjob_change", args=[job.pk])
             self.message_user(
-                request, "Задолженность будет очищена для выбранных поставщиков"
+                request,
+                format_html(
+                    "Задолженность будет очищена для выбранных поставщиков, "
+                    "<a href='{}'>ход выполнения</a>",
+                    url,
+                ),
             )
         else:
-            updated = queryset.update(debt=0.00)
+            updated = clear_debt(queryset)["entries"]
+            bump_data_versions(SUPPLIERS)
             supplier = "поставщика" if updated == 1 else "поставщиков"
             self.message_user(
                 request,
@@ -74,14 +168,46 @@ class NetworkNodeAdmin(ModelAdmin):
                 level=messages.SUCCESS,
             )
 
+    def save_model(self, request, obj: Supplier, form, change):
+        """
+        Manual debt changes are written to the debt ledger.
+        An edit applies the difference to the debt shown in the form
+        to the current debt under a row lock and saves other fields only,
+        so a debt job running meanwhile is kept.
+        """
+
+        if not change:
+            with transaction.atomic():
+                super().save_model(request, obj, form, change)
+                record_debt_change(obj, DebtTransactionChoices.OPENING, obj.debt)
+            return
+
+        shown = form.fields["debt"].to_python(
+            form.data.get(form.add_initial_prefix("debt"))
+        )
+        amount = obj.debt - (form.initial["debt"] if shown is None else shown)
+        fields = [
+            field.name
+            for field in obj._meta.concrete_fields
+            if field.name in form.fields and field.name != "debt"
+        ]
+        with transaction.atomic():
+            obj.save(update_fields=[*fields, "updated"])
+            if amount:
+                obj.debt = change_debt(
+                    obj.pk, DebtTransactionChoices.ADJUSTMENT, amount
+                )
+
     def get_form(self, request, obj=None, **kwargs):
         """
         Config edit form.
         - Allows the creation of new contacts
         - Prohibits changing existing contacts
         - Hides the ability to view contacts
+        - Posts the shown debt, edits are applied as a difference
         """
         form = super().get_form(request, obj, **kwargs)
+        form.base_fields["debt"].show_hidden_initial = True
         form.base_fields["contact"].widget.can_add_related = True  # Разрешить создание
         form.base_fields["contact"].widget.can_change_related = (
             False  # Запретить изменение
@@ -90,6 +216,83 @@ class NetworkNodeAdmin(ModelAdmin):
         return form
 
 
+class DebtJobChunkInline(TabularInline):
+    """Chunks of a debt job with the worker and timing, read only."""
+
+    model = DebtJobChunk
+    fields = (
+        "shard",
+        "first_id",
+        "last_id",
+        "rows",
+        "entries",
+        "worker",
+        "started",
+        "finished",
+    )
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(DebtJob)
+class DebtJobAdmin(ModelAdmin):
+    """
+    Admin interface for background debt jobs, read only.
+    Displays:
+    - `pk`
+    - `kind`
+    - `status`
+    - `progress`
+    - `processed` / `total`
+    - `changed`
+    - `updated`
+    """
+
+    list_display = (
+        "pk",
+        "kind",
+        "status",
+        "progress_display",
+        "processed",
+        "total",
+        "changed",
+        "updated",
+    )
+    list_filter = ("status",)
+    inlines = (DebtJobChunkInline,)
+    readonly_fields = (
+        "kind",
+        "spec",
+        "status",
+        "progress_display",
+        "shards",
+        "total",
+        "processed",
+        "changed",
+        "low",
+        "high",
+        "error",
+        "author",
+        "created",
+        "updated",
+    )
+
+    def progress_display(self, obj: DebtJob):
+        return f"{obj.progress}%"
+
+    progress_display.short_description = "Прогресс"
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(Product)
 class ProductAdmin(ModelAdmin):
     """
@@ -101,6 +304,8 @@ class ProductAdmin(ModelAdmin):
     """
 
     list_display = ("name", "model", "date_product_release")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(Contact)
@@ -122,6 +327,8 @@ class ContactAdmin(ModelAdmin):
         "house_number",
         "get_email_with_copy",
     )
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     def get_email_with_copy(self, obj):
         """Generates  HTML view of an email, with copy button."""
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class ProductsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "core.apps.retail"
+
+    def ready(self):
+        from . import (  # noqa: F401
+            signals,
+            telemetry,
+        )
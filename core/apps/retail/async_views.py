@@ -0,0 +1,182 @@
+from django.db.models import aprefetch_related_objects
+from django.http import HttpResponse
+from django.utils.translation import gettext_lazy as _
+from django.views import View
+from rest_framework import (
+    exceptions,
+    status,
+)
+from rest_framework.authentication import (
+    get_authorization_header,
+    TokenAuthentication,
+)
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from .models import (
+    Product,
+    Supplier,
+)
+from .pagination import (
+    ProductCursorPagination,
+    SupplierCursorPagination,
+)
+from .serializers import (
+    DebtStatisticsSerializer,
+    FastProductSerializer,
+    FastSupplierSerializer,
+)
+from .statistics import aget_debt_statistics
+from .visibility import afilter_visible
+
+
+# Async twins of read endpoints in views.py, for the ASGI deployment.
+# DRF views are sync, under ASGI every request takes a thread of the
+# sync-to-async pool. These views await the async ORM and the cache instead;
+# responses are the same as in the DRF views.
+
+
+async def aauthenticate(request):
+    """`TokenAuthentication` with the async ORM, returns the active user."""
+
+    authentication = TokenAuthentication()
+    auth = get_authorization_header(request).split()
+    if not auth or auth[0].lower() != authentication.keyword.lower().encode():
+        raise exceptions.NotAuthenticated()
+    if len(auth) != 2:
+        raise exceptions.AuthenticationFailed(_("Invalid token header."))
+
+    try:
+        token = await (
+            authentication.get_model()
+            .objects.select_related("user")
+            .aget(key=auth[1].decode())
+        )
+    except (UnicodeError, authentication.get_model().DoesNotExist):
+        raise exceptions.AuthenticationFailed(_("Invalid token."))
+    if not token.user.is_active:
+        raise exceptions.AuthenticationFailed(_("User inactive or deleted."))
+    return token.user
+
+
+class AsyncListView(View):
+    """
+    Async paginated list, only authenticated users.
+    Page is fetched with the async ORM, related rows of
+    `prefetch` are loaded by `aprefetch_related_objects`.
+    """
+
+    http_method_names = ["get", "options"]
+    serializer_class = None
+    pagination_class = None
+    prefetch = ()
+
+    @staticmethod
+    def render(data, status_code=status.HTTP_200_OK) -> HttpResponse:
+        return HttpResponse(
+            JSONRenderer().render(data),
+            status=status_code,
+            content_type="application/json",
+        )
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            request.user = await aauthenticate(request)
+            return await super().dispatch(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            response = self.render({"detail": exc.detail}, exc.status_code)
+            if isinstance(
+                exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)
+            ):
+                response["WWW-Authenticate"] = TokenAuthentication.keyword
+            return response
+
+    async def get_queryset(self):
+        raise NotImplementedError
+
+    async def get(self, request, *args, **kwargs):
+        # DRF request only for query params and pagination links,
+        # the user is already authenticated
+        self.request = Request(request, authenticators=())
+        self.request.user = request.user
+        paginator = self.pagination_class()
+        page = await paginator.apaginate_queryset(
+            await self.get_queryset(), self.request, view=self
+        )
+        if self.prefetch:
+            await aprefetch_related_objects(page, *self.prefetch)
+        data = self.serializer_class(page, many=True).data
+        return self.render(self.get_response_data(paginator, data))
+
+    def get_response_data(self, paginator, data) -> dict:
+        return paginator.get_paginated_response(data).data
+
+
+class AsyncSupplierListView(AsyncListView):
+    """Async `SupplierViewSet.list`, suppliers of the user by `country`."""
+
+    serializer_class = FastSupplierSerializer
+    pagination_class = SupplierCursorPagination
+    prefetch = ("employees", "products")
+
+    async def get_queryset(self):
+        country = self.request.query_params.get("country")
+        if not country:
+            return Supplier.objects.none()
+        return await afilter_visible(
+            Supplier.objects.select_related("contact").filter(
+                contact__country__iexact=country
+            ),
+            self.request.user,
+        )
+
+
+class AsyncSupplierByProductListView(AsyncListView):
+    """Async `SupplierByProductViewSet.list`, suppliers of the user by `product_id`."""
+
+    serializer_class = FastSupplierSerializer
+    pagination_class = SupplierCursorPagination
+    prefetch = ("employees", "products")
+
+    async def get_queryset(self):
+        try:
+            product_id = int(self.request.query_params.get("product_id"))
+        except (TypeError, ValueError):
+            return Supplier.objects.none()
+        return await afilter_visible(
+            Supplier.objects.filter(products__id=product_id).select_related("contact"),
+            self.request.user,
+        )
+
+
+class AsyncDebtAboveAverageListView(AsyncListView):
+    """Async `DebtAboveAverageListView`."""
+
+    serializer_class = FastSupplierSerializer
+    pagination_class = SupplierCursorPagination
+    prefetch = ("employees", "products")
+
+    async def get_queryset(self):
+        self.statistics = await aget_debt_statistics()
+        return await afilter_visible(
+            Supplier.objects.select_related("contact").filter(
+                debt__gt=self.statistics["average"]
+            ),
+            self.request.user,
+        )
+
+    def get_response_data(self, paginator, data) -> dict:
+        return {
+            "statistics": DebtStatisticsSerializer(self.statistics).data,
+            **super().get_response_data(paginator, data),
+        }
+
+
+class AsyncProductListView(AsyncListView):
+    """Async `ProductViewSet.list`."""
+
+    serializer_class = FastProductSerializer
+    pagination_class = ProductCursorPagination
+
+    async def get_queryset(self):
+        return Product.objects.all()
@@ -0,0 +1,405 @@
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from .caching import (
+    bump_data_versions,
+    CONTACTS,
+    SUPPLIERS,
+)
+from .choices import SupplierChoices
+from .models import (
+    Contact,
+    Product,
+    Supplier,
+    SupplierEvent,
+)
+from .qr import forget_supplier_qr_digests
+from .statistics import (
+    add_debt_deltas,
+    debt_deltas,
+    supplier_debt_deltas,
+)
+from .visibility import (
+    invalidate_visibility,
+    visible_supplier_ids,
+)
+
+
+User = get_user_model()
+
+CONTACT_FIELDS = ("email", "country", "city", "street", "house_number")
+
+# Bulk write of suppliers (see SupplierBulkSerializer):
+# - items without `id` are created, items with `id` update a supplier of the user
+# - new items refer to each other with `ref` / `supplier_ref`, forward too
+# - validation runs for the whole batch with a fixed number of queries,
+#   errors are aligned with items
+# - bulk_create and bulk_update skip signals, so path, level and
+#   caches are maintained here
+
+
+def _add_error(errors: list[dict], index: int, field: str, message: str) -> None:
+    errors[index].setdefault(field, []).append(message)
+
+
+def _check_refs(items: list[dict], errors: list[dict]) -> None:
+    refs = {}
+    for index, item in enumerate(items):
+        if "ref" not in item:
+            continue
+        if item["ref"] in refs:
+            _add_error(errors, index, "ref", "Ссылка повторяется в пакете.")
+        refs[item["ref"]] = index
+
+    for index, item in enumerate(items):
+        if "supplier_ref" in item and item["supplier_ref"] not in refs:
+            _add_error(errors, index, "supplier_ref", "Ссылка не найдена в пакете.")
+
+    # only new items have refs, so a cycle can only be made of refs
+    for index in range(len(items)):
+        seen, current = set(), index
+        while current is not None and current not in seen:
+            seen.add(current)
+            current = refs.get(items[current].get("supplier_ref"))
+        if current == index:
+            _add_error(
+                errors, index, "supplier_ref", "Циклическая ссылка на поставщика."
+            )
+
+
+def _check_moves(items: list[dict], parents: dict[int, str], errors: list[dict]):
+    """
+    Updated suppliers moved to another parent must not end up in their subtree.
+    The final ancestor chain is walked over current paths, jumping to the new
+    parent at every supplier moved in the batch.
+    """
+
+    moves = {
+        item["id"]: item["supplier"]
+        for item in items
+        if "id" in item and "supplier" in item
+    }
+    for index, item in enumerate(items):
+        if item.get("id") not in moves:
+            continue
+        seen, current = set(), moves[item["id"]]
+        while current is not None and current in parents and current not in seen:
+            seen.add(current)
+            chain = [int(pk) for pk in parents[current].split("/")[:-1]]
+            current = None
+            for pk in reversed(chain):
+                if pk == item["id"]:
+                    _add_error(
+                        errors,
+                        index,
+                        "supplier",
+                        "Поставщик не может быть своим потомком!",
+                    )
+                    break
+                if pk in moves:
+                    current = moves[pk]
+                    break
+
+
+def _check_depth(items: list[dict], parents: dict[int, str], errors: list[dict]):
+    """
+    Paths must fit the index, so the hierarchy has at most
+    `RETAIL_SUPPLIER_MAX_LEVEL` levels. New suppliers are measured along
+    their refs, moved suppliers with their subtree, one query per move.
+    """
+
+    refs = {item["ref"]: index for index, item in enumerate(items) if "ref" in item}
+    for index, item in enumerate(items):
+        if "instance" in item:
+            instance = item["instance"]
+            parent = item.get("supplier", instance.supplier_id)
+            if parent == instance.supplier_id or parent not in parents:
+                continue
+            level = parents[parent].count("/") + instance.subtree_depth()
+        elif "id" not in item:
+            # cycles of refs are reported by _check_refs
+            level, current, seen = 0, index, {index}
+            while (parent := refs.get(items[current].get("supplier_ref"))) is not None:
+                if parent in seen:
+                    break
+                current = parent
+                seen.add(current)
+                level += 1
+            level += parents.get(items[current].get("supplier"), "").count("/")
+        else:
+            continue
+        if level > settings.RETAIL_SUPPLIER_MAX_LEVEL:
+            _add_error(
+                errors,
+                index,
+                "supplier",
+                "Иерархия не может быть глубже "
+                f"{settings.RETAIL_SUPPLIER_MAX_LEVEL} уровней.",
+            )
+
+
+def _check_contacts(items: list[dict], errors: list[dict]) -> None:
+    emails = Counter(
+        item["contact"]["email"].lower()
+        for item in items
+        if "email" in item.get("contact", {})
+    )
+    taken = {
+        email.lower(): pk
+        for pk, email in Contact.objects.filter(email__in=list(emails)).values_list(
+            "id", "email"
+        )
+    }
+    for index, item in enumerate(items):
+        email = item.get("contact", {}).get("email", "").lower()
+        if not email:
+            continue
+        if emails[email] > 1:
+            _add_error(errors, index, "contact", "Email повторяется в пакете.")
+        own = item["instance"].contact_id if "instance" in item else None
+        if taken.get(email, own) != own:
+            _add_error(
+                errors, index, "contact", "Контакт с таким email уже существует."
+            )
+
+
+def _check_exists(items: list[dict], errors: list[dict]) -> None:
+    lookups = (
+        ("product_ids", Product, lambda item: item["product_ids"]),
+        ("employee_ids", User, lambda item: item["employee_ids"]),
+    )
+    for field, model, get_ids in lookups:
+        wanted = {pk for item in items for pk in get_ids(item)}
+        found = set(model.objects.filter(pk__in=wanted).values_list("pk", flat=True))
+        for index, item in enumerate(items):
+            missing = sorted(set(get_ids(item)) - found)
+            if missing:
+                _add_error(errors, index, field, f"Объекты не найдены: {missing}.")
+
+
+def check_hierarchy(
+    items: list[dict], user, errors: list[dict], visible: set[int] | None = None
+) -> None:
+    """
+    Parent rules shared by bulk items and single writes (`SupplierSerializer`):
+    the new parent exists and is visible to the user, a factory has no parent,
+    no cycles and at most `RETAIL_SUPPLIER_MAX_LEVEL` levels.
+    Updated items carry their supplier as `instance`, parents are ids.
+    """
+
+    if visible is None:
+        visible = visible_supplier_ids(user)
+    parents = dict(
+        Supplier.objects.filter(
+            pk__in={item["supplier"] for item in items if item.get("supplier")}
+        ).values_list("id", "path")
+    )
+    for index, item in enumerate(items):
+        # a new parent must be visible, or nodes land in other trees
+        current = item["instance"].supplier_id if "instance" in item else None
+        parent = item.get("supplier")
+        if parent and (
+            parent not in parents or (parent != current and parent not in visible)
+        ):
+            _add_error(errors, index, "supplier", "Поставщик не найден.")
+        type_supplier = item.get("type_supplier")
+        has_parent = bool(item.get("supplier")) or "supplier_ref" in item
+        if "instance" in item:
+            type_supplier = item.get("type_supplier", item["instance"].type_supplier)
+            has_parent = item.get("supplier", item["instance"].supplier_id) is not None
+        if type_supplier == SupplierChoices.FACTORY and has_parent:
+            _add_error(errors, index, "supplier", "Завод не может иметь поставщика!")
+
+    _check_refs(items, errors)
+    _check_moves(items, parents, errors)
+    _check_depth(items, parents, errors)
+
+
+def validate_batch(items: list[dict], user) -> list[dict]:
+    """
+    Cross-item validation of a bulk write.
+    Attaches loaded suppliers to updated items as `instance`.
+    Returns errors aligned with items, empty dicts for valid items.
+    """
+
+    errors = [{} for _ in items]
+
+    visible = visible_supplier_ids(user)
+    instances = Supplier.objects.select_related("contact").in_bulk(
+        [item["id"] for item in items if "id" in item]
+    )
+    updated = Counter(item["id"] for item in items if "id" in item)
+    for index, item in enumerate(items):
+        if "id" not in item:
+            continue
+        if item["id"] not in visible or item["id"] not in instances:
+            _add_error(errors, index, "id", "Поставщик не найден.")
+        elif updated[item["id"]] > 1:
+            _add_error(errors, index, "id", "Поставщик повторяется в пакете.")
+        else:
+            item["instance"] = instances[item["id"]]
+
+    check_hierarchy(items, user, errors, visible)
+    _check_contacts(items, errors)
+    _check_exists(items, errors)
+    return errors
+
+
+def _update_suppliers(items: list[dict]) -> list[Supplier]:
+    now = timezone.now()
+    suppliers, contacts, moved = [], [], []
+    for item in items:
+        supplier = item["instance"]
+        for name in ("title", "type_supplier"):
+            if name in item:
+                setattr(supplier, name, item[name])
+        supplier.updated = now
+        suppliers.append(supplier)
+        if "contact" in item:
+            for name, value in item["contact"].items():
+                setattr(supplier.contact, name, value)
+            contacts.append(supplier.contact)
+        if "supplier" in item and item["supplier"] != supplier.supplier_id:
+            moved.append((supplier, item["supplier"]))
+
+    Contact.objects.bulk_update(contacts, CONTACT_FIELDS)
+    Supplier.objects.bulk_update(suppliers, ["title", "type_supplier", "updated"])
+
+    # Moves first detach every moved supplier, then attach it to the new
+    # parent: intermediate trees stay acyclic in any order.
+    # Paths are re-read, previous moves may have re-leveled them.
+    for parent_ids in ([None] * len(moved), [parent for _, parent in moved]):
+        for (supplier, _), parent_id in zip(moved, parent_ids):
+            supplier.path, supplier.level = Supplier.objects.values_list(
+                "path", "level"
+            ).get(pk=supplier.pk)
+            supplier.supplier_id = parent_id
+            supplier.sync_path()
+    Supplier.objects.bulk_update([supplier for supplier, _ in moved], ["supplier"])
+    if moved:
+        # subtrees of moved suppliers were re-leveled in the database
+        paths = {
+            pk: (path, level)
+            for pk, path, level in Supplier.objects.filter(
+                pk__in=[supplier.pk for supplier in suppliers]
+            ).values_list("id", "path", "level")
+        }
+        for supplier in suppliers:
+            supplier.path, supplier.level = paths[supplier.pk]
+    return suppliers
+
+
+def _create_suppliers(items: list[dict]) -> list[Supplier]:
+    contacts = Contact.objects.bulk_create(
+        [Contact(**item["contact"]) for item in items]
+    )
+    suppliers = Supplier.objects.bulk_create(
+        [
+            Supplier(
+                title=item["title"],
+                type_supplier=item["type_supplier"],
+                contact=contact,
+                supplier_id=item.get("supplier"),
+            )
+            for item, contact in zip(items, contacts)
+        ]
+    )
+
+    # parents inside the batch are known only after insert
+    by_ref = {
+        item["ref"]: supplier
+        for item, supplier in zip(items, suppliers)
+        if "ref" in item
+    }
+    for item, supplier in zip(items, suppliers):
+        if "supplier_ref" in item:
+            supplier.supplier_id = by_ref[item["supplier_ref"]].pk
+
+    created = {supplier.pk: supplier for supplier in suppliers}
+    existing = dict(
+        Supplier.objects.filter(
+            pk__in={supplier.supplier_id for supplier in suppliers} - set(created)
+        ).values_list("id", "path")
+    )
+
+    def prefix_of(parent_id: int | None) -> str:
+        if parent_id is None:
+            return ""
+        if parent_id in created:
+            return created[parent_id].path
+        return existing[parent_id]
+
+    # iterative: in-batch chains may be as long as the batch
+    for supplier in suppliers:
+        chain, current = [], supplier
+        while not current.path:
+            chain.append(current)
+            if current.supplier_id not in created:
+                break
+            current = created[current.supplier_id]
+        for node in reversed(chain):
+            node.path = f"{prefix_of(node.supplier_id)}{node.pk}/"
+            node.level = node.path.count("/") - 1
+    Supplier.objects.bulk_update(suppliers, ["supplier", "path", "level"])
+    return suppliers
+
+
+@transaction.atomic
+def write_batch(items: list[dict], user) -> list[Supplier]:
+    """
+    Applies a validated batch in one transaction.
+    Suppliers are returned in the order of items.
+
+    Statements do not depend on the batch size:
+    - one UPDATE per table for updated items
+    - one INSERT per table for new contacts and suppliers
+    - one UPDATE resolving parents, path and level of new suppliers
+    - one INSERT per M2M table and for change events
+    Moving an existing supplier costs a few statements per move.
+    """
+
+    updated = [item for item in items if "id" in item]
+    created = [item for item in items if "id" not in item]
+    suppliers = iter(_update_suppliers(updated))
+    new_suppliers = iter(_create_suppliers(created))
+    result = [next(suppliers if "id" in item else new_suppliers) for item in items]
+
+    Employee = Supplier.employees.through
+    SupplierProduct = Supplier.products.through
+    employees, products = [], []
+    for item, supplier in zip(items, result):
+        # the author of new suppliers becomes their employee
+        user_ids = set(item["employee_ids"])
+        if "id" not in item:
+            user_ids.add(user.pk)
+        employees.extend(
+            Employee(supplier_id=supplier.pk, user_id=user_id) for user_id in user_ids
+        )
+        products.extend(
+            SupplierProduct(supplier_id=supplier.pk, product_id=product_id)
+            for product_id in set(item["product_ids"])
+        )
+    Employee.objects.bulk_create(employees, ignore_conflicts=True)
+    SupplierProduct.objects.bulk_create(products, ignore_conflicts=True)
+    SupplierEvent.objects.bulk_create(
+        event
+        for item, supplier in zip(items, result)
+        if (event := supplier.change_event(created="id" not in item)) is not None
+    )
+
+    employee_ids = {employee.user_id for employee in employees}
+    updated_ids = [item["id"] for item in updated]
+    transaction.on_commit(lambda: invalidate_visibility(employee_ids))
+    transaction.on_commit(lambda: forget_supplier_qr_digests(updated_ids))
+    deltas = debt_deltas(
+        delta
+        for item, supplier in zip(items, result)
+        for delta in supplier_debt_deltas(supplier, created="id" not in item)
+    )
+    transaction.on_commit(lambda: add_debt_deltas(deltas))
+    transaction.on_commit(lambda: bump_data_versions(CONTACTS, SUPPLIERS))
+    return result
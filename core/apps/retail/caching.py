@@ -0,0 +1,67 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+
+# Data versions of API resources.
+# Every change of a resource increments its version counter and remembers
+# the time of the change. Cached responses and ETags include the versions,
+# so a change makes them unreachable without deleting keys.
+# Single-row changes are bumped by signals, bulk jobs bump explicitly.
+
+PRODUCTS = "products"
+SUPPLIERS = "suppliers"  # output nests contacts, employees and products
+CONTACTS = "contacts"  # city choices of the admin supplier filter
+
+
+def _version_key(resource: str) -> str:
+    return f"retail:data-version:{resource}"
+
+
+def _changed_key(resource: str) -> str:
+    return f"retail:data-changed:{resource}"
+
+
+def get_data_versions(resources) -> dict[str, int]:
+    found = cache.get_many([_version_key(resource) for resource in resources])
+    return {resource: found.get(_version_key(resource), 0) for resource in resources}
+
+
+def get_changed_at(resources):
+    """Time of the last change of any resource, None if unknown."""
+
+    found = cache.get_many([_changed_key(resource) for resource in resources])
+    return max(found.values(), default=None)
+
+
+def bump_data_versions(*resources) -> None:
+    now = timezone.now()
+    for resource in resources:
+        key = _version_key(resource)
+        cache.add(key, 0, None)
+        cache.incr(key)
+    cache.set_many({_changed_key(resource): now for resource in resources}, None)
+
+
+def response_digest(**parts) -> str:
+    """Stable hash of a read request and data versions it depends on."""
+
+    source = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(source.encode()).hexdigest()
+
+
+def _response_key(digest: str) -> str:
+    return f"retail:response:{digest}"
+
+
+def get_cached_response(digest: str) -> dict | None:
+    return cache.get(_response_key(digest))
+
+
+def set_cached_response(digest: str, data, last_modified) -> dict:
+    entry = {"data": data, "last_modified": last_modified}
+    cache.set(_response_key(digest), entry, settings.RETAIL_RESPONSE_CACHE_TIMEOUT)
+    return entry
@@ -9,3 +9,31 @@ class SupplierChoices(models.IntegerChoices):
     DEALERSHIP_CENTER = 2, "Дилерский центр"
     LARGE_RETAIL_CHAIN = 3, "Крупная розничная сеть"
     INDIVIDUAL_ENTREPRENEUR = 4, "Индивидуальный предприниматель"
+
+
+class DebtTransactionChoices(models.IntegerChoices):
+    """Kinds of debt ledger entries"""
+
+    OPENING = 0, "Начальный остаток"
+    INCREASE = 1, "Увеличение"
+    DECREASE = 2, "Уменьшение"
+    CLEAR = 3, "Обнуление"
+    ADJUSTMENT = 4, "Корректировка"
+
+
+class SupplierEventChoices(models.IntegerChoices):
+    """Kinds of supplier change events"""
+
+    CREATED = 0, "Создан"
+    UPDATED = 1, "Изменен"
+    MOVED = 2, "Перемещен"
+    DELETED = 3, "Удален"
+
+
+class DebtJobStatusChoices(models.IntegerChoices):
+    """Statuses of background debt jobs"""
+
+    PENDING = 0, "В очереди"
+    RUNNING = 1, "Выполняется"
+    DONE = 2, "Завершено"
+    FAILED = 3, "Ошибка"
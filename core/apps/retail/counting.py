@@ -0,0 +1,145 @@
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+
+from asgiref.sync import sync_to_async
+
+from .caching import response_digest
+
+
+# Row counts of big tables.
+# An exact COUNT(*) scans every matching row on PostgreSQL, while the planner
+# keeps a row estimate of a table in `pg_class.reltuples` (refreshed by
+# (auto)vacuum and ANALYZE) and estimates rows of any query in EXPLAIN.
+# Counts at or above `RETAIL_ESTIMATED_COUNT_THRESHOLD` are the estimate,
+# smaller ones are exact: a filtered query is counted up to the threshold
+# before EXPLAIN is trusted. Both are cached for `RETAIL_COUNT_CACHE_TIMEOUT`
+# seconds by the SQL of the query. Other databases always count exactly.
+
+
+def estimated_count(model, using: str = "default") -> int | None:
+    """Planner row estimate of the model table, None when unknown."""
+
+    connection = connections[using]
+    if connection.vendor != "postgresql":
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT reltuples FROM pg_class WHERE oid = %s::regclass",
+            [connection.ops.quote_name(model._meta.db_table)],
+        )
+        row = cursor.fetchone()
+    # -1 before the first ANALYZE
+    if row is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+def planned_count(queryset: QuerySet) -> int | None:
+    """Rows of the query estimated by EXPLAIN, None when unknown."""
+
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return None
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def _count_key(queryset: QuerySet) -> str:
+    sql, params = queryset.query.sql_with_params()
+    return f"retail:count:{response_digest(db=queryset.db, sql=sql, params=params)}"
+
+
+def _count(queryset: QuerySet) -> int:
+    threshold = settings.RETAIL_ESTIMATED_COUNT_THRESHOLD
+    if not queryset.query.where:
+        estimate = estimated_count(queryset.model, queryset.db)
+        if estimate is not None and estimate >= threshold:
+            return estimate
+        return queryset.count()
+
+    # EXPLAIN may estimate 100k rows for a filter matching a handful,
+    # so the planner is asked only when there are really that many
+    bounded = queryset.values("pk")[:threshold].count()
+    if bounded < threshold:
+        return bounded
+    estimate = planned_count(queryset)
+    if estimate is None:
+        return queryset.count()
+    return max(estimate, threshold)
+
+
+def fast_count(queryset: QuerySet) -> int:
+    """Estimated count of a big queryset, exact count of a small one, cached."""
+
+    if queryset.query.is_empty():
+        return 0
+    queryset = queryset.order_by()
+    key = _count_key(queryset)
+    count = cache.get(key)
+    if count is None:
+        count = _count(queryset)
+        cache.set(key, count, settings.RETAIL_COUNT_CACHE_TIMEOUT)
+    return count
+
+
+async def _acount(queryset: QuerySet) -> int:
+    """`_count` on the async ORM, raw planner queries run in a thread."""
+
+    threshold = settings.RETAIL_ESTIMATED_COUNT_THRESHOLD
+    if not queryset.query.where:
+        estimate = await sync_to_async(estimated_count)(queryset.model, queryset.db)
+        if estimate is not None and estimate >= threshold:
+            return estimate
+        return await queryset.acount()
+
+    bounded = await queryset.values("pk")[:threshold].acount()
+    if bounded < threshold:
+        return bounded
+    estimate = await sync_to_async(planned_count)(queryset)
+    if estimate is None:
+        return await queryset.acount()
+    return max(estimate, threshold)
+
+
+async def afast_count(queryset: QuerySet) -> int:
+    """`fast_count` for async views."""
+
+    if queryset.query.is_empty():
+        return 0
+    queryset = queryset.order_by()
+    key = _count_key(queryset)
+    count = await cache.aget(key)
+    if count is None:
+        count = await _acount(queryset)
+        await cache.aset(key, count, settings.RETAIL_COUNT_CACHE_TIMEOUT)
+    return count
+
+
+def count_exceeds(queryset: QuerySet, limit: int) -> bool:
+    """Whether the queryset has more than `limit` rows, reads at most limit + 1."""
+
+    return queryset.order_by().values("pk")[: limit + 1].count() > limit
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Admin paginator counting by `fast_count`: big changelists show
+    the estimate, small filtered ones a briefly cached exact count.
+    """
+
+    @cached_property
+    def count(self) -> int:
+        if isinstance(self.object_list, QuerySet):
+            return fast_count(self.object_list)
+        return super().count
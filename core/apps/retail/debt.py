@@ -0,0 +1,274 @@
+import random
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import (
+    connection,
+    transaction,
+)
+from django.utils import timezone
+
+from .choices import DebtTransactionChoices
+from .models import (
+    DebtTransaction,
+    Supplier,
+)
+from .statistics import (
+    add_debt_deltas,
+    debt_deltas,
+)
+
+
+def random_amount(low: float, high: float) -> Decimal:
+    """Random debt amount with two decimal places."""
+
+    return Decimal(str(round(random.uniform(low, high), 2)))
+
+
+def iter_id_chunks(queryset, chunk_size: int):
+    """
+    Yields lists of supplier ids in ascending order.
+    Uses keyset pagination by `id`, so every chunk costs the same.
+    """
+
+    last_id = 0
+    queryset = queryset.order_by("id").values_list("id", flat=True)
+    while True:
+        ids = list(queryset.filter(id__gt=last_id)[:chunk_size])
+        if not ids:
+            return
+        yield ids
+        last_id = ids[-1]
+
+
+# Balance expressions per entry kind, `v.amount` is the drawn amount
+EXPRESSIONS = {
+    DebtTransactionChoices.INCREASE: "s.debt + v.amount",
+    DebtTransactionChoices.DECREASE: "GREATEST(0, s.debt - v.amount)",
+    DebtTransactionChoices.CLEAR: "0",
+    DebtTransactionChoices.ADJUSTMENT: "GREATEST(0, s.debt + v.amount)",
+}
+
+
+def new_balance(kind: int, debt: Decimal, amount: Decimal) -> Decimal:
+    if kind == DebtTransactionChoices.INCREASE:
+        return debt + amount
+    if kind == DebtTransactionChoices.DECREASE:
+        return max(Decimal(0), debt - amount)
+    if kind == DebtTransactionChoices.ADJUSTMENT:
+        return max(Decimal(0), debt + amount)
+    return Decimal(0)
+
+
+def _apply_chunk_postgresql(amounts: dict[int, Decimal], kind: int, created) -> list:
+    """
+    One statement for the whole chunk: `UPDATE ... FROM (VALUES ...)`
+    and the ledger INSERT of applied changes in a data-modifying CTE.
+    The balance before the change is read by the locking subquery the
+    UPDATE joins, so every updated row returns its old and new debt.
+    Rows are locked in id order, concurrent chunks over the same suppliers
+    wait for each other instead of deadlocking.
+    Returns `(type_supplier, amount)` of every applied change.
+    """
+
+    table = connection.ops.quote_name(Supplier._meta.db_table)
+    ledger = connection.ops.quote_name(DebtTransaction._meta.db_table)
+    values = ", ".join(["(%s, %s::numeric)"] * len(amounts))
+    params = [item for pair in amounts.items() for item in pair]
+    sql = f"""
+        WITH v(id, amount) AS (VALUES {values}),
+        new AS (
+            UPDATE {table} AS s SET debt = {EXPRESSIONS[kind]}
+            FROM v, (
+                SELECT s.id, s.debt FROM {table} AS s JOIN v ON v.id = s.id
+                ORDER BY s.id FOR UPDATE OF s
+            ) AS old
+            WHERE s.id = v.id AND old.id = v.id
+            RETURNING s.id, s.type_supplier, old.debt AS old_debt, s.debt AS new_debt
+        ),
+        changed AS (
+            SELECT id, type_supplier, new_debt - old_debt AS amount FROM new
+            WHERE new_debt <> old_debt
+        ),
+        entries AS (
+            INSERT INTO {ledger} (supplier_id, kind, amount, created)
+            SELECT id, %s, amount, %s FROM changed
+        )
+        SELECT type_supplier, amount FROM changed
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            sql, [*params, kind, connection.ops.adapt_datetimefield_value(created)]
+        )
+        return cursor.fetchall()
+
+
+def _apply_chunk_generic(amounts: dict[int, Decimal], kind: int, created) -> list:
+    """Fallback for other backends: locked read, bulk_update and bulk_create."""
+
+    suppliers = list(
+        Supplier.objects.select_for_update()
+        .filter(id__in=list(amounts))
+        .order_by("id")
+        .only("id", "debt", "type_supplier")
+    )
+    types = {supplier.id: supplier.type_supplier for supplier in suppliers}
+    entries = []
+    for supplier in suppliers:
+        balance = new_balance(kind, supplier.debt, amounts[supplier.id])
+        if balance != supplier.debt:
+            entries.append(
+                DebtTransaction(
+                    supplier_id=supplier.id,
+                    kind=kind,
+                    amount=balance - supplier.debt,
+                    created=created,
+                )
+            )
+            supplier.debt = balance
+    Supplier.objects.bulk_update(suppliers, ["debt"], batch_size=max(len(suppliers), 1))
+    DebtTransaction.objects.bulk_create(entries)
+    return [(types[entry.supplier_id], entry.amount) for entry in entries]
+
+
+def apply_debt(kind: int, amounts: dict[int, Decimal], created=None) -> int:
+    """
+    Applies amounts of one chunk in a transaction and writes ledger
+    entries of changed balances. Returns the number of entries.
+    Running debt statistics are moved after commit.
+    """
+
+    apply_chunk = (
+        _apply_chunk_postgresql
+        if connection.vendor == "postgresql"
+        else _apply_chunk_generic
+    )
+    with transaction.atomic():
+        changes = apply_chunk(amounts, kind, created or timezone.now())
+        # balances change, the number of suppliers does not
+        deltas = debt_deltas(
+            (type_supplier, 0, amount) for type_supplier, amount in changes
+        )
+        transaction.on_commit(lambda: add_debt_deltas(deltas))
+    return len(changes)
+
+
+def _run(kind: int, queryset, chunk_size: int | None, draw) -> dict:
+    chunk_size = chunk_size or settings.RETAIL_DEBT_CHUNK_SIZE
+    queryset = Supplier.objects.all() if queryset is None else queryset
+
+    started = time.perf_counter()
+    rows = chunks = entries = 0
+    for ids in iter_id_chunks(queryset, chunk_size):
+        entries += apply_debt(kind, {supplier_id: draw() for supplier_id in ids})
+        rows += len(ids)
+        chunks += 1
+
+    return {
+        "rows": rows,
+        "chunks": chunks,
+        "entries": entries,
+        "elapsed": round(time.perf_counter() - started, 3),
+    }
+
+
+def adjust_debt(
+    low: float,
+    high: float,
+    decrease: bool = False,
+    queryset=None,
+    chunk_size: int | None = None,
+) -> dict:
+    """
+    Set-based debt adjustment engine.
+
+    Walks suppliers in chunks of `chunk_size` ids, draws a random amount
+    in [low, high] for every supplier and applies the whole chunk with one
+    statement in a short transaction. Decreases are floored at zero.
+    Applied changes are appended to the `DebtTransaction` ledger.
+
+    Returns summary:
+    - `rows` - number of processed suppliers
+    - `chunks` - number of executed statements
+    - `entries` - number of ledger entries
+    - `elapsed` - wall time in seconds
+    """
+
+    kind = (
+        DebtTransactionChoices.DECREASE if decrease else DebtTransactionChoices.INCREASE
+    )
+    return _run(kind, queryset, chunk_size, lambda: random_amount(low, high))
+
+
+def clear_debt(queryset, chunk_size: int | None = None) -> dict:
+    """Sets debt of suppliers to zero through the ledger, summary as `adjust_debt`."""
+
+    return _run(DebtTransactionChoices.CLEAR, queryset, chunk_size, Decimal)
+
+
+def change_debt(supplier_id: int, kind: int, amount: Decimal) -> Decimal:
+    """
+    Relative single-row change, e.g. a manual adjustment: concurrent jobs
+    are not overwritten. Returns the new balance.
+    """
+
+    with transaction.atomic():
+        apply_debt(kind, {supplier_id: amount})
+        return Supplier.objects.values_list("debt", flat=True).get(pk=supplier_id)
+
+
+@contextmanager
+def debt_lock(name: str):
+    """
+    Non-blocking lock of a whole-table debt job, yields whether it was taken.
+    PostgreSQL session advisory lock, held across the job transactions;
+    other backends use `cache.add`.
+    """
+
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_try_advisory_lock(hashtext(%s))", [name])
+            acquired = cursor.fetchone()[0]
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT pg_advisory_unlock(hashtext(%s))", [name])
+        return
+
+    key = f"retail:lock:{name}"
+    acquired = cache.add(key, 1, settings.RETAIL_DEBT_LOCK_TIMEOUT)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            cache.delete(key)
+
+
+def record_debt_change(supplier: Supplier, kind: int, amount: Decimal):
+    """Ledger entry of a single-row change, balance is already saved."""
+
+    if amount:
+        return DebtTransaction.objects.create(
+            supplier=supplier, kind=kind, amount=amount
+        )
+    return None
+
+
+def opening_entries(suppliers) -> list[DebtTransaction]:
+    """Unsaved ledger entries of initial balances of new suppliers."""
+
+    return [
+        DebtTransaction(
+            supplier_id=supplier.pk,
+            kind=DebtTransactionChoices.OPENING,
+            amount=supplier.debt,
+            created=supplier.created,
+        )
+        for supplier in suppliers
+        if supplier.debt
+    ]
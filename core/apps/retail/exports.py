@@ -0,0 +1,89 @@
+import csv
+import json
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+from .serializers import (
+    ContactSerializer,
+    FastSupplierSerializer,
+    SupplierSerializer,
+)
+
+
+CONTENT_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+NESTED_FIELDS = ("employees", "products")
+
+
+class Echo:
+    """File-like object for csv.writer, returns the line instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def iter_supplier_data(queryset):
+    """
+    Yields `SupplierSerializer` data row by row.
+    `iterator(chunk_size)` reads from a server-side cursor and runs
+    prefetches per chunk, so memory stays bounded.
+    """
+
+    queryset = queryset.select_related("contact").prefetch_related(
+        "employees", "products"
+    )
+    for supplier in queryset.iterator(chunk_size=settings.RETAIL_EXPORT_CHUNK_SIZE):
+        yield FastSupplierSerializer(supplier).data
+
+
+def csv_header() -> list[str]:
+    header = []
+    for name in SupplierSerializer.Meta.fields:
+        if name == "contact":
+            header.extend(f"contact_{field}" for field in ContactSerializer.Meta.fields)
+        else:
+            header.append(name)
+    return header
+
+
+def to_csv_row(data) -> list:
+    """Flattens contact into columns, employees and products become JSON."""
+
+    row = []
+    for name in SupplierSerializer.Meta.fields:
+        value = data[name]
+        if name == "contact":
+            row.extend(value[field] for field in ContactSerializer.Meta.fields)
+        elif name in NESTED_FIELDS:
+            row.append(json.dumps(value, cls=JSONEncoder, ensure_ascii=False))
+        else:
+            row.append(value)
+    return row
+
+
+def iter_ndjson(queryset):
+    for data in iter_supplier_data(queryset):
+        yield json.dumps(data, cls=JSONEncoder, ensure_ascii=False) + "\n"
+
+
+def iter_csv(queryset):
+    writer = csv.writer(Echo())
+    yield writer.writerow(csv_header())
+    for data in iter_supplier_data(queryset):
+        yield writer.writerow(to_csv_row(data))
+
+
+def export_suppliers(queryset, export_format: str) -> StreamingHttpResponse:
+    """Streaming response with suppliers in NDJSON or CSV."""
+
+    rows = iter_csv(queryset) if export_format == "csv" else iter_ndjson(queryset)
+    response = StreamingHttpResponse(rows, content_type=CONTENT_TYPES[export_format])
+    response["Content-Disposition"] = (
+        f'attachment; filename="suppliers.{export_format}"'
+    )
+    return response
@@ -0,0 +1,277 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import (
+    Count,
+    F,
+    Max,
+    Min,
+    Sum,
+)
+from django.utils import timezone
+
+from .caching import (
+    bump_data_versions,
+    SUPPLIERS,
+)
+from .choices import (
+    DebtJobStatusChoices,
+    DebtTransactionChoices,
+)
+from .debt import (
+    apply_debt,
+    EXPRESSIONS,
+    iter_id_chunks,
+    random_amount,
+)
+from .models import (
+    DebtJob,
+    DebtJobChunk,
+    Supplier,
+)
+
+
+# Resumable debt jobs.
+# A job is a row with a JSON selection spec instead of a list of ids:
+# - {"ids": [...]} - explicitly selected suppliers (one admin page at most)
+# - {"filters": {lookup: value}} - all suppliers matching admin filters,
+#   `{}` is the whole table
+# The selection is planned once into `DebtJobChunk` id ranges. Workers claim
+# chunks with `SELECT ... FOR UPDATE SKIP LOCKED`: every chunk is one short
+# transaction that applies it and marks it finished, so any number of workers
+# split a job, and a crashed worker's chunk is rolled back and claimed again.
+# Chunks are grouped into `job.shards` contiguous id ranges: a shard task
+# claims only chunks of its shard, the scheduled jobs fan out over workers.
+
+# Admin changelist filter params allowed in a spec, with value parsers.
+# Anything else is stored as explicit ids, a spec never selects more.
+SPEC_LOOKUPS = {
+    "type_supplier__exact": int,
+    "contact__city": str,
+    "contact__city__exact": str,
+    "contact__city__isnull": lambda value: value == "True",
+}
+
+
+def selection_spec(queryset, filter_params: dict | None = None) -> dict:
+    """
+    Spec of an admin selection. `filter_params` are changelist params
+    (`{param: [values]}`) when all filtered suppliers are selected.
+    A search or any param outside `SPEC_LOOKUPS` falls back to ids,
+    as does an empty spec of a filtered queryset.
+    """
+
+    if filter_params is not None:
+        try:
+            filters = {
+                param: SPEC_LOOKUPS[param](value)
+                for param, (value,) in filter_params.items()
+            }
+        except (KeyError, ValueError):
+            pass
+        else:
+            if filters or not queryset.query.where:
+                return {"filters": filters}
+    return {"ids": list(queryset.order_by("id").values_list("id", flat=True))}
+
+
+def spec_queryset(spec: dict):
+    if "ids" in spec:
+        return Supplier.objects.filter(id__in=spec["ids"])
+    unknown = set(spec["filters"]) - set(SPEC_LOOKUPS)
+    if unknown:
+        raise ValueError(f"Недопустимые фильтры выборки: {', '.join(sorted(unknown))}")
+    return Supplier.objects.filter(**spec["filters"])
+
+
+def start_debt_job(
+    kind: int, spec: dict, low=None, high=None, author=None, shards: int = 1
+) -> DebtJob:
+    """Creates a job, amounts of increases and decreases are drawn in [low, high]."""
+
+    return DebtJob.objects.create(
+        kind=kind, spec=spec, low=low, high=high, author=author, shards=shards
+    )
+
+
+def start_clear_job(spec: dict, author=None) -> DebtJob:
+    """Creates a job clearing debt of the selection, the task runs it."""
+
+    return start_debt_job(DebtTransactionChoices.CLEAR, spec, author=author)
+
+
+def plan_job(job_id: int, chunk_size: int | None = None) -> DebtJob:
+    """
+    Splits the selection into chunks and shards once,
+    concurrent callers wait for it.
+    """
+
+    chunk_size = chunk_size or settings.RETAIL_DEBT_CHUNK_SIZE
+    with transaction.atomic():
+        job = DebtJob.objects.select_for_update().get(pk=job_id)
+        if not job.chunks.exists():
+            chunks = [
+                DebtJobChunk(job=job, first_id=ids[0], last_id=ids[-1])
+                for ids in iter_id_chunks(spec_queryset(job.spec), chunk_size)
+            ]
+            for index, chunk in enumerate(chunks):
+                chunk.shard = index * job.shards // len(chunks)
+            DebtJobChunk.objects.bulk_create(chunks)
+            job.total = spec_queryset(job.spec).count()
+            job.processed = 0
+            job.status = DebtJobStatusChoices.RUNNING
+            job.save(update_fields=["total", "processed", "status", "updated"])
+    return job
+
+
+def _amounts(job: DebtJob, ids: list[int]) -> dict[int, Decimal]:
+    if job.kind == DebtTransactionChoices.CLEAR:
+        return dict.fromkeys(ids, Decimal(0))
+    low, high = float(job.low), float(job.high)
+    return {supplier_id: random_amount(low, high) for supplier_id in ids}
+
+
+def process_chunk(
+    job: DebtJob, worker: str = "", shard: int | None = None
+) -> DebtJobChunk | None:
+    """
+    Claims the next free chunk, of the shard if given, and applies it
+    in one transaction. Returns None when every chunk is finished
+    or taken by other workers.
+    """
+
+    with transaction.atomic():
+        chunks = job.chunks.select_for_update(skip_locked=True).filter(
+            finished__isnull=True
+        )
+        if shard is not None:
+            chunks = chunks.filter(shard=shard)
+        chunk = chunks.order_by("first_id").first()
+        if chunk is None:
+            return None
+        chunk.started = timezone.now()
+        ids = list(
+            spec_queryset(job.spec)
+            .filter(id__gte=chunk.first_id, id__lte=chunk.last_id)
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        chunk.entries = apply_debt(job.kind, _amounts(job, ids)) if ids else 0
+        chunk.rows = len(ids)
+        chunk.worker = worker
+        chunk.finished = timezone.now()
+        chunk.save()
+        # relative update, workers finish chunks of one job concurrently
+        DebtJob.objects.filter(pk=job.pk).update(
+            processed=F("processed") + chunk.rows,
+            changed=F("changed") + chunk.entries,
+            updated=chunk.finished,
+        )
+    return chunk
+
+
+def finish_job(job_id: int) -> DebtJob:
+    """Marks the job done when no chunk is left, the last worker does it."""
+
+    job = DebtJob.objects.get(pk=job_id)
+    if (
+        job.status == DebtJobStatusChoices.RUNNING
+        and not job.chunks.filter(finished__isnull=True).exists()
+    ):
+        DebtJob.objects.filter(pk=job_id).update(
+            status=DebtJobStatusChoices.DONE, updated=timezone.now()
+        )
+        job.refresh_from_db()
+    return job
+
+
+def run_debt_job(
+    job_id: int,
+    chunk_size: int | None = None,
+    on_progress=None,
+    worker: str = "",
+    shard: int | None = None,
+) -> DebtJob:
+    """
+    Runs or joins a job until no free chunk (of the shard) is left,
+    `on_progress(job)` is called after every chunk.
+    Failed jobs keep the error and re-raise.
+    A shard leaves the data version bump to the caller, after all shards.
+    """
+
+    job = DebtJob.objects.get(pk=job_id)
+    if job.status == DebtJobStatusChoices.DONE:
+        return job
+    if job.kind not in EXPRESSIONS:
+        raise ValueError(f"Неподдерживаемая операция задачи: {job.kind}")
+
+    try:
+        job = plan_job(job_id, chunk_size)
+        if job.status == DebtJobStatusChoices.FAILED:
+            DebtJob.objects.filter(pk=job_id).update(
+                status=DebtJobStatusChoices.RUNNING, error=""
+            )
+        while process_chunk(job, worker, shard) is not None:
+            if on_progress is not None:
+                job.refresh_from_db()
+                on_progress(job)
+    except Exception as e:
+        DebtJob.objects.filter(pk=job_id).update(
+            status=DebtJobStatusChoices.FAILED, error=str(e), updated=timezone.now()
+        )
+        raise
+    finally:
+        if shard is None:
+            bump_data_versions(SUPPLIERS)
+    return finish_job(job_id)
+
+
+def shard_timings(job: DebtJob) -> list[dict]:
+    """Per-shard summary of a job: workers, chunks, rows, entries and timing."""
+
+    shards = (
+        job.chunks.values("shard")
+        .annotate(
+            chunks=Count("id"),
+            done=Count("finished"),
+            rows=Sum("rows"),
+            entries=Sum("entries"),
+            started=Min("started"),
+            finished=Max("finished"),
+        )
+        .order_by("shard")
+    )
+    workers = {}
+    for shard, worker in (
+        job.chunks.exclude(worker="")
+        .values_list("shard", "worker")
+        .order_by()
+        .distinct()
+    ):
+        workers.setdefault(shard, []).append(worker)
+
+    timings = []
+    for row in shards:
+        elapsed = None
+        if row["done"] == row["chunks"] and row["started"] is not None:
+            elapsed = round((row["finished"] - row["started"]).total_seconds(), 3)
+        timings.append(
+            {
+                **row,
+                "workers": sorted(workers.get(row["shard"], [])),
+                "elapsed": elapsed,
+            }
+        )
+    return timings
+
+
+def stale_jobs():
+    """Unfinished jobs without progress for `RETAIL_DEBT_JOB_STALE_AFTER` seconds."""
+
+    return DebtJob.objects.filter(
+        status__in=(DebtJobStatusChoices.PENDING, DebtJobStatusChoices.RUNNING),
+        updated__lt=timezone.now()
+        - timedelta(seconds=settings.RETAIL_DEBT_JOB_STALE_AFTER),
+    )
@@ -0,0 +1,144 @@
+from datetime import (
+    datetime,
+    timedelta,
+    timezone as dt_timezone,
+)
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import (
+    connection,
+    transaction,
+)
+from django.db.models import (
+    Max,
+    Min,
+    Sum,
+)
+from django.utils import timezone
+
+from .models import (
+    DebtSnapshot,
+    DebtTransaction,
+)
+
+
+# Debt ledger compaction.
+# `DebtTransaction` is append-only and grows with every debt job. At the start
+# of every month (UTC) a `DebtSnapshot` row keeps the balance of each supplier:
+# the previous snapshot plus entries of the month. A balance at any time is
+# then the latest snapshot plus at most one month of entries.
+
+
+def month_start(moment: datetime) -> datetime:
+    moment = moment.astimezone(dt_timezone.utc)
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month(moment: datetime) -> datetime:
+    return month_start(month_start(moment) + timedelta(days=32))
+
+
+def pending_boundaries(until: datetime) -> list[datetime]:
+    """Month starts after the last snapshot (or the first entry) up to `until`."""
+
+    start = DebtSnapshot.objects.aggregate(last=Max("taken_at"))["last"]
+    if start is None:
+        start = DebtTransaction.objects.aggregate(first=Min("created"))["first"]
+    if start is None:
+        return []
+
+    boundaries = []
+    boundary = next_month(start)
+    while boundary <= until:
+        boundaries.append(boundary)
+        boundary = next_month(boundary)
+    return boundaries
+
+
+def _write_snapshot(boundary: datetime, previous: datetime | None) -> int:
+    """
+    One INSERT ... SELECT: balances of the previous snapshot
+    plus ledger entries in (previous, boundary].
+    """
+
+    snapshots = connection.ops.quote_name(DebtSnapshot._meta.db_table)
+    ledger = connection.ops.quote_name(DebtTransaction._meta.db_table)
+    if previous is None:
+        source = f"SELECT supplier_id, amount FROM {ledger} WHERE created <= %s"
+        params = [boundary]
+    else:
+        source = f"""
+            SELECT supplier_id, balance AS amount FROM {snapshots}
+            WHERE taken_at = %s
+            UNION ALL
+            SELECT supplier_id, amount FROM {ledger}
+            WHERE created > %s AND created <= %s
+        """
+        params = [previous, previous, boundary]
+
+    sql = f"""
+        INSERT INTO {snapshots} (supplier_id, balance, taken_at)
+        SELECT changes.supplier_id, SUM(changes.amount), %s
+        FROM ({source}) AS changes
+        GROUP BY changes.supplier_id
+    """
+    params = [
+        connection.ops.adapt_datetimefield_value(value) for value in [boundary, *params]
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+
+def compact_debt_ledger(until: datetime | None = None) -> int:
+    """
+    Writes monthly snapshots of all months closed before `until`,
+    by default `RETAIL_DEBT_COMPACT_AFTER_DAYS` ago. Entries stay in the
+    ledger for audit. Returns the number of written snapshot rows.
+    """
+
+    if until is None:
+        until = timezone.now() - timedelta(days=settings.RETAIL_DEBT_COMPACT_AFTER_DAYS)
+
+    written = 0
+    previous = DebtSnapshot.objects.aggregate(last=Max("taken_at"))["last"]
+    for boundary in pending_boundaries(until):
+        # every month in its own transaction, an interrupted run resumes
+        with transaction.atomic():
+            written += _write_snapshot(boundary, previous)
+        previous = boundary
+    return written
+
+
+def debt_balance_at(supplier_id: int, at: datetime) -> Decimal:
+    """Supplier balance at `at`: latest snapshot and entries after it."""
+
+    snapshot = (
+        DebtSnapshot.objects.filter(supplier_id=supplier_id, taken_at__lte=at)
+        .order_by("-taken_at")
+        .values_list("taken_at", "balance")
+        .first()
+    )
+    entries = DebtTransaction.objects.filter(supplier_id=supplier_id, created__lte=at)
+    balance = Decimal(0)
+    if snapshot is not None:
+        entries = entries.filter(created__gt=snapshot[0])
+        balance = snapshot[1]
+    return balance + (entries.aggregate(total=Sum("amount"))["total"] or 0)
+
+
+def debt_total_at(at: datetime) -> Decimal:
+    """Total debt of all suppliers at `at`."""
+
+    taken_at = DebtSnapshot.objects.filter(taken_at__lte=at).aggregate(
+        last=Max("taken_at")
+    )["last"]
+    entries = DebtTransaction.objects.filter(created__lte=at)
+    total = Decimal(0)
+    if taken_at is not None:
+        entries = entries.filter(created__gt=taken_at)
+        total = DebtSnapshot.objects.filter(taken_at=taken_at).aggregate(
+            total=Sum("balance")
+        )["total"]
+    return total + (entries.aggregate(total=Sum("amount"))["total"] or 0)
@@ -0,0 +1,69 @@
+import time
+from itertools import (
+    cycle,
+    islice,
+)
+
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+)
+from rest_framework.renderers import JSONRenderer
+
+from core.apps.retail.models import Supplier
+from core.apps.retail.serializers import (
+    FastSupplierSerializer,
+    SupplierSerializer,
+)
+
+
+class Command(BaseCommand):
+    help = "Compare SupplierSerializer with FastSupplierSerializer on list output"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--suppliers",
+            type=int,
+            default=10000,
+            help="Number of serialized suppliers (existing rows are repeated)",
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=3, help="Runs per serializer, best is taken"
+        )
+
+    def measure(self, serializer_class, suppliers, repeat):
+        best, data = None, None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            data = serializer_class(suppliers, many=True).data
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best, data
+
+    def handle(self, *args, **options):
+        loaded = list(
+            Supplier.objects.select_related("contact").prefetch_related(
+                "employees", "products"
+            )[: options["suppliers"]]
+        )
+        if not loaded:
+            raise CommandError("No suppliers, run fill_bd first")
+        suppliers = list(islice(cycle(loaded), options["suppliers"]))
+
+        self.stdout.write(
+            f"Serializing {len(suppliers)} suppliers ({len(loaded)} unique rows)..."
+        )
+        regular, expected = self.measure(
+            SupplierSerializer, suppliers, options["repeat"]
+        )
+        fast, actual = self.measure(
+            FastSupplierSerializer, suppliers, options["repeat"]
+        )
+
+        renderer = JSONRenderer()
+        if renderer.render(expected) != renderer.render(actual):
+            raise CommandError("Fast serializer output differs from SupplierSerializer")
+
+        self.stdout.write(f"SupplierSerializer:     {regular:.3f} s")
+        self.stdout.write(f"FastSupplierSerializer: {fast:.3f} s")
+        self.stdout.write(self.style.SUCCESS(f"Speedup: x{regular / fast:.1f}"))
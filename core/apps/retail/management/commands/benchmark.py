@@ -0,0 +1,390 @@
+import json
+import time
+import tracemalloc
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+)
+from django.db import (
+    connection,
+    transaction,
+)
+from django.db.models import (
+    Count,
+    Max,
+)
+from django.test import (
+    Client,
+    override_settings,
+)
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.apps.retail.caching import (
+    bump_data_versions,
+    PRODUCTS,
+    SUPPLIERS,
+)
+from core.apps.retail.metrics import (
+    percentiles,
+    QueryTimer,
+)
+from core.apps.retail.models import (
+    Product,
+    Supplier,
+)
+from core.apps.retail.statistics import refresh_debt_statistics
+from core.apps.retail.tasks import (
+    compact_debt_ledger,
+    decrease_debt,
+    increase_debt,
+)
+
+
+User = get_user_model()
+
+ADMIN_USERNAME = "benchmark-admin"
+
+
+def run_task(task):
+    """
+    Runs the task in-process with `apply`, chords it dispatches run eagerly
+    too: shards and the finish callback are measured, nothing is published.
+    """
+
+    def run():
+        conf = task.app.conf
+        eager = conf.task_always_eager
+        conf.task_always_eager = True
+        try:
+            result = task.apply(throw=True).get()
+        finally:
+            conf.task_always_eager = eager
+        if result is None:
+            raise CommandError(f"{task.name} skipped, a job of it is unfinished")
+
+    return run
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark retail API endpoints, the admin supplier changelist and "
+        "debt jobs of scheduled tasks: latency percentiles, SQL queries and "
+        "peak memory, compared with a JSON baseline. Tasks run in-process with "
+        "apply in a rolled back transaction, nothing is sent to the broker. "
+        "Endpoints answering other than 2xx fail the run. Run it on "
+        "a local database: it refuses to run without DEBUG unless --yes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--yes",
+            action="store_true",
+            help="Run without DEBUG, e.g. on a staging copy of the database",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            help="Create this many suppliers with fill_bd --bulk first, "
+            "e.g. 10000, 100000 or 1000000",
+        )
+        parser.add_argument("--products", type=int, default=100, help="With --seed")
+        parser.add_argument("--users", type=int, default=10, help="With --seed")
+        parser.add_argument(
+            "--depth-weights",
+            default="1,10,30,40,19",
+            help="With --seed, share of suppliers on each hierarchy level",
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=20, help="Requests per endpoint"
+        )
+        parser.add_argument(
+            "--warmup",
+            type=int,
+            default=2,
+            help="Requests per endpoint before measuring, fill process caches",
+        )
+        parser.add_argument("--task-repeat", type=int, default=1, help="Runs per job")
+        parser.add_argument(
+            "--warm",
+            action="store_true",
+            help="Keep response caches, by default data versions are bumped "
+            "before every request",
+        )
+        parser.add_argument("--skip-tasks", action="store_true", help="Skip debt jobs")
+        parser.add_argument(
+            "--no-memory",
+            action="store_true",
+            help="Skip the extra tracemalloc run measuring peak memory",
+        )
+        parser.add_argument(
+            "--only", action="append", help="Case name, can be repeated"
+        )
+        parser.add_argument("--baseline", help="JSON file with a previous report")
+        parser.add_argument("--save", help="Write the report to this JSON file")
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=1.5,
+            help="Slowdown of p50 latency or memory growth factor against "
+            "baseline reported as regression",
+        )
+        parser.add_argument(
+            "--min-delta-ms",
+            type=float,
+            default=5,
+            help="Smaller p50 slowdowns are noise, not regressions",
+        )
+
+    def seed(self, options):
+        call_command(
+            "fill_bd",
+            suppliers=options["seed"],
+            products=options["products"],
+            users=options["users"],
+            depth_weights=options["depth_weights"],
+            bulk=True,
+            stdout=self.stdout,
+        )
+
+    def get_cases(self, options, admin) -> dict:
+        """Case name -> (client, url) of endpoints, or callable for jobs."""
+
+        user = (
+            User.objects.filter(is_superuser=False)
+            .annotate(suppliers=Count("supplier"))
+            .order_by("-suppliers")
+            .first()
+        )
+        if user is None or not user.suppliers:
+            raise CommandError("No suppliers with employees, run with --seed")
+        visible = Supplier.objects.filter(employees=user).select_related("contact")
+        root = visible.order_by("level", "id").first()
+        leaf = visible.order_by("-level", "id").first()
+        product = root.products.first() or Product.objects.first()
+
+        client, self.admin_client = APIClient(), Client()
+        client.force_authenticate(user)
+        self.admin_client.force_login(admin)
+        country = root.contact.country
+        cases = {
+            "node-list": (client, reverse("node-list") + f"?country={country}"),
+            "node-detail": (
+                client,
+                reverse("node-detail", args=[root.pk]) + f"?country={country}",
+            ),
+            "node-export": (
+                client,
+                reverse("node-export") + f"?export_format=csv&country={country}",
+            ),
+            "network-subtree": (client, reverse("network-subtree", args=[root.pk])),
+            "network-ancestors": (
+                client,
+                reverse("network-ancestors", args=[leaf.pk]),
+            ),
+            "product-list": (client, reverse("product-list")),
+            "product-detail": (client, reverse("product-detail", args=[product.pk])),
+            "suppliers-by-product-list": (
+                client,
+                reverse("suppliers-by-product-list") + f"?product_id={product.pk}",
+            ),
+            "statistics": (client, reverse("statistics")),
+            "supplier-debt": (client, reverse("supplier-debt", args=[root.pk])),
+            "supplier-history": (client, reverse("supplier-history", args=[root.pk])),
+            "admin:retail_supplier_changelist": (
+                self.admin_client,
+                reverse("admin:retail_supplier_changelist"),
+            ),
+        }
+        if not options["skip_tasks"]:
+            # resume_debt_jobs only publishes messages and is not measured
+            cases.update(
+                {
+                    "job:increase_debt": run_task(increase_debt),
+                    "job:decrease_debt": run_task(decrease_debt),
+                    "job:compact_debt_ledger": run_task(compact_debt_ledger),
+                }
+            )
+        if options["only"]:
+            unknown = set(options["only"]) - set(cases)
+            if unknown:
+                raise CommandError(f"Unknown cases: {', '.join(sorted(unknown))}")
+            cases = {name: cases[name] for name in options["only"]}
+        return cases
+
+    def run_case(self, case, warm: bool) -> tuple[int | str, float, QueryTimer]:
+        if not warm:
+            bump_data_versions(PRODUCTS, SUPPLIERS)
+        timer = QueryTimer()
+        started = time.perf_counter()
+        with connection.execute_wrapper(timer):
+            if isinstance(case, tuple):
+                client, url = case
+                response = client.get(url)
+                if response.streaming:
+                    b"".join(response.streaming_content)
+                status = response.status_code
+            else:
+                # rolled back, every run sees the same data
+                status = "SUCCESS"
+                try:
+                    with transaction.atomic():
+                        case()
+                        transaction.set_rollback(True)
+                except Exception as e:
+                    status = "FAILURE"
+                    self.stderr.write(f"{e!r}")
+        return status, time.perf_counter() - started, timer
+
+    def measure(self, case, options) -> dict:
+        repeat = options["task_repeat"]
+        if isinstance(case, tuple):
+            repeat = options["repeat"]
+            for _ in range(options["warmup"]):
+                self.run_case(case, options["warm"])
+
+        latencies, queries = [], []
+        for _ in range(repeat):
+            status, seconds, timer = self.run_case(case, options["warm"])
+            latencies.append(seconds * 1000)
+            queries.append(timer.queries)
+
+        peak_kb = None
+        if not options["no_memory"]:
+            tracemalloc.start()
+            try:
+                self.run_case(case, options["warm"])
+                peak_kb = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+            finally:
+                tracemalloc.stop()
+
+        result = {"status": status}
+        for name, value in percentiles(latencies).items():
+            result[f"{name}_ms"] = round(value, 3)
+        result["queries"] = max(queries)
+        result["peak_kb"] = peak_kb
+        return result
+
+    def compare(self, name, result, baseline, options) -> list[str]:
+        previous = baseline.get("cases", {}).get(name)
+        if previous is None:
+            return []
+        problems = []
+        threshold = options["threshold"]
+        if result["p50_ms"] > max(
+            previous["p50_ms"] * threshold,
+            previous["p50_ms"] + options["min_delta_ms"],
+        ):
+            problems.append(f"p50 {previous['p50_ms']} ms -> {result['p50_ms']} ms")
+        if result["queries"] > previous["queries"]:
+            problems.append(f"queries {previous['queries']} -> {result['queries']}")
+        if (
+            previous["peak_kb"]
+            and result["peak_kb"]
+            and result["peak_kb"] > previous["peak_kb"] * threshold
+        ):
+            problems.append(
+                f"peak {previous['peak_kb']} KiB -> {result['peak_kb']} KiB"
+            )
+        if result["status"] != previous["status"]:
+            problems.append(f"status {previous['status']} -> {result['status']}")
+        return problems
+
+    def dataset(self, options) -> dict:
+        max_level = Supplier.objects.aggregate(level=Max("level"))["level"]
+        return {
+            "vendor": connection.vendor,
+            "suppliers": Supplier.objects.count(),
+            "levels": 0 if max_level is None else max_level + 1,
+            "products": Product.objects.count(),
+            "repeat": options["repeat"],
+            "warm": options["warm"],
+            "created": timezone.now().isoformat(),
+        }
+
+    def run_cases(self, report: dict, baseline: dict, options, admin) -> int:
+        """Returns the number of failed cases and regressions."""
+
+        problems = 0
+        for name, case in self.get_cases(options, admin).items():
+            result = self.measure(case, options)
+            report["cases"][name] = result
+
+            self.stdout.write(
+                f"{name}: {result['status']}  p50 {result['p50_ms']} ms  "
+                f"p90 {result['p90_ms']} ms  p99 {result['p99_ms']} ms  "
+                f"queries {result['queries']}  peak {result['peak_kb'] or '-'} KiB"
+            )
+            status = result["status"]
+            if status != "SUCCESS" and not (
+                isinstance(status, int) and 200 <= status < 300
+            ):
+                problems += 1
+                self.stdout.write(self.style.ERROR(f"  FAILED {name}: {status}"))
+            for problem in self.compare(name, result, baseline, options):
+                problems += 1
+                self.stdout.write(self.style.ERROR(f"  REGRESSION {name}: {problem}"))
+        return problems
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options["yes"]:
+            raise CommandError(
+                "DEBUG is off, this may be a production database: --seed and "
+                "the admin user write to it. Pass --yes to run anyway"
+            )
+        baseline = {}
+        if options["baseline"]:
+            baseline = json.loads(Path(options["baseline"]).read_text())
+        if options["seed"]:
+            self.seed(options)
+
+        meta = self.dataset(options)
+        self.stdout.write(
+            f"{meta['vendor']}: {meta['suppliers']} suppliers on {meta['levels']} "
+            f"levels, {meta['products']} products"
+        )
+        previous = baseline.get("meta")
+        if previous and (previous["vendor"], previous["suppliers"]) != (
+            meta["vendor"],
+            meta["suppliers"],
+        ):
+            self.stdout.write(
+                self.style.WARNING(
+                    f"Baseline dataset differs: {previous['vendor']}, "
+                    f"{previous['suppliers']} suppliers"
+                )
+            )
+
+        report = {"meta": meta, "cases": {}}
+        self.admin_client = None
+        admin, created = User.objects.get_or_create(
+            username=ADMIN_USERNAME,
+            defaults={"is_staff": True, "is_superuser": True},
+        )
+        # the test clients send Host: testserver
+        hosts = [*settings.ALLOWED_HOSTS, "testserver"]
+        try:
+            with override_settings(ALLOWED_HOSTS=hosts):
+                problems = self.run_cases(report, baseline, options, admin)
+        finally:
+            if self.admin_client is not None:
+                self.admin_client.logout()
+            if created:
+                admin.delete()
+            if not options["skip_tasks"]:
+                # jobs cached statistics of their rolled back changes
+                refresh_debt_statistics()
+                bump_data_versions(SUPPLIERS)
+
+        if options["save"]:
+            Path(options["save"]).write_text(json.dumps(report, indent=2))
+            self.stdout.write(f"Report saved to {options['save']}")
+        if problems:
+            raise CommandError(f"{problems} failure(s) or regression(s) found")
+        self.stdout.write(self.style.SUCCESS("No failures or regressions"))
@@ -0,0 +1,138 @@
+import json
+import re
+import time
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+)
+from django.db import connection
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from core.apps.retail.models import Supplier
+from core.apps.retail.views import (
+    DebtAboveAverageListView,
+    ProductViewSet,
+    SupplierByProductViewSet,
+    SupplierViewSet,
+)
+
+
+User = get_user_model()
+
+# PostgreSQL "Seq Scan on <table>", SQLite "SCAN <table>" without index
+SEQ_SCAN = re.compile(r"Seq Scan on (\w+)|\bSCAN (\w+)\b(?! USING)")
+
+
+class Command(BaseCommand):
+    help = "Run EXPLAIN ANALYZE for retail view querysets and report regressions"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", help="Username, defaults to a supplier employee")
+        parser.add_argument("--country", help="Country for SupplierViewSet")
+        parser.add_argument("--product-id", type=int, help="SupplierByProductViewSet")
+        parser.add_argument("--baseline", help="JSON file with a previous report")
+        parser.add_argument("--save", help="Write the report to this JSON file")
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=1.5,
+            help="Slowdown factor against baseline reported as regression",
+        )
+        parser.add_argument("--verbose-plans", action="store_true")
+
+    def get_cases(self, options):
+        supplier = Supplier.objects.select_related("contact").filter(
+            employees__isnull=False
+        )
+        if options["user"]:
+            supplier = supplier.filter(employees__username=options["user"])
+        supplier = supplier.first()
+        if supplier is None:
+            raise CommandError("No suppliers with employees, run fill_bd first")
+        users = supplier.employees.all()
+        if options["user"]:
+            users = users.filter(username=options["user"])
+        user = users.first()
+        product = supplier.products.first()
+        country = options["country"] or supplier.contact.country
+        product_id = options["product_id"] or (product.id if product else 0)
+
+        return user, {
+            "suppliers": (SupplierViewSet, "list", {"country": country}),
+            "statistics": (DebtAboveAverageListView, None, {}),
+            "suppliers-by-product": (
+                SupplierByProductViewSet,
+                "list",
+                {"product_id": product_id},
+            ),
+            "products": (ProductViewSet, "list", {}),
+        }
+
+    def build_queryset(self, view_class, action, params, user):
+        request = APIRequestFactory().get("/", params)
+        request.user = user
+        view = view_class()
+        view.request = Request(request)
+        view.request.user = user
+        view.action = action
+        view.format_kwarg = None
+        view.kwargs = {}
+        return view.filter_queryset(view.get_queryset())
+
+    def explain(self, queryset) -> dict:
+        if connection.vendor == "postgresql":
+            plan = queryset.explain(analyze=True, buffers=True)
+            match = re.search(r"Execution Time: ([\d.]+) ms", plan)
+            time_ms = float(match.group(1)) if match else 0.0
+        else:
+            plan = queryset.explain()
+            started = time.perf_counter()
+            list(queryset)
+            time_ms = (time.perf_counter() - started) * 1000
+        seq_scans = sorted(
+            {table for groups in SEQ_SCAN.findall(plan) for table in groups if table}
+        )
+        return {"time_ms": round(time_ms, 3), "seq_scans": seq_scans, "plan": plan}
+
+    def compare(self, name, result, baseline, threshold) -> list[str]:
+        previous = baseline.get(name)
+        if previous is None:
+            return []
+        problems = []
+        if previous["time_ms"] and result["time_ms"] > previous["time_ms"] * threshold:
+            problems.append(f"{previous['time_ms']} ms -> {result['time_ms']} ms")
+        new_scans = set(result["seq_scans"]) - set(previous["seq_scans"])
+        if new_scans:
+            problems.append(f"new sequential scans: {', '.join(sorted(new_scans))}")
+        return problems
+
+    def handle(self, *args, **options):
+        baseline = {}
+        if options["baseline"]:
+            baseline = json.loads(Path(options["baseline"]).read_text())
+
+        user, cases = self.get_cases(options)
+        report, regressions = {}, 0
+        for name, (view_class, action, params) in cases.items():
+            queryset = self.build_queryset(view_class, action, params, user)
+            result = self.explain(queryset)
+            report[name] = result
+
+            scans = ", ".join(result["seq_scans"]) or "-"
+            self.stdout.write(f"{name}: {result['time_ms']} ms, seq scans: {scans}")
+            if options["verbose_plans"]:
+                self.stdout.write(result["plan"])
+            for problem in self.compare(name, result, baseline, options["threshold"]):
+                regressions += 1
+                self.stdout.write(self.style.ERROR(f"  REGRESSION {name}: {problem}"))
+
+        if options["save"]:
+            Path(options["save"]).write_text(json.dumps(report, indent=2))
+            self.stdout.write(f"Report saved to {options['save']}")
+        if regressions:
+            raise CommandError(f"{regressions} regression(s) found")
+        self.stdout.write(self.style.SUCCESS("No regressions"))
@@ -1,22 +1,84 @@
 import random
+import time
+from itertools import chain
+from multiprocessing import Pool
 
 from django.contrib.auth import get_user_model
-from django.core.management.base import BaseCommand
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+)
+from django.core.management.color import no_style
+from django.db import (
+    connection,
+    transaction,
+)
+from django.db.models import Max
 from django.utils import timezone
 
 from faker import Faker
 
+from core.apps.retail.caching import (
+    bump_data_versions,
+    CONTACTS,
+    PRODUCTS,
+    SUPPLIERS,
+)
+from core.apps.retail.choices import DebtTransactionChoices
+from core.apps.retail.debt import (
+    opening_entries,
+    record_debt_change,
+)
 from core.apps.retail.models import (
     Contact,
+    DebtTransaction,
     Product,
     Supplier,
     SupplierChoices,
 )
+from core.apps.retail.statistics import refresh_debt_statistics
 
 
 User = get_user_model()
 fake = Faker("ru_RU")
 
+CHILD_TYPES = [
+    choice for choice in SupplierChoices if choice != SupplierChoices.FACTORY
+]
+
+
+def generate_rows(task: tuple[int, int]) -> list[tuple]:
+    """
+    Worker process: Faker data for `count` suppliers and their contacts.
+    Row: (title, debt, country, city, street, house_number).
+    """
+
+    seed, count = task
+    rng = random.Random(seed)
+    worker_fake = Faker("ru_RU")
+    worker_fake.seed_instance(seed)
+    return [
+        (
+            worker_fake.company()[:50],
+            round(rng.uniform(0, 10000), 2),
+            worker_fake.country()[:100],
+            worker_fake.city()[:100],
+            worker_fake.street_name()[:100],
+            worker_fake.building_number()[:50],
+        )
+        for _ in range(count)
+    ]
+
+
+def level_sizes(total: int, weights: list[float]) -> list[int]:
+    """Splits `total` suppliers between levels proportionally to weights."""
+
+    sizes = [int(total * weight / sum(weights)) for weight in weights]
+    sizes[0] = max(sizes[0], 1)
+    sizes[-1] += total - sum(sizes)
+    return [size for size in sizes if size > 0]
+
 
 class Command(BaseCommand):
     help = "Fill database with fake suppliers data"
@@ -31,8 +93,27 @@ class Command(BaseCommand):
         parser.add_argument(
             "--users", type=int, default=10, help="Number of users to create"
         )
+        parser.add_argument(
+            "--bulk",
+            action="store_true",
+            help="High-volume mode: parallel Faker generation and bulk inserts",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=5000, help="Rows per bulk insert"
+        )
+        parser.add_argument(
+            "--workers", type=int, default=4, help="Processes generating Faker data"
+        )
+        parser.add_argument(
+            "--depth-weights",
+            default="1,10,30,40,19",
+            help="Share of suppliers on each hierarchy level, from factories down",
+        )
 
     def handle(self, *args, **options):
+        if options["bulk"]:
+            return self.handle_bulk(**options)
+
         suppliers_count = options["suppliers"]
         products_count = options["products"]
         users_count = options["users"]
@@ -96,6 +177,7 @@ class Command(BaseCommand):
                 contact=contact,
                 supplier=parent,
             )
+            record_debt_change(supplier, DebtTransactionChoices.OPENING, supplier.debt)
 
             # Добавляем случайных сотрудников (1-3) и продукты (1-5)
             supplier.employees.set(random.sample(users, random.randint(1, 3)))
@@ -114,3 +196,160 @@ class Command(BaseCommand):
                 f"- {suppliers_count} suppliers"
             )
         )
+
+    def report(self, name: str, done: int, total: int, started: float) -> None:
+        rate = done / max(time.perf_counter() - started, 1e-6)
+        self.stdout.write(f"{name}: {done}/{total} ({rate:.0f} rows/s)")
+
+    def create_users(self, count: int) -> list[int]:
+        password = make_password("testpass123")
+        users = [
+            User(
+                username=f"{fake.user_name()}_{index}",
+                email=fake.email(),
+                password=password,
+            )
+            for index in range(count)
+        ]
+        return [user.id for user in User.objects.bulk_create(users, batch_size=1000)]
+
+    def create_products(self, count: int) -> list[int]:
+        products = [
+            Product(
+                name=fake.word().capitalize()[:25],
+                model=fake.bothify(text="??-####"),
+                date_product_release=timezone.make_aware(fake.date_time_this_decade()),
+            )
+            for _ in range(count)
+        ]
+        return [
+            product.id
+            for product in Product.objects.bulk_create(products, batch_size=1000)
+        ]
+
+    def insert_batch(self, rows, parents, level, next_id, user_ids, product_ids):
+        """
+        Inserts contacts, suppliers and M2M rows of one batch.
+        Ids are assigned up front so `path` is written with the row.
+        """
+
+        contacts, suppliers, employees, products = [], [], [], []
+        Employee = Supplier.employees.through
+        SupplierProduct = Supplier.products.through
+        for offset, (title, debt, country, city, street, house) in enumerate(rows):
+            pk = next_id + offset
+            parent_id, parent_path = random.choice(parents) if parents else (None, "")
+            contacts.append(
+                Contact(
+                    id=pk,
+                    email=f"supplier{pk}@{fake.free_email_domain()}",
+                    country=country,
+                    city=city,
+                    street=street,
+                    house_number=house,
+                )
+            )
+            suppliers.append(
+                Supplier(
+                    id=pk,
+                    title=title,
+                    type_supplier=(
+                        SupplierChoices.FACTORY
+                        if level == 0
+                        else random.choice(CHILD_TYPES)
+                    ),
+                    debt=debt,
+                    contact_id=pk,
+                    supplier_id=parent_id,
+                    level=level,
+                    path=f"{parent_path}{pk}/",
+                )
+            )
+            employees.extend(
+                Employee(supplier_id=pk, user_id=user_id)
+                for user_id in random.sample(
+                    user_ids, min(len(user_ids), random.randint(1, 3))
+                )
+            )
+            products.extend(
+                SupplierProduct(supplier_id=pk, product_id=product_id)
+                for product_id in random.sample(
+                    product_ids, min(len(product_ids), random.randint(1, 5))
+                )
+            )
+
+        with transaction.atomic():
+            Contact.objects.bulk_create(contacts)
+            Supplier.objects.bulk_create(suppliers)
+            DebtTransaction.objects.bulk_create(opening_entries(suppliers))
+            Employee.objects.bulk_create(employees)
+            SupplierProduct.objects.bulk_create(products)
+        return [(supplier.id, supplier.path) for supplier in suppliers]
+
+    def handle_bulk(self, **options):
+        total = options["suppliers"]
+        batch_size = options["batch_size"]
+        for name in ("suppliers", "batch_size", "workers"):
+            if options[name] < 1:
+                option = name.replace("_", "-")
+                raise CommandError(f"--{option} must be at least 1")
+        try:
+            weights = [float(weight) for weight in options["depth_weights"].split(",")]
+        except ValueError:
+            raise CommandError("--depth-weights must be comma separated numbers")
+        if min(weights) < 0 or not sum(weights):
+            raise CommandError("--depth-weights must not be negative or all zero")
+
+        started = time.perf_counter()
+        self.stdout.write(f"Creating {options['users']} users...")
+        user_ids = self.create_users(options["users"])
+        self.stdout.write(f"Creating {options['products']} products...")
+        product_ids = self.create_products(options["products"])
+
+        # Explicit ids let a batch be written with its final path in one pass,
+        # sequences are moved past them at the end.
+        next_id = (
+            max(
+                Supplier.objects.aggregate(max_id=Max("id"))["max_id"] or 0,
+                Contact.objects.aggregate(max_id=Max("id"))["max_id"] or 0,
+            )
+            + 1
+        )
+        sizes = level_sizes(total, weights)
+        self.stdout.write(f"Creating {total} suppliers on levels {sizes}...")
+
+        tasks = [
+            (next_id + start, min(batch_size, total - start))
+            for start in range(0, total, batch_size)
+        ]
+        done = 0
+        with Pool(options["workers"]) as pool:
+            rows = chain.from_iterable(pool.imap(generate_rows, tasks))
+            parents = []
+            for level, size in enumerate(sizes):
+                created = []
+                for start in range(0, size, batch_size):
+                    batch = [next(rows) for _ in range(min(batch_size, size - start))]
+                    created += self.insert_batch(
+                        batch, parents, level, next_id, user_ids, product_ids
+                    )
+                    next_id += len(batch)
+                    done += len(batch)
+                    self.report("Suppliers", done, total, started)
+                parents = created
+
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(
+                no_style(), [Contact, Supplier]
+            ):
+                cursor.execute(sql)
+        refresh_debt_statistics()
+        bump_data_versions(CONTACTS, PRODUCTS, SUPPLIERS)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Successfully created {total} suppliers, {len(user_ids)} users "
+                f"and {len(product_ids)} products "
+                f"in {time.perf_counter() - started:.1f} s"
+            )
+        )
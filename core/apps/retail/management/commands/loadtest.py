@@ -0,0 +1,144 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.client import (
+    HTTPConnection,
+    HTTPException,
+    HTTPSConnection,
+)
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+)
+from rest_framework.authtoken.models import Token
+
+from core.apps.retail.metrics import percentile
+
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test read endpoints of running deployments at growing concurrency, "
+        "e.g. WSGI (gunicorn core.project.wsgi) against ASGI "
+        "(uvicorn core.project.asgi:application) with the same worker count"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--target",
+            action="append",
+            required=True,
+            help="LABEL=BASE_URL, e.g. wsgi=http://127.0.0.1:8000/api/ "
+            "asgi=http://127.0.0.1:8001/api/async/",
+        )
+        parser.add_argument(
+            "--path",
+            action="append",
+            help="Path relative to target, defaults to products/ and statistics/",
+        )
+        parser.add_argument("--user", help="Username, token is created if missing")
+        parser.add_argument("--token", help="Token key, instead of --user")
+        parser.add_argument("--concurrency", default="1,8,32,64")
+        parser.add_argument(
+            "--requests", type=int, default=200, help="Requests per level"
+        )
+        parser.add_argument("--timeout", type=float, default=30)
+        parser.add_argument("--save", help="Write the report to this JSON file")
+
+    def get_token(self, options) -> str:
+        if options["token"]:
+            return options["token"]
+        if not options["user"]:
+            raise CommandError("Pass --user or --token")
+        user = User.objects.filter(username=options["user"]).first()
+        if user is None:
+            raise CommandError(f"No user {options['user']}")
+        return Token.objects.get_or_create(user=user)[0].key
+
+    def run_level(self, url, token, concurrency, total, timeout) -> dict:
+        local = threading.local()
+        parts = urlsplit(url)
+        path = f"{parts.path}?{parts.query}" if parts.query else parts.path
+        headers = {"Authorization": f"Token {token}"}
+
+        def fetch(_):
+            # one keep-alive connection per thread, reopened after errors
+            if not hasattr(local, "connection"):
+                connection_class = (
+                    HTTPSConnection if parts.scheme == "https" else HTTPConnection
+                )
+                local.connection = connection_class(parts.netloc, timeout=timeout)
+            started = time.perf_counter()
+            try:
+                local.connection.request("GET", path, headers=headers)
+                response = local.connection.getresponse()
+                response.read()
+                ok = response.status == 200
+            except (HTTPException, OSError):
+                local.connection.close()
+                ok = False
+            return time.perf_counter() - started, ok
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            results = list(pool.map(fetch, range(total)))
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(latency * 1000 for latency, ok in results if ok)
+        return {
+            "concurrency": concurrency,
+            "rps": round(len(latencies) / elapsed, 1),
+            "p50_ms": round(percentile(latencies, 50), 1),
+            "p95_ms": round(percentile(latencies, 95), 1),
+            "p99_ms": round(percentile(latencies, 99), 1),
+            "errors": sum(not ok for _, ok in results),
+        }
+
+    def handle(self, *args, **options):
+        token = self.get_token(options)
+        paths = options["path"] or ["products/", "statistics/"]
+        levels = [int(level) for level in options["concurrency"].split(",")]
+
+        report = {}
+        for target in options["target"]:
+            label, _, base_url = target.partition("=")
+            if not base_url:
+                raise CommandError(f"Target must be LABEL=BASE_URL, got {target}")
+            for path in paths:
+                name = f"{label} {path}"
+                self.stdout.write(name)
+                rows = []
+                for concurrency in levels:
+                    row = self.run_level(
+                        base_url + path,
+                        token,
+                        concurrency,
+                        options["requests"],
+                        options["timeout"],
+                    )
+                    row["scaling"] = (
+                        round(row["rps"] / rows[0]["rps"], 2)
+                        if rows and rows[0]["rps"]
+                        else 1.0
+                    )
+                    rows.append(row)
+                    self.stdout.write(
+                        f"  c={concurrency:<4} {row['rps']:>8} rps"
+                        f"  p50 {row['p50_ms']} ms  p95 {row['p95_ms']} ms"
+                        f"  p99 {row['p99_ms']} ms  x{row['scaling']}"
+                        f"  errors {row['errors']}"
+                    )
+                report[name] = rows
+
+        if options["save"]:
+            Path(options["save"]).write_text(json.dumps(report, indent=2))
+            self.stdout.write(f"Report saved to {options['save']}")
+        if any(row["errors"] for rows in report.values() for row in rows):
+            self.stdout.write(self.style.WARNING("Some requests failed"))
@@ -0,0 +1,65 @@
+from django.conf import settings
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+)
+
+from core.apps.retail.partitions import (
+    archive_horizon,
+    archive_partitions,
+    create_partitions,
+    is_supported,
+    list_partitions,
+    PARTITIONED,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Maintain monthly partitions of the debt ledger and supplier events: "
+        "create partitions ahead, detach and archive old ones (PostgreSQL)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ahead",
+            type=int,
+            default=settings.RETAIL_PARTITIONS_AHEAD,
+            help="Months to create ahead of the current one",
+        )
+        parser.add_argument(
+            "--archive",
+            action="store_true",
+            help="Detach partitions older than --retain months",
+        )
+        parser.add_argument(
+            "--retain",
+            type=int,
+            default=settings.RETAIL_PARTITIONS_RETAIN,
+            help="Months kept attached with --archive",
+        )
+        parser.add_argument(
+            "--drop",
+            action="store_true",
+            help="Drop detached partitions instead of moving them "
+            f"to the {settings.RETAIL_PARTITIONS_ARCHIVE_SCHEMA} schema",
+        )
+        parser.add_argument("--list", action="store_true", help="Only list partitions")
+
+    def handle(self, *args, **options):
+        if not is_supported():
+            raise CommandError("Партиционирование доступно только для PostgreSQL")
+
+        for model, column in PARTITIONED:
+            table = model._meta.db_table
+            self.stdout.write(f"{table} (by {column})")
+            if not options["list"]:
+                for name in create_partitions(table, options["ahead"]):
+                    self.stdout.write(self.style.SUCCESS(f"  created {name}"))
+                if options["archive"]:
+                    before = archive_horizon(model, options["retain"])
+                    for name in archive_partitions(table, before, options["drop"]):
+                        action = "dropped" if options["drop"] else "archived"
+                        self.stdout.write(self.style.WARNING(f"  {action} {name}"))
+            for name, month in list_partitions(table):
+                self.stdout.write(f"  {name}  {month:%Y-%m}")
@@ -0,0 +1,56 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from core.apps.retail.telemetry import (
+    reset_task_metrics,
+    task_metrics,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Show telemetry of retail Celery tasks: runs, wall time, SQL queries, "
+        "rows written, rows per second and queue lag"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--json", action="store_true", help="Print raw JSON")
+        parser.add_argument(
+            "--histograms", action="store_true", help="Print duration and lag buckets"
+        )
+        parser.add_argument(
+            "--reset", action="store_true", help="Reset telemetry after printing"
+        )
+
+    def handle(self, *args, **options):
+        metrics = task_metrics()
+        if options["json"]:
+            self.stdout.write(json.dumps(metrics, indent=2))
+        else:
+            self.print_metrics(metrics, options["histograms"])
+
+        if options["reset"]:
+            reset_task_metrics()
+            self.stdout.write(self.style.WARNING("Telemetry reset"))
+
+    def print_metrics(self, metrics, histograms):
+        if not metrics:
+            self.stdout.write("No task runs recorded")
+        for row in metrics:
+            lag = row["avg_lag_seconds"]
+            self.stdout.write(
+                f"{row['task']:<24} runs {row['runs']:>6}  failed {row['failures']:>4}"
+                f"  avg {row['avg_seconds']:>9.3f} s  p90 <= {row['duration']['p90']} s"
+                f"  queries {row['queries']:>8}  rows {row['rows']:>9}"
+                f"  {row['rows_per_second'] or 0:>10.1f} rows/s"
+                f"  lag {'-' if lag is None else f'{lag:.3f} s'}"
+            )
+            if histograms:
+                for histogram in ("duration", "lag"):
+                    buckets = "  ".join(
+                        f"<={bound}: {count}"
+                        for bound, count in row[histogram]["buckets"].items()
+                        if count
+                    )
+                    self.stdout.write(f"  {histogram:<8} {buckets or '-'}")
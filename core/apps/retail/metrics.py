@@ -0,0 +1,155 @@
+import logging
+import re
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+from .statistics import PERCENTILES
+
+
+# Request metrics per resolved URL name, kept in memory of the process.
+# Every endpoint keeps the last `RETAIL_METRICS_WINDOW` samples of
+# query count, DB time, serialization (response rendering) time and total
+# latency; percentiles are computed on read. Samples are recorded by
+# `RequestMetricsMiddleware`, query budgets are checked on record.
+# Reads are keyed by the URL name, writes by `<URL name>:<METHOD>`, so
+# budgets of reads do not apply to writes, which can have their own.
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ("queries", "db_ms", "serialize_ms", "total_ms")
+
+_samples: dict[str, deque] = {}
+_requests: dict[str, int] = {}
+_lock = threading.Lock()
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised when `RETAIL_QUERY_BUDGET_RAISE` is on, fails the test client request."""
+
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+WRITE_KEYWORDS = ("INSERT", "UPDATE", "DELETE", "MERGE")
+
+_FIRST_KEYWORD = re.compile(r"\s*(\w+)")
+# INSERT / UPDATE / DELETE inside WITH, `FOR UPDATE` locks do not match
+_DATA_MODIFYING = re.compile(
+    r"\bINSERT\s+INTO\b|\bDELETE\s+FROM\b|\bUPDATE\s+\S+(?:\s+AS)?(?:\s+\S+)?\s+SET\b",
+    re.IGNORECASE,
+)
+
+
+def is_write(sql: str) -> bool:
+    """DML or a data-modifying WITH, not reads, SAVEPOINT and other statements."""
+
+    match = _FIRST_KEYWORD.match(sql)
+    keyword = match.group(1).upper() if match else ""
+    if keyword == "WITH":
+        return _DATA_MODIFYING.search(sql) is not None
+    return keyword in WRITE_KEYWORDS
+
+
+class QueryTimer:
+    """
+    `connection.execute_wrapper` counting queries, their time
+    and rows written by DML statements.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.rows = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            result = execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.seconds += time.perf_counter() - started
+        if is_write(sql):
+            self.rows += max(context["cursor"].rowcount, 0)
+        return result
+
+
+def query_budget(view_name: str) -> int | None:
+    return settings.RETAIL_QUERY_BUDGETS.get(view_name)
+
+
+def check_budget(view_name: str, queries: int) -> bool:
+    """Logs, or raises in tests, when the view runs more queries than allowed."""
+
+    budget = query_budget(view_name)
+    if budget is None or queries <= budget:
+        return True
+    message = f"{view_name}: {queries} SQL-запросов при бюджете {budget}"
+    if settings.RETAIL_QUERY_BUDGET_RAISE:
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
+    return False
+
+
+def record(view_name: str, sample: dict) -> None:
+    with _lock:
+        samples = _samples.get(view_name)
+        if samples is None:
+            samples = _samples[view_name] = deque(maxlen=settings.RETAIL_METRICS_WINDOW)
+        samples.append(sample)
+        _requests[view_name] = _requests.get(view_name, 0) + 1
+
+
+def reset_metrics() -> None:
+    with _lock:
+        _samples.clear()
+        _requests.clear()
+
+
+def metrics_key(view_name: str, method: str) -> str:
+    if method in SAFE_METHODS:
+        return view_name
+    return f"{view_name}:{method}"
+
+
+def percentile(values: list, percent: int):
+    """Nearest-rank percentile of sorted values: the ceil(n * p / 100)-th."""
+
+    if not values:
+        return 0.0
+    return values[max(0, -(-len(values) * percent // 100) - 1)]
+
+
+def percentiles(values: list) -> dict:
+    """Nearest-rank percentiles and maximum of a window."""
+
+    values = sorted(values)
+    result = {f"p{p}": percentile(values, p) for p in PERCENTILES}
+    result["max"] = values[-1]
+    return result
+
+
+def metrics_snapshot() -> list[dict]:
+    """Percentiles of every endpoint, the slowest by p90 latency first."""
+
+    with _lock:
+        windows = {name: list(samples) for name, samples in _samples.items()}
+        requests = dict(_requests)
+
+    snapshot = []
+    for name, samples in windows.items():
+        budget = query_budget(name)
+        row = {
+            "view": name,
+            "requests": requests[name],
+            "window": len(samples),
+            "budget": budget,
+            "over_budget": sum(
+                budget is not None and sample["queries"] > budget for sample in samples
+            ),
+        }
+        for field in FIELDS:
+            row[field] = percentiles([sample[field] for sample in samples])
+        snapshot.append(row)
+    return sorted(snapshot, key=lambda row: row["total_ms"]["p90"], reverse=True)
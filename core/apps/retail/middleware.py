@@ -0,0 +1,98 @@
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+from asgiref.sync import (
+    iscoroutinefunction,
+    markcoroutinefunction,
+    sync_to_async,
+)
+
+from .metrics import (
+    check_budget,
+    metrics_key,
+    QueryTimer,
+    record,
+)
+
+
+def _install(timer: QueryTimer) -> None:
+    connection.execute_wrappers.append(timer)
+
+
+def _uninstall(timer: QueryTimer) -> None:
+    connection.execute_wrappers.remove(timer)
+
+
+class RequestMetricsMiddleware:
+    """
+    Records query count, DB time, response rendering time and total latency
+    of every request per resolved URL name (and method of writes) and
+    checks query budgets,
+    see metrics.py. Should be the first middleware.
+    Under ASGI the query timer is installed in the thread that runs the
+    request's sync and async ORM calls.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.RETAIL_METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        started = time.perf_counter()
+        timer = QueryTimer()
+        with connection.execute_wrapper(timer):
+            response = self.get_response(request)
+        self.finish(request, started, timer)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        timer = QueryTimer()
+        await sync_to_async(_install)(timer)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(_uninstall)(timer)
+        self.finish(request, started, timer)
+        return response
+
+    def process_template_response(self, request, response):
+        """DRF responses are rendered after the view, the rendering is timed."""
+
+        started = time.perf_counter()
+
+        def rendered(response):
+            request.metrics_serialize = time.perf_counter() - started
+
+        response.add_post_render_callback(rendered)
+        return response
+
+    def finish(self, request, started: float, timer: QueryTimer) -> None:
+        if request.resolver_match is None:
+            return
+        view_name = metrics_key(request.resolver_match.view_name, request.method)
+        record(
+            view_name,
+            {
+                "queries": timer.queries,
+                "db_ms": round(timer.seconds * 1000, 3),
+                "serialize_ms": round(
+                    getattr(request, "metrics_serialize", 0) * 1000, 3
+                ),
+                "total_ms": round((time.perf_counter() - started) * 1000, 3),
+            },
+        )
+        check_budget(view_name, timer.queries)
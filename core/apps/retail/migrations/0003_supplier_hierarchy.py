@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:09
+
+from django.db import (
+    migrations,
+    models,
+)
+
+
+def fill_hierarchy(apps, schema_editor):
+    """Builds path and level for existing suppliers, one tree level at a time."""
+
+    Supplier = apps.get_model("retail", "Supplier")
+    parents = {}
+    level = 0
+    queryset = Supplier.objects.filter(supplier__isnull=True)
+    while True:
+        suppliers = list(queryset.only("id", "supplier_id"))
+        if not suppliers:
+            break
+        for supplier in suppliers:
+            supplier.path = f"{parents.get(supplier.supplier_id, '')}{supplier.id}/"
+            supplier.level = level
+        Supplier.objects.bulk_update(suppliers, ["path", "level"], batch_size=1000)
+        parents = {supplier.id: supplier.path for supplier in suppliers}
+        queryset = Supplier.objects.filter(supplier_id__in=list(parents))
+        level += 1
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("retail", "0002_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="supplier",
+            name="level",
+            field=models.PositiveIntegerField(
+                db_index=True, default=0, editable=False, verbose_name="Уровень"
+            ),
+        ),
+        migrations.AddField(
+            model_name="supplier",
+            name="path",
+            field=models.TextField(
+                db_index=True,
+                default="",
+                editable=False,
+                verbose_name="Путь в иерархии",
+            ),
+        ),
+        migrations.RunPython(fill_hierarchy, migrations.RunPython.noop),
+    ]
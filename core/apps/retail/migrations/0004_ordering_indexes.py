@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:12
+
+from django.conf import settings
+from django.db import (
+    migrations,
+    models,
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("retail", "0003_supplier_hierarchy"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="product",
+            options={
+                "ordering": ["-date_product_release", "-id"],
+                "verbose_name": "Продукт",
+                "verbose_name_plural": "Продукты",
+            },
+        ),
+        migrations.AlterModelOptions(
+            name="supplier",
+            options={
+                "ordering": ["-created", "-debt", "title", "-id"],
+                "verbose_name": "Поставщик",
+                "verbose_name_plural": "Поставщики",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["-date_product_release", "-id"], name="product_ordering_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="supplier",
+            index=models.Index(
+                fields=["-created", "-debt", "title", "-id"],
+                name="supplier_ordering_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:16
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import (
+    migrations,
+    models,
+)
+
+
+# Auto-created M2M tables only get single-column FK indexes and a
+# (supplier_id, <other>_id) unique constraint. Reverse lookups
+# `employees=user` and `products__id=...` need the other column first.
+THROUGH_INDEXES = (
+    ("retail_supplier_employees_user_idx", "retail_supplier_employees", "user_id"),
+    ("retail_supplier_products_product_idx", "retail_supplier_products", "product_id"),
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("retail", "0004_ordering_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="contact",
+            index=models.Index(
+                django.db.models.functions.text.Upper("country"),
+                name="contact_country_upper_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="contact",
+            index=models.Index(fields=["city"], name="contact_city_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="supplier",
+            index=models.Index(fields=["debt"], name="supplier_debt_idx"),
+        ),
+    ] + [
+        migrations.RunSQL(
+            f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({column}, supplier_id)",
+            f"DROP INDEX IF EXISTS {name}",
+        )
+        for name, table, column in THROUGH_INDEXES
+    ]
@@ -0,0 +1,138 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:39
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import (
+    migrations,
+    models,
+)
+
+
+def open_ledger(apps, schema_editor):
+    """
+    Opening ledger entries of current balances, one INSERT ... SELECT.
+    Dated now: earlier balances are unknown, not equal to today's.
+    """
+
+    Supplier = apps.get_model("retail", "Supplier")
+    DebtTransaction = apps.get_model("retail", "DebtTransaction")
+    quote_name = schema_editor.quote_name
+    schema_editor.execute(
+        f"INSERT INTO {quote_name(DebtTransaction._meta.db_table)} "
+        "(supplier_id, kind, amount, created) "
+        "SELECT id, 0, debt, CURRENT_TIMESTAMP "
+        f"FROM {quote_name(Supplier._meta.db_table)} "
+        "WHERE debt <> 0"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("retail", "0005_filter_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DebtSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "balance",
+                    models.DecimalField(
+                        decimal_places=2, max_digits=20, verbose_name="Задолженность"
+                    ),
+                ),
+                ("taken_at", models.DateTimeField(verbose_name="Дата среза")),
+                (
+                    "supplier",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="debt_snapshots",
+                        to="retail.supplier",
+                        verbose_name="Поставщик",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Срез задолженности",
+                "verbose_name_plural": "Срезы задолженности",
+                "indexes": [
+                    models.Index(fields=["taken_at"], name="debt_snapshot_taken_at_idx")
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("supplier", "taken_at"), name="debt_snapshot_unique"
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="DebtTransaction",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.IntegerField(
+                        choices=[
+                            (0, "Начальный остаток"),
+                            (1, "Увеличение"),
+                            (2, "Уменьшение"),
+                            (3, "Обнуление"),
+                            (4, "Корректировка"),
+                        ],
+                        verbose_name="Тип операции",
+                    ),
+                ),
+                (
+                    "amount",
+                    models.DecimalField(
+                        decimal_places=2, max_digits=20, verbose_name="Сумма"
+                    ),
+                ),
+                (
+                    "created",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now, verbose_name="Дата операции"
+                    ),
+                ),
+                (
+                    "supplier",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="debt_transactions",
+                        to="retail.supplier",
+                        verbose_name="Поставщик",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Операция по задолженности",
+                "verbose_name_plural": "Операции по задолженности",
+                "indexes": [
+                    models.Index(
+                        fields=["supplier", "created"],
+                        name="debt_tx_supplier_created_idx",
+                    ),
+                    models.Index(fields=["created"], name="debt_tx_created_idx"),
+                ],
+            },
+        ),
+        migrations.RunPython(open_ledger, migrations.RunPython.noop),
+    ]
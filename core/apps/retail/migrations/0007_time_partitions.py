@@ -0,0 +1,182 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:44
+
+from datetime import (
+    datetime,
+    timedelta,
+    timezone as dt_timezone,
+)
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import (
+    migrations,
+    models,
+)
+
+
+# Frozen copy of the conversion, later edits of app code must not change it.
+
+
+def _month_start(moment: datetime) -> datetime:
+    moment = moment.astimezone(dt_timezone.utc)
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _next_month(moment: datetime) -> datetime:
+    return _month_start(_month_start(moment) + timedelta(days=32))
+
+
+def partition_table(schema_editor, table: str, column: str, until: datetime) -> None:
+    """
+    Converts a regular table into a table partitioned by month of `column`.
+    Partitions `<table>_pYYYYMM` are created from the first row up to `until`
+    or the last row, later rows land in `<table>_default` until their
+    partition is created. The identity `id` column is kept, its sequence
+    continues after the copied rows. Primary key becomes (id, column):
+    a partitioned table can only have unique keys containing the partition
+    key. Indexes and foreign keys are re-created with the same names.
+    """
+
+    quote_name = schema_editor.quote_name
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT indexname, indexdef FROM pg_indexes "
+            "WHERE schemaname = current_schema() AND tablename = %s",
+            [table],
+        )
+        indexes = [
+            definition
+            for name, definition in cursor.fetchall()
+            if not name.endswith("_pkey")
+        ]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype = 'f'",
+            [quote_name(table)],
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(
+            f"SELECT MIN({quote_name(column)}), MAX({quote_name(column)}), MAX(id) "
+            f"FROM {quote_name(table)}"
+        )
+        first, last, max_id = cursor.fetchone()
+
+    new_table = f"{table}_partitioned"
+    schema_editor.execute(
+        f"CREATE TABLE {quote_name(new_table)} "
+        f"(LIKE {quote_name(table)} INCLUDING DEFAULTS INCLUDING IDENTITY) "
+        f"PARTITION BY RANGE ({quote_name(column)})"
+    )
+    month = _month_start(first or django.utils.timezone.now())
+    while month <= max(until, last or until):
+        # DDL takes no parameters, bounds are our own month starts
+        schema_editor.execute(
+            f"CREATE TABLE {quote_name(f'{table}_p{month:%Y%m}')} "
+            f"PARTITION OF {quote_name(new_table)} "
+            f"FOR VALUES FROM ('{month.isoformat()}') "
+            f"TO ('{_next_month(month).isoformat()}')"
+        )
+        month = _next_month(month)
+    schema_editor.execute(
+        f"CREATE TABLE {quote_name(f'{table}_default')} "
+        f"PARTITION OF {quote_name(new_table)} DEFAULT"
+    )
+    schema_editor.execute(
+        f"INSERT INTO {quote_name(new_table)} SELECT * FROM {quote_name(table)}"
+    )
+
+    schema_editor.execute(f"DROP TABLE {quote_name(table)}")
+    schema_editor.execute(
+        f"ALTER TABLE {quote_name(new_table)} RENAME TO {quote_name(table)}"
+    )
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [quote_name(table)])
+        (sequence,) = cursor.fetchone()
+    schema_editor.execute(
+        f"ALTER SEQUENCE {sequence} RENAME TO {quote_name(f'{table}_id_seq')}"
+    )
+    if max_id is not None:
+        schema_editor.execute(
+            "SELECT setval(pg_get_serial_sequence(%s, 'id'), %s)",
+            [quote_name(table), max_id],
+        )
+    schema_editor.execute(
+        f"ALTER TABLE {quote_name(table)} "
+        f"ADD PRIMARY KEY (id, {quote_name(column)})"
+    )
+    for definition in indexes:
+        schema_editor.execute(definition)
+    for name, definition in foreign_keys:
+        schema_editor.execute(
+            f"ALTER TABLE {quote_name(table)} "
+            f"ADD CONSTRAINT {quote_name(name)} {definition}"
+        )
+
+
+def partition_time_series(apps, schema_editor):
+    """Monthly range partitions of the debt ledger and supplier events."""
+
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    until = _month_start(django.utils.timezone.now())
+    for _ in range(settings.RETAIL_PARTITIONS_AHEAD):
+        until = _next_month(until)
+    for model_name in ("DebtTransaction", "SupplierEvent"):
+        model = apps.get_model("retail", model_name)
+        partition_table(schema_editor, model._meta.db_table, "created", until)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("retail", "0006_debt_ledger"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SupplierEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("supplier_id", models.BigIntegerField(verbose_name="Поставщик")),
+                (
+                    "action",
+                    models.IntegerField(
+                        choices=[
+                            (0, "Создан"),
+                            (1, "Изменен"),
+                            (2, "Перемещен"),
+                            (3, "Удален"),
+                        ],
+                        verbose_name="Событие",
+                    ),
+                ),
+                ("changes", models.JSONField(default=dict, verbose_name="Изменения")),
+                (
+                    "created",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now, verbose_name="Дата события"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Событие поставщика",
+                "verbose_name_plural": "События поставщиков",
+                "indexes": [
+                    models.Index(
+                        fields=["supplier_id", "created"],
+                        name="supplier_event_supplier_idx",
+                    ),
+                    models.Index(fields=["created"], name="supplier_event_created_idx"),
+                ],
+            },
+        ),
+        migrations.RunPython(partition_time_series, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,112 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:47
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import (
+    migrations,
+    models,
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("retail", "0007_time_partitions"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DebtJob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now,
+                        editable=False,
+                        verbose_name="Дата создания",
+                    ),
+                ),
+                (
+                    "updated",
+                    models.DateTimeField(auto_now=True, verbose_name="Дата обновления"),
+                ),
+                (
+                    "kind",
+                    models.IntegerField(
+                        choices=[
+                            (0, "Начальный остаток"),
+                            (1, "Увеличение"),
+                            (2, "Уменьшение"),
+                            (3, "Обнуление"),
+                            (4, "Корректировка"),
+                        ],
+                        verbose_name="Операция",
+                    ),
+                ),
+                ("spec", models.JSONField(verbose_name="Выборка поставщиков")),
+                (
+                    "status",
+                    models.IntegerField(
+                        choices=[
+                            (0, "В очереди"),
+                            (1, "Выполняется"),
+                            (2, "Завершено"),
+                            (3, "Ошибка"),
+                        ],
+                        default=0,
+                        verbose_name="Статус",
+                    ),
+                ),
+                (
+                    "total",
+                    models.PositiveIntegerField(
+                        blank=True, null=True, verbose_name="Всего"
+                    ),
+                ),
+                (
+                    "processed",
+                    models.PositiveIntegerField(default=0, verbose_name="Обработано"),
+                ),
+                (
+                    "changed",
+                    models.PositiveIntegerField(default=0, verbose_name="Изменено"),
+                ),
+                (
+                    "last_id",
+                    models.BigIntegerField(default=0, verbose_name="Последний id"),
+                ),
+                ("error", models.TextField(blank=True, verbose_name="Ошибка")),
+                (
+                    "author",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Автор",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Задача по задолженности",
+                "verbose_name_plural": "Задачи по задолженности",
+                "ordering": ["-created"],
+                "indexes": [
+                    models.Index(
+                        fields=["status", "updated"], name="debt_job_status_idx"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,100 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:51
+
+import django.db.models.deletion
+from django.db import (
+    migrations,
+    models,
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("retail", "0008_debt_jobs"),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name="debtjob",
+            name="last_id",
+        ),
+        migrations.AddField(
+            model_name="debtjob",
+            name="high",
+            field=models.DecimalField(
+                blank=True,
+                decimal_places=2,
+                max_digits=20,
+                null=True,
+                verbose_name="Сумма до",
+            ),
+        ),
+        migrations.AddField(
+            model_name="debtjob",
+            name="low",
+            field=models.DecimalField(
+                blank=True,
+                decimal_places=2,
+                max_digits=20,
+                null=True,
+                verbose_name="Сумма от",
+            ),
+        ),
+        migrations.CreateModel(
+            name="DebtJobChunk",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("first_id", models.BigIntegerField(verbose_name="Первый id")),
+                ("last_id", models.BigIntegerField(verbose_name="Последний id")),
+                (
+                    "rows",
+                    models.PositiveIntegerField(default=0, verbose_name="Обработано"),
+                ),
+                (
+                    "entries",
+                    models.PositiveIntegerField(default=0, verbose_name="Изменено"),
+                ),
+                (
+                    "worker",
+                    models.CharField(
+                        blank=True, max_length=255, verbose_name="Исполнитель"
+                    ),
+                ),
+                (
+                    "started",
+                    models.DateTimeField(blank=True, null=True, verbose_name="Начало"),
+                ),
+                (
+                    "finished",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Окончание"
+                    ),
+                ),
+                (
+                    "job",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="chunks",
+                        to="retail.debtjob",
+                        verbose_name="Задача",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Часть задачи по задолженности",
+                "verbose_name_plural": "Части задачи по задолженности",
+                "ordering": ["first_id"],
+                "indexes": [
+                    models.Index(fields=["job", "finished"], name="debt_job_chunk_idx")
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:55
+
+from django.db import (
+    migrations,
+    models,
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("retail", "0009_debt_job_chunks"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="debtjob",
+            name="shards",
+            field=models.PositiveSmallIntegerField(default=1, verbose_name="Шардов"),
+        ),
+        migrations.AddField(
+            model_name="debtjobchunk",
+            name="shard",
+            field=models.PositiveSmallIntegerField(default=0, verbose_name="Шард"),
+        ),
+    ]
@@ -1,13 +1,77 @@
+from django.conf import settings
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models import (
+    F,
+    Func,
+    Max,
+    OuterRef,
+    Subquery,
+    Value,
+)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import (
+    Concat,
+    Substr,
+    Upper,
+)
 from django.utils import timezone
 from rest_framework.exceptions import ValidationError
 
-from core.apps.retail.choices import SupplierChoices
+from core.apps.retail.choices import (
+    DebtJobStatusChoices,
+    DebtTransactionChoices,
+    SupplierChoices,
+    SupplierEventChoices,
+)
 from core.apps.retail.mixins import CreatedUpdatedMixin
+from core.apps.retail.network import (
+    ancestors_sql,
+    subtree_sql,
+)
 from core.apps.users.models import User
 
 
+class SupplierQuerySet(models.QuerySet):
+    """Hierarchy helpers built on materialized `path` and `level`."""
+
+    def descendants(self, supplier: "Supplier", include_self: bool = False):
+        """Whole subtree of supplier with one `path LIKE 'x/%'` filter."""
+
+        queryset = self.filter(path__startswith=supplier.path)
+        return queryset if include_self else queryset.exclude(pk=supplier.pk)
+
+    def ancestors(self, supplier: "Supplier", include_self: bool = False):
+        """Ancestor chain of supplier, ids are taken from its path."""
+
+        ids = supplier.ancestor_ids
+        if include_self:
+            ids.append(supplier.pk)
+        return self.filter(pk__in=ids).order_by("level")
+
+    def subtree(self, supplier_id: int, max_depth: int | None = None):
+        """Subtree (root included) resolved by a recursive CTE subquery."""
+
+        return self.filter(pk__in=RawSQL(*subtree_sql(supplier_id, max_depth)))
+
+    def ancestor_chain(self, supplier_id: int, max_depth: int | None = None):
+        """Ancestor chain (node included) resolved by a recursive CTE subquery."""
+
+        return self.filter(pk__in=RawSQL(*ancestors_sql(supplier_id, max_depth)))
+
+    def with_descendants_count(self):
+        """Annotates `descendants_count` with a correlated subquery."""
+
+        subtree = (
+            Supplier.objects.filter(path__startswith=OuterRef("path"))
+            .exclude(pk=OuterRef("pk"))
+            .order_by()
+            .annotate(count=Func(F("pk"), function="COUNT"))
+            .values("count")
+        )
+        return self.annotate(descendants_count=Subquery(subtree))
+
+
 class Supplier(CreatedUpdatedMixin, models.Model):
     """Retail network Supplier model"""
 
@@ -38,6 +102,20 @@ class Supplier(CreatedUpdatedMixin, models.Model):
     products = models.ManyToManyField(
         "Product", related_name="network_nodes", verbose_name="Доступные продукты"
     )
+    # Materialized hierarchy, maintained by signals (see signals.py)
+    level = models.PositiveIntegerField(
+        default=0, editable=False, db_index=True, verbose_name="Уровень"
+    )
+    # unbounded: a deep chain of 7-digit ids outgrows any varchar limit,
+    # on PostgreSQL db_index adds a text_pattern_ops index for startswith
+    path = models.TextField(
+        default="",
+        editable=False,
+        db_index=True,
+        verbose_name="Путь в иерархии",
+    )  # ids from root to self: "1/5/9/"
+
+    objects = SupplierQuerySet.as_manager()
 
     def __str__(self):
         return f"{self.title}"
@@ -45,25 +123,122 @@ class Supplier(CreatedUpdatedMixin, models.Model):
     class Meta:
         verbose_name = "Поставщик"
         verbose_name_plural = "Поставщики"
-        ordering = ["-created", "-debt", "title"]
+        ordering = ["-created", "-debt", "title", "-id"]
+        indexes = [
+            models.Index(
+                fields=["-created", "-debt", "title", "-id"],
+                name="supplier_ordering_idx",
+            ),
+            models.Index(fields=["debt"], name="supplier_debt_idx"),
+        ]
+
+    # fields recorded in `SupplierEvent`, debt history is `DebtTransaction`
+    HISTORY_FIELDS = ("title", "type_supplier", "supplier_id", "contact_id")
 
     def clean(self):
         """Validate supplier hierarchy."""
 
         if self.type_supplier == SupplierChoices.FACTORY and self.supplier:
             raise ValidationError("Завод не может иметь поставщика!")
+        if self.pk and self.supplier and self.supplier.path.startswith(self.path):
+            raise ValidationError("Поставщик не может быть своим потомком!")
+        if (
+            self.supplier
+            and self.supplier.level + 1 + self.subtree_depth()
+            > settings.RETAIL_SUPPLIER_MAX_LEVEL
+        ):
+            raise ValidationError(
+                "Иерархия не может быть глубже "
+                f"{settings.RETAIL_SUPPLIER_MAX_LEVEL} уровней."
+            )
 
-    @property
-    def level(self) -> int:
-        if self.type_supplier == SupplierChoices.FACTORY:
+    def subtree_depth(self) -> int:
+        """Levels below the supplier, 0 for a leaf or an unsaved one."""
+
+        if not self.path:
             return 0
+        deepest = Supplier.objects.filter(path__startswith=self.path).aggregate(
+            deepest=Max("level")
+        )["deepest"]
+        return (deepest or self.level) - self.level
+
+    def sync_path(self) -> None:
+        """
+        Recomputes materialized `path` and `level` from the parent.
+        When the node moved, its whole subtree is re-leveled with one UPDATE.
+        Refuses a move under the node's own subtree.
+        """
+
+        parent_path, parent_level = "", -1
+        if self.supplier_id:
+            parent_path, parent_level = Supplier.objects.values_list(
+                "path", "level"
+            ).get(pk=self.supplier_id)
+
+        old_path, old_level = self.path, self.level
+        if old_path and parent_path.startswith(old_path):
+            # the subtree would be rewritten under itself
+            raise ValidationError("Поставщик не может быть своим потомком!")
+        new_path, new_level = f"{parent_path}{self.pk}/", parent_level + 1
+        if old_path == new_path and old_level == new_level:
+            return
+
+        Supplier.objects.filter(pk=self.pk).update(path=new_path, level=new_level)
+        if old_path:
+            Supplier.objects.filter(path__startswith=old_path).exclude(
+                pk=self.pk
+            ).update(
+                path=Concat(Value(new_path), Substr("path", len(old_path) + 1)),
+                level=F("level") + (new_level - old_level),
+            )
+        self.path, self.level = new_path, new_level
 
-        level = 0
-        current = self
-        while current.supplier:
-            level += 1
-            current = current.supplier
-        return level
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        loaded = dict(zip(field_names, values))
+        instance._loaded_values = {
+            name: value for name, value in loaded.items() if name in cls.HISTORY_FIELDS
+        }
+        if "type_supplier" in loaded and "debt" in loaded:
+            # running debt statistics, see `supplier_debt_deltas`
+            instance._loaded_debt = loaded["type_supplier"], loaded["debt"]
+        return instance
+
+    def change_event(self, created: bool = False) -> "SupplierEvent | None":
+        """
+        Unsaved change event of tracked fields against values loaded
+        from the database, None when nothing tracked changed.
+        """
+
+        if created:
+            loaded = dict.fromkeys(self.HISTORY_FIELDS)
+        else:
+            # only fields loaded from the database, deferred ones are not read
+            loaded = getattr(self, "_loaded_values", {})
+        current = {name: getattr(self, name) for name in loaded}
+        changes = {
+            name: [loaded[name], value]
+            for name, value in current.items()
+            if value != loaded[name]
+        }
+        self._loaded_values = current
+
+        if created:
+            action = SupplierEventChoices.CREATED
+        elif "supplier_id" in changes:
+            action = SupplierEventChoices.MOVED
+        elif changes:
+            action = SupplierEventChoices.UPDATED
+        else:
+            return None
+        return SupplierEvent(supplier_id=self.pk, action=action, changes=changes)
+
+    @property
+    def ancestor_ids(self) -> list[int]:
+        """Ids of all ancestors from root to parent, without queries."""
+
+        return [int(pk) for pk in self.path.split("/")[:-2]]
 
 
 class Contact(models.Model):
@@ -84,6 +259,11 @@ class Contact(models.Model):
         verbose_name = "Контакт"
         verbose_name_plural = "Контакты"
         ordering = ["country"]
+        indexes = [
+            # `country__iexact` compiles to UPPER("country") = UPPER(%s)
+            models.Index(Upper("country"), name="contact_country_upper_idx"),
+            models.Index(fields=["city"], name="contact_city_idx"),
+        ]
 
 
 class Product(models.Model):
@@ -102,4 +282,185 @@ class Product(models.Model):
     class Meta:
         verbose_name = "Продукт"
         verbose_name_plural = "Продукты"
-        ordering = ["-date_product_release"]
+        ordering = ["-date_product_release", "-id"]
+        indexes = [
+            models.Index(
+                fields=["-date_product_release", "-id"], name="product_ordering_idx"
+            ),
+        ]
+
+
+class DebtTransaction(models.Model):
+    """Append-only debt ledger, `Supplier.debt` is the sum of supplier amounts"""
+
+    supplier = models.ForeignKey(
+        Supplier,
+        on_delete=models.CASCADE,
+        related_name="debt_transactions",
+        verbose_name="Поставщик",
+    )
+    kind = models.IntegerField(
+        choices=DebtTransactionChoices.choices, verbose_name="Тип операции"
+    )
+    amount = models.DecimalField(
+        max_digits=20, decimal_places=2, verbose_name="Сумма"
+    )  # signed change of the balance
+    created = models.DateTimeField(default=timezone.now, verbose_name="Дата операции")
+
+    def __str__(self):
+        return f"{self.supplier_id}: {self.amount} ({self.created})"
+
+    class Meta:
+        verbose_name = "Операция по задолженности"
+        verbose_name_plural = "Операции по задолженности"
+        indexes = [
+            models.Index(
+                fields=["supplier", "created"], name="debt_tx_supplier_created_idx"
+            ),
+            models.Index(fields=["created"], name="debt_tx_created_idx"),
+        ]
+
+
+class DebtSnapshot(models.Model):
+    """Supplier balance at the end of a compacted ledger period"""
+
+    supplier = models.ForeignKey(
+        Supplier,
+        on_delete=models.CASCADE,
+        related_name="debt_snapshots",
+        verbose_name="Поставщик",
+    )
+    balance = models.DecimalField(
+        max_digits=20, decimal_places=2, verbose_name="Задолженность"
+    )
+    taken_at = models.DateTimeField(verbose_name="Дата среза")
+
+    def __str__(self):
+        return f"{self.supplier_id}: {self.balance} ({self.taken_at})"
+
+    class Meta:
+        verbose_name = "Срез задолженности"
+        verbose_name_plural = "Срезы задолженности"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["supplier", "taken_at"], name="debt_snapshot_unique"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["taken_at"], name="debt_snapshot_taken_at_idx"),
+        ]
+
+
+class SupplierEvent(models.Model):
+    """Append-only log of supplier changes, kept after the supplier is deleted"""
+
+    supplier_id = models.BigIntegerField(verbose_name="Поставщик")
+    action = models.IntegerField(
+        choices=SupplierEventChoices.choices, verbose_name="Событие"
+    )
+    changes = models.JSONField(
+        default=dict, verbose_name="Изменения"
+    )  # field: [old, new]
+    created = models.DateTimeField(default=timezone.now, verbose_name="Дата события")
+
+    def __str__(self):
+        return f"{self.supplier_id}: {self.get_action_display()} ({self.created})"
+
+    class Meta:
+        verbose_name = "Событие поставщика"
+        verbose_name_plural = "События поставщиков"
+        indexes = [
+            models.Index(
+                fields=["supplier_id", "created"],
+                name="supplier_event_supplier_idx",
+            ),
+            models.Index(fields=["created"], name="supplier_event_created_idx"),
+        ]
+
+
+class DebtJob(CreatedUpdatedMixin, models.Model):
+    """
+    Background debt job over a selection of suppliers.
+    `spec` describes the selection (see jobs.py), the selection is split into
+    `DebtJobChunk` id ranges claimed by workers, finished chunks are the checkpoint.
+    Chunks are grouped into `shards` contiguous id ranges run by parallel tasks.
+    """
+
+    kind = models.IntegerField(
+        choices=DebtTransactionChoices.choices, verbose_name="Операция"
+    )
+    spec = models.JSONField(verbose_name="Выборка поставщиков")
+    low = models.DecimalField(
+        max_digits=20, decimal_places=2, null=True, blank=True, verbose_name="Сумма от"
+    )
+    high = models.DecimalField(
+        max_digits=20, decimal_places=2, null=True, blank=True, verbose_name="Сумма до"
+    )
+    status = models.IntegerField(
+        choices=DebtJobStatusChoices.choices,
+        default=DebtJobStatusChoices.PENDING,
+        verbose_name="Статус",
+    )
+    shards = models.PositiveSmallIntegerField(default=1, verbose_name="Шардов")
+    total = models.PositiveIntegerField(null=True, blank=True, verbose_name="Всего")
+    processed = models.PositiveIntegerField(default=0, verbose_name="Обработано")
+    changed = models.PositiveIntegerField(default=0, verbose_name="Изменено")
+    error = models.TextField(blank=True, verbose_name="Ошибка")
+    author = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        verbose_name="Автор",
+    )
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.pk}: {self.get_status_display()}"
+
+    @property
+    def progress(self) -> float:
+        """Processed share in percent, 100 for a finished job."""
+
+        if self.status == DebtJobStatusChoices.DONE:
+            return 100.0
+        if not self.total:
+            return 0.0
+        return round(min(self.processed / self.total, 1) * 100, 1)
+
+    class Meta:
+        verbose_name = "Задача по задолженности"
+        verbose_name_plural = "Задачи по задолженности"
+        ordering = ["-created"]
+        indexes = [
+            models.Index(fields=["status", "updated"], name="debt_job_status_idx"),
+        ]
+
+
+class DebtJobChunk(models.Model):
+    """Range of supplier ids of a debt job, claimed by one worker at a time"""
+
+    job = models.ForeignKey(
+        DebtJob,
+        on_delete=models.CASCADE,
+        related_name="chunks",
+        verbose_name="Задача",
+    )
+    shard = models.PositiveSmallIntegerField(default=0, verbose_name="Шард")
+    first_id = models.BigIntegerField(verbose_name="Первый id")
+    last_id = models.BigIntegerField(verbose_name="Последний id")
+    rows = models.PositiveIntegerField(default=0, verbose_name="Обработано")
+    entries = models.PositiveIntegerField(default=0, verbose_name="Изменено")
+    worker = models.CharField(max_length=255, blank=True, verbose_name="Исполнитель")
+    started = models.DateTimeField(null=True, blank=True, verbose_name="Начало")
+    finished = models.DateTimeField(null=True, blank=True, verbose_name="Окончание")
+
+    def __str__(self):
+        return f"{self.job_id}: {self.first_id}-{self.last_id}"
+
+    class Meta:
+        verbose_name = "Часть задачи по задолженности"
+        verbose_name_plural = "Части задачи по задолженности"
+        ordering = ["first_id"]
+        indexes = [
+            models.Index(fields=["job", "finished"], name="debt_job_chunk_idx"),
+        ]
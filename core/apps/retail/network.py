@@ -0,0 +1,140 @@
+from decimal import Decimal
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connection
+
+
+SUBTREE_CTE = """
+WITH RECURSIVE tree(id, depth) AS (
+    SELECT id, 0 FROM {table} WHERE id = %s
+    UNION ALL
+    SELECT s.id, tree.depth + 1 FROM {table} s
+    JOIN tree ON s.supplier_id = tree.id
+    WHERE tree.depth < %s
+)
+"""
+
+ANCESTORS_CTE = """
+WITH RECURSIVE tree(id, parent_id, depth) AS (
+    SELECT id, supplier_id, 0 FROM {table} WHERE id = %s
+    UNION ALL
+    SELECT s.id, s.supplier_id, tree.depth + 1 FROM {table} s
+    JOIN tree ON s.id = tree.parent_id
+    WHERE tree.depth < %s
+)
+"""
+
+ROWS_SQL = """
+SELECT s.id, s.title, s.type_supplier, s.debt, s.supplier_id, tree.depth
+FROM tree JOIN {table} s ON s.id = tree.id
+{where}
+ORDER BY tree.depth, s.id
+"""
+
+TOTALS_SQL = """
+SELECT COUNT(*), COALESCE(SUM(s.debt), 0)
+FROM tree JOIN {table} s ON s.id = tree.id
+{where}
+"""
+
+# nodes are walked through suppliers of other users, but only those
+# the user is an employee of are returned and counted
+VISIBLE_SQL = """
+WHERE EXISTS (
+    SELECT 1 FROM {employees} e WHERE e.supplier_id = s.id AND e.user_id = %s
+)
+"""
+
+ROW_FIELDS = ("id", "title", "type_supplier", "debt", "supplier", "depth")
+
+
+def _table() -> str:
+    return connection.ops.quote_name(
+        apps.get_model("retail", "Supplier")._meta.db_table
+    )
+
+
+def _select(template: str, user_id: int | None) -> tuple[str, list]:
+    """Query over `tree`, limited to suppliers of the user when given."""
+
+    if user_id is None:
+        return template.format(table=_table(), where=""), []
+    employees = apps.get_model("retail", "Supplier").employees.through
+    where = VISIBLE_SQL.format(
+        employees=connection.ops.quote_name(employees._meta.db_table)
+    )
+    return template.format(table=_table(), where=where), [user_id]
+
+
+def _money(value) -> Decimal:
+    """SQLite returns floats for decimal aggregates."""
+
+    return Decimal(str(value)).quantize(Decimal("0.01"))
+
+
+def _cte(template: str, supplier_id: int, max_depth: int | None) -> tuple[str, list]:
+    """Recursive CTE text and params with depth limited by settings."""
+
+    limit = settings.RETAIL_NETWORK_MAX_DEPTH
+    max_depth = limit if max_depth is None else min(max_depth, limit)
+    return template.format(table=_table()), [supplier_id, max_depth]
+
+
+def subtree_sql(supplier_id: int, max_depth: int | None = None) -> tuple[str, list]:
+    """`SELECT id` of the whole subtree (root included), usable in `id__in`."""
+
+    cte, params = _cte(SUBTREE_CTE, supplier_id, max_depth)
+    return f"{cte} SELECT id FROM tree", params
+
+
+def ancestors_sql(supplier_id: int, max_depth: int | None = None) -> tuple[str, list]:
+    """`SELECT id` of the ancestor chain (node included), usable in `id__in`."""
+
+    cte, params = _cte(ANCESTORS_CTE, supplier_id, max_depth)
+    return f"{cte} SELECT id FROM tree", params
+
+
+def _iter_rows(
+    template: str, supplier_id: int, max_depth: int | None, user_id: int | None
+):
+    """Streams rows from a server-side cursor in bounded batches."""
+
+    cte, params = _cte(template, supplier_id, max_depth)
+    select, select_params = _select(ROWS_SQL, user_id)
+    with connection.chunked_cursor() as cursor:
+        cursor.execute(cte + select, [*params, *select_params])
+        while rows := cursor.fetchmany(settings.RETAIL_NETWORK_FETCH_SIZE):
+            for row in rows:
+                item = dict(zip(ROW_FIELDS, row))
+                item["debt"] = _money(item["debt"])
+                yield item
+
+
+def iter_subtree(
+    supplier_id: int, max_depth: int | None = None, user_id: int | None = None
+):
+    """Supplier and all its descendants ordered by depth."""
+
+    return _iter_rows(SUBTREE_CTE, supplier_id, max_depth, user_id)
+
+
+def iter_ancestors(
+    supplier_id: int, max_depth: int | None = None, user_id: int | None = None
+):
+    """Supplier and its ancestors from the node up to the root."""
+
+    return _iter_rows(ANCESTORS_CTE, supplier_id, max_depth, user_id)
+
+
+def subtree_totals(
+    supplier_id: int, max_depth: int | None = None, user_id: int | None = None
+) -> dict:
+    """Number of nodes and aggregated debt of the subtree in one query."""
+
+    cte, params = _cte(SUBTREE_CTE, supplier_id, max_depth)
+    select, select_params = _select(TOTALS_SQL, user_id)
+    with connection.cursor() as cursor:
+        cursor.execute(cte + select, [*params, *select_params])
+        count, total_debt = cursor.fetchone()
+    return {"count": count, "total_debt": _money(total_debt)}
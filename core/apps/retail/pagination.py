@@ -0,0 +1,142 @@
+from django.conf import settings
+from rest_framework.pagination import (
+    _reverse_ordering,
+    CursorPagination,
+)
+from rest_framework.response import Response
+
+from .counting import (
+    afast_count,
+    fast_count,
+)
+
+
+class RetailCursorPagination(CursorPagination):
+    """
+    Keyset pagination on the first ordering field: next page is
+    `WHERE <first field> < cursor`, rows sharing the cursor value are
+    skipped by an offset kept in the cursor. The ordering ends with `-id`,
+    so those rows come in the same order on every page.
+    Page size can be changed by `page_size` query param up to the cap.
+    `count` of the response is `fast_count` of the listing: the planner
+    estimate for big ones, a briefly cached exact count otherwise.
+    It is sent with the first page only, next pages skip the counting
+    unless asked for by `with_count=1`.
+
+    The page query of async views runs on the async ORM: the DRF
+    implementation is split into the query of the page window and
+    the positions computed from the fetched rows.
+    """
+
+    page_size = settings.RETAIL_PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = settings.RETAIL_MAX_PAGE_SIZE
+    count_query_param = "with_count"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = None
+        window = self.page_window(queryset, request, view)
+        if window is None:
+            return None
+        page = self.finish_page(list(window))
+        if self.wants_count(request):
+            self.count = fast_count(queryset)
+        return page
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        self.count = None
+        window = self.page_window(queryset, request, view)
+        if window is None:
+            return None
+        page = self.finish_page([row async for row in window])
+        if self.wants_count(request):
+            self.count = await afast_count(queryset)
+        return page
+
+    def page_window(self, queryset, request, view=None):
+        """
+        Unevaluated page of `CursorPagination.paginate_queryset` with one
+        extra row telling whether a page follows, None without paging.
+        """
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        offset, reverse, position = self.cursor or (0, False, None)
+
+        ordering = _reverse_ordering(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            order = self.ordering[0]
+            lookup = "lt" if reverse != order.startswith("-") else "gt"
+            queryset = queryset.filter(**{f"{order.lstrip('-')}__{lookup}": position})
+        return queryset[offset : offset + self.page_size + 1]
+
+    def finish_page(self, results: list) -> list:
+        """Page and cursor positions from the rows of `page_window`."""
+
+        offset, reverse, position = self.cursor or (0, False, None)
+        self.page = results[: self.page_size]
+        has_following = len(results) > len(self.page)
+        following = None
+        if has_following:
+            following = self._get_position_from_instance(results[-1], self.ordering)
+        has_preceding = position is not None or offset > 0
+
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = has_preceding, has_following
+            self.next_position, self.previous_position = position, following
+        else:
+            self.has_next, self.has_previous = has_following, has_preceding
+            self.next_position, self.previous_position = following, position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def wants_count(self, request) -> bool:
+        """First page or `with_count=1`, the cursor must be decoded already."""
+
+        if self.cursor is None:
+            return True
+        return request.query_params.get(self.count_query_param) in ("1", "true")
+
+    def get_paginated_response(self, data):
+        response = {
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        }
+        if self.count is not None:
+            response = {"count": self.count, **response}
+        return Response(response)
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema["properties"] = {
+            "count": {
+                "type": "integer",
+                "example": 123,
+                "description": "На первой странице или с with_count=1",
+            },
+            **response_schema["properties"],
+        }
+        return response_schema
+
+
+class SupplierCursorPagination(RetailCursorPagination):
+    """Follows Supplier.Meta.ordering."""
+
+    ordering = ("-created", "-debt", "title", "-id")
+
+
+class ProductCursorPagination(RetailCursorPagination):
+    """Follows Product.Meta.ordering."""
+
+    ordering = ("-date_product_release", "-id")
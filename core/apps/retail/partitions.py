@@ -0,0 +1,195 @@
+import re
+from datetime import (
+    datetime,
+    timedelta,
+    timezone as dt_timezone,
+)
+
+from django.conf import settings
+from django.db import (
+    connection,
+    transaction,
+)
+from django.db.models import Max
+from django.utils import timezone
+
+from .ledger import (
+    month_start,
+    next_month,
+)
+from .models import (
+    DebtSnapshot,
+    DebtTransaction,
+    SupplierEvent,
+)
+
+
+# Monthly range partitions of time-series tables (PostgreSQL only).
+# Partition of month M is `<table>_pYYYYMM` with bounds [M, M + 1 month) in UTC.
+# Tables are converted by migration 0007, partitions are created ahead and
+# archived by `manage.py partitions` and the `maintain_partitions` task.
+# Rows past the partitions created ahead land in `<table>_default`, they
+# are moved out when the partition of their month is created.
+# Queries filtering the time column get partition pruning.
+
+PARTITIONED = (
+    (DebtTransaction, "created"),
+    (SupplierEvent, "created"),
+)
+
+PARTITION_SUFFIX = re.compile(r"_p(\d{4})(\d{2})$")
+
+
+def is_supported() -> bool:
+    return connection.vendor == "postgresql"
+
+
+def partition_name(table: str, month: datetime) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+
+def month_from_now(months: int) -> datetime:
+    """Start of the month `months` from the current one, negative for past."""
+
+    month = month_start(timezone.now())
+    for _ in range(abs(months)):
+        month = (
+            next_month(month) if months > 0 else month_start(month - timedelta(days=1))
+        )
+    return month
+
+
+def _execute(sql: str, params=None):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        if cursor.description:
+            return cursor.fetchall()
+        return None
+
+
+def _create_partition(table: str, column: str, month: datetime) -> None:
+    """
+    Creates and attaches the partition of the month. Rows of the month
+    already in the default partition are moved into it first, attaching
+    would fail on them otherwise.
+    """
+
+    quote_name = connection.ops.quote_name
+    name = quote_name(partition_name(table, month))
+    start, end = month, next_month(month)
+    with transaction.atomic():
+        _execute(f"CREATE TABLE {name} (LIKE {quote_name(table)} INCLUDING DEFAULTS)")
+        _execute(
+            f"WITH moved AS (DELETE FROM {quote_name(f'{table}_default')} "
+            f"WHERE {quote_name(column)} >= %s AND {quote_name(column)} < %s "
+            f"RETURNING *) INSERT INTO {name} SELECT * FROM moved",
+            [start, end],
+        )
+        # DDL takes no parameters, bounds are our own month starts
+        _execute(
+            f"ALTER TABLE {quote_name(table)} ATTACH PARTITION {name} "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        )
+
+
+def list_partitions(table: str) -> list[tuple[str, datetime]]:
+    """Attached partitions of the table with their months, oldest first."""
+
+    rows = _execute(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE parent.oid = %s::regclass",
+        [connection.ops.quote_name(table)],
+    )
+    partitions = []
+    for (name,) in rows:
+        match = PARTITION_SUFFIX.search(name)
+        if match:
+            month = datetime(int(match[1]), int(match[2]), 1, tzinfo=dt_timezone.utc)
+            partitions.append((name, month))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def create_partitions(table: str, ahead: int | None = None) -> list[str]:
+    """Creates missing partitions from the current month `ahead` months forward."""
+
+    ahead = settings.RETAIL_PARTITIONS_AHEAD if ahead is None else ahead
+    column = {model._meta.db_table: column for model, column in PARTITIONED}[table]
+    existing = {name for name, _ in list_partitions(table)}
+    created = []
+    month, until = month_from_now(0), month_from_now(ahead)
+    while month <= until:
+        name = partition_name(table, month)
+        if name not in existing:
+            _create_partition(table, column, month)
+            created.append(name)
+        month = next_month(month)
+    return created
+
+
+def archive_horizon(model, retain: int | None = None) -> datetime:
+    """
+    Partitions ending before the horizon can be archived: older than
+    `retain` months, ledger entries also compacted into snapshots.
+    """
+
+    retain = settings.RETAIL_PARTITIONS_RETAIN if retain is None else retain
+    horizon = month_from_now(-retain)
+    if model is DebtTransaction:
+        compacted = DebtSnapshot.objects.aggregate(last=Max("taken_at"))["last"]
+        horizon = min(
+            horizon, compacted or datetime.min.replace(tzinfo=dt_timezone.utc)
+        )
+    return horizon
+
+
+def archive_partitions(table: str, before: datetime, drop: bool = False) -> list[str]:
+    """
+    Detaches partitions ending not later than `before`. Detached tables are
+    moved to the `RETAIL_PARTITIONS_ARCHIVE_SCHEMA` schema or dropped.
+    Their foreign keys are dropped, archived rows must not block deletes.
+    """
+
+    quote_name = connection.ops.quote_name
+    schema = quote_name(settings.RETAIL_PARTITIONS_ARCHIVE_SCHEMA)
+    archived = []
+    for name, month in list_partitions(table):
+        if next_month(month) > before:
+            break
+        with transaction.atomic():
+            _execute(
+                f"ALTER TABLE {quote_name(table)} DETACH PARTITION {quote_name(name)}"
+            )
+            if drop:
+                _execute(f"DROP TABLE {quote_name(name)}")
+            else:
+                foreign_keys = _execute(
+                    "SELECT conname FROM pg_constraint "
+                    "WHERE conrelid = %s::regclass AND contype = 'f'",
+                    [quote_name(name)],
+                )
+                for (constraint,) in foreign_keys:
+                    _execute(
+                        f"ALTER TABLE {quote_name(name)} "
+                        f"DROP CONSTRAINT {quote_name(constraint)}"
+                    )
+                _execute(f"CREATE SCHEMA IF NOT EXISTS {schema}")
+                _execute(f"ALTER TABLE {quote_name(name)} SET SCHEMA {schema}")
+        archived.append(name)
+    return archived
+
+
+def maintain_partitions(archive: bool = True) -> dict[str, dict]:
+    """Creates partitions ahead and archives expired ones of every table."""
+
+    report = {}
+    for model, _ in PARTITIONED:
+        table = model._meta.db_table
+        report[table] = {
+            "created": create_partitions(table),
+            "archived": (
+                archive_partitions(table, archive_horizon(model)) if archive else []
+            ),
+        }
+    return report
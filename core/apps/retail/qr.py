@@ -0,0 +1,195 @@
+import hashlib
+import logging
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import cache as memoize
+from io import BytesIO
+from multiprocessing import current_process
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+
+import qrcode
+
+
+logger = logging.getLogger(__name__)
+
+RENDER_PARAMS = {"box_size": 10, "border": 4}
+
+
+def contact_payload(title: str, contact) -> str:
+    """Text encoded in the supplier QR code."""
+
+    return f"""
+        {title}
+        Email: {contact.email}
+        Адрес: {contact.country}, {contact.city}, {contact.street}, {contact.house_number}
+        """
+
+
+def _options(params: dict) -> str:
+    options = {**RENDER_PARAMS, **params}
+    return ",".join(f"{name}={options[name]}" for name in sorted(options))
+
+
+def qr_digest(payload: str, **params) -> str:
+    """Content address of an image: payload plus render parameters."""
+
+    key = f"{payload}|{_options(params)}"
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def render_qr_png(payload: str, box_size: int = 10, border: int = 4) -> bytes:
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=box_size,
+        border=border,
+    )
+    qr.add_data(payload)
+    qr.make(fit=True)
+
+    img = qr.make_image(fill_color="black", back_color="white")
+    buffer = BytesIO()
+    img.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _render(task: tuple[str, dict]) -> bytes:
+    payload, params = task
+    return render_qr_png(payload, **params)
+
+
+class CacheQRStore:
+    """
+    Images in the Django cache (Redis).
+    Eviction is left to Redis `maxmemory-policy allkeys-lru`.
+    """
+
+    prefix = "retail:qr:"
+
+    def get_many(self, digests) -> dict[str, bytes]:
+        found = cache.get_many([self.prefix + digest for digest in digests])
+        return {key.removeprefix(self.prefix): image for key, image in found.items()}
+
+    def set_many(self, images: dict[str, bytes]) -> None:
+        cache.set_many(
+            {self.prefix + digest: image for digest, image in images.items()},
+            settings.RETAIL_QR_CACHE_TIMEOUT,
+        )
+
+
+class FileQRStore:
+    """
+    Images as `<digest>.png` files.
+    Reads bump mtime, writes evict least recently used files above the limit.
+    """
+
+    def __init__(self, directory, max_items: int):
+        self.directory = Path(directory)
+        self.max_items = max_items
+
+    def get_many(self, digests) -> dict[str, bytes]:
+        images = {}
+        for digest in digests:
+            path = self.directory / f"{digest}.png"
+            try:
+                images[digest] = path.read_bytes()
+                os.utime(path)
+            except FileNotFoundError:
+                continue
+        return images
+
+    def set_many(self, images: dict[str, bytes]) -> None:
+        if not images:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for digest, image in images.items():
+            # write-then-rename, readers never see a partial file
+            handle, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(handle, "wb") as file:
+                file.write(image)
+            os.replace(temp_path, self.directory / f"{digest}.png")
+        self.evict()
+
+    def evict(self) -> None:
+        entries = [
+            entry for entry in os.scandir(self.directory) if entry.name.endswith(".png")
+        ]
+        overflow = len(entries) - self.max_items
+        if overflow <= 0:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:overflow]:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                continue
+
+
+@memoize
+def get_qr_store():
+    if settings.RETAIL_QR_STORE == "filesystem":
+        return FileQRStore(settings.RETAIL_QR_CACHE_DIR, settings.RETAIL_QR_CACHE_SIZE)
+    return CacheQRStore()
+
+
+def render_many(payloads: list[str], **params) -> dict[str, bytes]:
+    """
+    PNG for every payload.
+    Stored images are taken by content hash, the rest
+    are rendered in a process pool and stored.
+    """
+
+    digests = {payload: qr_digest(payload, **params) for payload in payloads}
+    store = get_qr_store()
+    stored = store.get_many(set(digests.values()))
+    images = {
+        payload: stored[digest]
+        for payload, digest in digests.items()
+        if digest in stored
+    }
+
+    missing = [(payload, params) for payload in digests if payload not in images]
+    if len(missing) < settings.RETAIL_QR_POOL_THRESHOLD:
+        rendered = [_render(task) for task in missing]
+    elif current_process().daemon:
+        # workers of the Celery prefork pool are daemonic and may not have
+        # children, run them with `--pool threads` or `solo` to use the pool
+        logger.warning(
+            "Пул процессов недоступен в демоническом процессе, "
+            f"{len(missing)} QR-кодов рендерятся последовательно"
+        )
+        rendered = [_render(task) for task in missing]
+    else:
+        with ProcessPoolExecutor(settings.RETAIL_QR_WORKERS) as pool:
+            rendered = list(pool.map(_render, missing, chunksize=8))
+
+    fresh = {payload: image for (payload, _), image in zip(missing, rendered)}
+    store.set_many({digests[payload]: image for payload, image in fresh.items()})
+    return {**images, **fresh}
+
+
+# supplier id -> {render options: digest}, dropped after a commit changing
+# contact or title. Expires with the images, so a mapping written back by
+# a request racing the invalidation does not outlive them.
+
+
+def _digests_key(supplier_id: int) -> str:
+    return f"retail:qr-digests:{supplier_id}"
+
+
+def get_supplier_qr_digest(supplier_id: int, **params) -> str | None:
+    return (cache.get(_digests_key(supplier_id)) or {}).get(_options(params))
+
+
+def remember_supplier_qr_digest(supplier_id: int, digest: str, **params) -> None:
+    digests = cache.get(_digests_key(supplier_id)) or {}
+    digests[_options(params)] = digest
+    cache.set(_digests_key(supplier_id), digests, settings.RETAIL_QR_CACHE_TIMEOUT)
+
+
+def forget_supplier_qr_digests(supplier_ids) -> None:
+    cache.delete_many([_digests_key(supplier_id) for supplier_id in supplier_ids])
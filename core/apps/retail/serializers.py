@@ -1,11 +1,33 @@
+from datetime import timedelta
+from functools import cache
+from operator import attrgetter
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from rest_framework import serializers
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import (
+    ISO_8601,
+    serializers,
+)
+from rest_framework.settings import api_settings
 
+from core.apps.retail.bulk import (
+    check_hierarchy,
+    validate_batch,
+    write_batch,
+)
+from core.apps.retail.choices import SupplierChoices
 from core.apps.retail.models import (
     Contact,
+    DebtJob,
+    DebtTransaction,
     Product,
     Supplier,
+    SupplierEvent,
 )
+from core.apps.retail.visibility import visible_supplier_ids
 
 
 User = get_user_model()
@@ -25,6 +47,292 @@ class SupplierQRRequestSerializer(serializers.Serializer):
     email = serializers.EmailField()
 
 
+class SupplierQRImageSerializer(serializers.Serializer):
+    """
+    Query parameters of QR image rendering.
+    Validates:
+    - box_size - pixels per QR module
+    - border - quiet zone width in modules
+    """
+
+    box_size = serializers.IntegerField(min_value=1, max_value=40, default=10)
+    border = serializers.IntegerField(min_value=0, max_value=10, default=4)
+
+
+class SupplierQRBulkRequestSerializer(serializers.Serializer):
+    """
+    Serializer handling bulk QR code generation requests.
+    Validates:
+    - items - non-empty list of `supplier_id` / `email` pairs, suppliers
+      must be available for the user
+
+    Errors of `items` are keyed by item index.
+    """
+
+    items = SupplierQRRequestSerializer(
+        many=True, allow_empty=False, max_length=settings.RETAIL_QR_BULK_MAX_ITEMS
+    )
+
+    def validate_items(self, items):
+        visible = visible_supplier_ids(self.context["request"].user)
+        errors = {
+            index: {"supplier_id": ["Поставщик не найден."]}
+            for index, item in enumerate(items)
+            if item["supplier_id"] not in visible
+        }
+        if errors:
+            raise serializers.ValidationError(errors)
+        return items
+
+
+class NetworkQuerySerializer(serializers.Serializer):
+    """
+    Query parameters of supplier network endpoints.
+    Validates:
+    - max_depth - optional non-negative depth limit
+    - stream - return NDJSON stream instead of a single document
+    """
+
+    max_depth = serializers.IntegerField(min_value=0, required=False)
+    stream = serializers.BooleanField(default=False)
+
+
+class SupplierNodeSerializer(serializers.Serializer):
+    """
+    Serializer supplier network row produced by a recursive CTE.
+
+    Handles serialization:
+    - `id`
+    - `title`
+    - `type_supplier`
+    - `debt`
+    - `supplier`
+    - `depth`
+    """
+
+    id = serializers.IntegerField()
+    title = serializers.CharField()
+    type_supplier = serializers.IntegerField()
+    debt = serializers.DecimalField(max_digits=20, decimal_places=2)
+    supplier = serializers.IntegerField(allow_null=True)
+    depth = serializers.IntegerField()
+
+
+class SupplierSubtreeSerializer(serializers.Serializer):
+    """
+    Serializer supplier subtree with aggregated debt.
+
+    Handles serialization:
+    - `count`
+    - `total_debt`
+    - `items`
+    """
+
+    count = serializers.IntegerField()
+    total_debt = serializers.DecimalField(max_digits=20, decimal_places=2)
+    items = SupplierNodeSerializer(many=True)
+
+
+class DebtTypeStatisticsSerializer(serializers.Serializer):
+    """
+    Serializer debt statistics of one supplier type.
+
+    Handles serialization:
+    - `type_supplier`
+    - `count`
+    - `total`
+    - `average`
+    """
+
+    type_supplier = serializers.IntegerField()
+    count = serializers.IntegerField()
+    total = serializers.DecimalField(max_digits=20, decimal_places=2)
+    average = serializers.DecimalField(max_digits=20, decimal_places=2)
+
+
+class DebtStatisticsSerializer(serializers.Serializer):
+    """
+    Serializer cached debt statistics snapshot.
+
+    Handles serialization:
+    - `count`, `total`, `average`, `minimum`, `maximum`
+    - `percentiles` (p50, p90, p99)
+    - `by_type`
+    - `computed_at`
+    """
+
+    count = serializers.IntegerField()
+    total = serializers.DecimalField(max_digits=20, decimal_places=2)
+    average = serializers.DecimalField(max_digits=20, decimal_places=2)
+    minimum = serializers.DecimalField(max_digits=20, decimal_places=2)
+    maximum = serializers.DecimalField(max_digits=20, decimal_places=2)
+    percentiles = serializers.DictField(
+        child=serializers.DecimalField(max_digits=20, decimal_places=2)
+    )
+    by_type = DebtTypeStatisticsSerializer(many=True)
+    computed_at = serializers.DateTimeField()
+
+
+class EndpointMetricsSerializer(serializers.Serializer):
+    """
+    Serializer rolling request metrics of one endpoint.
+    Percentiles (p50, p90, p99) and max of the last `window` requests.
+    """
+
+    view = serializers.CharField()
+    requests = serializers.IntegerField()
+    window = serializers.IntegerField()
+    budget = serializers.IntegerField(allow_null=True)
+    over_budget = serializers.IntegerField()
+    queries = serializers.DictField(child=serializers.IntegerField())
+    db_ms = serializers.DictField(child=serializers.FloatField())
+    serialize_ms = serializers.DictField(child=serializers.FloatField())
+    total_ms = serializers.DictField(child=serializers.FloatField())
+
+
+class TaskHistogramSerializer(serializers.Serializer):
+    """Serializer histogram: run counts by bucket upper bound in seconds."""
+
+    buckets = serializers.DictField(child=serializers.IntegerField())
+    p50 = serializers.FloatField(allow_null=True)
+    p90 = serializers.FloatField(allow_null=True)
+    p99 = serializers.FloatField(allow_null=True)
+
+
+class TaskMetricsSerializer(serializers.Serializer):
+    """
+    Serializer aggregated telemetry of one Celery task.
+    `rows` are rows written by the task, `lag` is the time from publishing
+    the message to the start of the task.
+    """
+
+    task = serializers.CharField()
+    runs = serializers.IntegerField()
+    failures = serializers.IntegerField()
+    seconds = serializers.FloatField()
+    avg_seconds = serializers.FloatField()
+    queries = serializers.IntegerField()
+    rows = serializers.IntegerField()
+    rows_per_second = serializers.FloatField(allow_null=True)
+    avg_lag_seconds = serializers.FloatField(allow_null=True)
+    duration = TaskHistogramSerializer()
+    lag = TaskHistogramSerializer()
+
+
+class DebtBalanceQuerySerializer(serializers.Serializer):
+    """
+    Query parameters of supplier debt balance.
+    Validates:
+    - at - optional moment, defaults to now
+    """
+
+    at = serializers.DateTimeField(required=False)
+
+
+class DebtBalanceSerializer(serializers.Serializer):
+    """Serializer supplier balance computed from the debt ledger."""
+
+    supplier_id = serializers.IntegerField()
+    at = serializers.DateTimeField()
+    balance = serializers.DecimalField(max_digits=20, decimal_places=2)
+
+
+class DebtJobShardSerializer(serializers.Serializer):
+    """Serializer timing of one shard of a debt job."""
+
+    shard = serializers.IntegerField()
+    workers = serializers.ListField(child=serializers.CharField())
+    chunks = serializers.IntegerField()
+    done = serializers.IntegerField()
+    rows = serializers.IntegerField()
+    entries = serializers.IntegerField()
+    started = serializers.DateTimeField(allow_null=True)
+    finished = serializers.DateTimeField(allow_null=True)
+    elapsed = serializers.FloatField(allow_null=True)
+
+
+class DebtJobSerializer(serializers.ModelSerializer):
+    """Serializer background debt job progress, `shard_timings` are set by the view."""
+
+    progress = serializers.FloatField(read_only=True)
+    shard_timings = DebtJobShardSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = DebtJob
+        fields = (
+            "id",
+            "kind",
+            "status",
+            "total",
+            "processed",
+            "changed",
+            "progress",
+            "shards",
+            "shard_timings",
+            "error",
+            "created",
+            "updated",
+        )
+
+
+class SupplierHistoryQuerySerializer(serializers.Serializer):
+    """
+    Query parameters of supplier history.
+    Validates:
+    - since, until - bounds of the period, by default the last 30 days
+    - the period is not longer than `RETAIL_HISTORY_MAX_DAYS`
+    """
+
+    since = serializers.DateTimeField(required=False)
+    until = serializers.DateTimeField(required=False)
+
+    def validate(self, attrs):
+        attrs.setdefault("until", timezone.now())
+        attrs.setdefault("since", attrs["until"] - timedelta(days=30))
+        if attrs["since"] >= attrs["until"]:
+            raise serializers.ValidationError(
+                {"since": "Начало периода должно быть раньше конца."}
+            )
+        if attrs["until"] - attrs["since"] > timedelta(
+            days=settings.RETAIL_HISTORY_MAX_DAYS
+        ):
+            raise serializers.ValidationError(
+                {
+                    "since": "Период не может быть длиннее "
+                    f"{settings.RETAIL_HISTORY_MAX_DAYS} дней."
+                }
+            )
+        return attrs
+
+
+class DebtTransactionSerializer(serializers.ModelSerializer):
+    """Serializer debt ledger entry."""
+
+    class Meta:
+        model = DebtTransaction
+        fields = ("kind", "amount", "created")
+
+
+class SupplierEventSerializer(serializers.ModelSerializer):
+    """Serializer supplier change event."""
+
+    class Meta:
+        model = SupplierEvent
+        fields = ("action", "changes", "created")
+
+
+class SupplierExportSerializer(serializers.Serializer):
+    """
+    Query parameters of supplier export.
+    Validates:
+    - export_format - `ndjson` or `csv`
+    - country - optional country filter
+    """
+
+    export_format = serializers.ChoiceField(choices=("ndjson", "csv"), default="ndjson")
+    country = serializers.CharField(required=False)
+
+
 class ClientSerializer(serializers.ModelSerializer):
     """
     Serializer User model.
@@ -113,3 +421,268 @@ class SupplierSerializer(serializers.ModelSerializer):
             "products",
         )
         model = Supplier
+
+    def validate(self, attrs):
+        """Hierarchy rules of bulk writes, see `check_hierarchy`."""
+
+        item = {}
+        if "type_supplier" in attrs:
+            item["type_supplier"] = attrs["type_supplier"]
+        if "supplier" in attrs:
+            item["supplier"] = attrs["supplier"].pk if attrs["supplier"] else None
+        if isinstance(self.instance, Supplier):
+            item.update(id=self.instance.pk, instance=self.instance)
+        errors = [{}]
+        check_hierarchy([item], self.context["request"].user, errors)
+        if errors[0]:
+            raise serializers.ValidationError(errors[0])
+        return attrs
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if isinstance(self.instance, Supplier):
+            # email uniqueness check must skip the contact being updated
+            fields["contact"].instance = self.instance.contact
+        return fields
+
+    @transaction.atomic
+    def create(self, validated_data):
+        contact = Contact.objects.create(**validated_data.pop("contact"))
+        return super().create({**validated_data, "contact": contact})
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        contact_data = validated_data.pop("contact", None)
+        if contact_data:
+            for name, value in contact_data.items():
+                setattr(instance.contact, name, value)
+            instance.contact.save()
+        return super().update(instance, validated_data)
+
+
+class SupplierBulkContactSerializer(ContactSerializer):
+    """
+    Contact of a bulk item.
+    Fields are optional for updates, email uniqueness is checked
+    for the whole batch in `validate_batch`.
+    """
+
+    class Meta(ContactSerializer.Meta):
+        extra_kwargs = {
+            **{name: {"required": False} for name in ContactSerializer.Meta.fields},
+            "email": {"required": False, "validators": []},
+        }
+
+
+class SupplierBulkItemSerializer(serializers.Serializer):
+    """
+    One supplier of a bulk write.
+    Validates:
+    - id - supplier of the user to update, omitted for new suppliers
+    - ref - name other new items use in `supplier_ref`
+    - supplier / supplier_ref - parent by id or by ref inside the batch
+    - title, type_supplier, contact - required for new suppliers
+    - product_ids / employee_ids - links added to the supplier
+    """
+
+    id = serializers.IntegerField(required=False)
+    ref = serializers.CharField(max_length=50, required=False)
+    title = serializers.CharField(max_length=50, required=False)
+    type_supplier = serializers.ChoiceField(
+        choices=SupplierChoices.choices, required=False
+    )
+    supplier = serializers.IntegerField(required=False, allow_null=True)
+    supplier_ref = serializers.CharField(max_length=50, required=False)
+    contact = SupplierBulkContactSerializer(required=False)
+    product_ids = serializers.ListField(child=serializers.IntegerField(), default=list)
+    employee_ids = serializers.ListField(child=serializers.IntegerField(), default=list)
+
+    def validate(self, attrs):
+        if attrs.get("supplier") is not None and "supplier_ref" in attrs:
+            raise serializers.ValidationError(
+                {"supplier_ref": "Укажите либо supplier, либо supplier_ref."}
+            )
+        if "id" in attrs:
+            if "ref" in attrs or "supplier_ref" in attrs:
+                raise serializers.ValidationError(
+                    {"ref": "Ссылки доступны только для новых поставщиков."}
+                )
+            return attrs
+
+        errors = {
+            name: ["Обязательное поле."]
+            for name in ("title", "type_supplier", "contact")
+            if name not in attrs
+        }
+        missing = [
+            name
+            for name in ContactSerializer.Meta.fields
+            if name not in attrs.get("contact", {})
+        ]
+        if "contact" in attrs and missing:
+            errors["contact"] = {name: ["Обязательное поле."] for name in missing}
+        if errors:
+            raise serializers.ValidationError(errors)
+        return attrs
+
+
+class SupplierBulkSerializer(serializers.Serializer):
+    """
+    Serializer bulk create / update of suppliers.
+    Validates:
+    - items - non-empty list of suppliers, see `SupplierBulkItemSerializer`
+
+    Errors of `items` are keyed by item index, like DRF list errors.
+    Nothing is written unless every item is valid.
+    """
+
+    items = SupplierBulkItemSerializer(
+        many=True, allow_empty=False, max_length=settings.RETAIL_BULK_MAX_ITEMS
+    )
+
+    def validate(self, attrs):
+        errors = validate_batch(attrs["items"], self.context["request"].user)
+        errors = {index: error for index, error in enumerate(errors) if error}
+        if errors:
+            raise serializers.ValidationError({"items": errors})
+        return attrs
+
+    def create(self, validated_data):
+        return write_batch(validated_data["items"], self.context["request"].user)
+
+
+class SupplierBulkResultSerializer(serializers.Serializer):
+    """
+    Serializer outcome of one bulk item.
+
+    Handles serialization:
+    - `id`
+    - `path`
+    - `created`
+    """
+
+    id = serializers.IntegerField()
+    path = serializers.CharField()
+    created = serializers.BooleanField()
+
+
+# Fast read path
+#
+# DRF deep-copies every declared field for each serializer instance and
+# resolves attributes through generic helpers. For read-only output the
+# fields can be resolved once per class into (name, getter, converter)
+# triples; the output is the same as `Serializer.to_representation`.
+
+FAST_CONVERTERS = {
+    serializers.CharField: str,
+    serializers.EmailField: str,
+    serializers.IntegerField: int,
+}
+
+
+def _identity(value):
+    return value
+
+
+def _related_getter(name):
+    """Reads prefetched rows directly, without building a related manager."""
+
+    def getter(instance):
+        try:
+            return instance._prefetched_objects_cache[name]
+        except (AttributeError, KeyError):
+            return getattr(instance, name).all()
+
+    return getter
+
+
+def _datetime_converter(field, tz):
+    """`DateTimeField.to_representation` with the current timezone bound once."""
+
+    if (
+        tz is None
+        or hasattr(field, "timezone")
+        or getattr(field, "format", api_settings.DATETIME_FORMAT) != ISO_8601
+    ):
+        return field.to_representation
+
+    def convert(value):
+        if isinstance(value, str) or timezone.is_naive(value):
+            return field.to_representation(value)
+        value = value.astimezone(tz).isoformat()
+        return value[:-6] + "Z" if value.endswith("+00:00") else value
+
+    return convert
+
+
+@cache
+def compile_serializer(serializer_class, tz=None):
+    """Builds `instance -> dict` function equivalent to `serializer_class`."""
+
+    accessors = []
+    for field in serializer_class()._readable_fields:
+        source = ".".join(field.source_attrs)
+        getter = attrgetter(source) if source else _identity
+        if isinstance(field, serializers.ListSerializer):
+            child = compile_serializer(type(field.child), tz)
+            getter = _related_getter(source)
+
+            def convert(rows, child=child):
+                return [child(row) for row in rows]
+
+        elif isinstance(field, serializers.BaseSerializer):
+            convert = compile_serializer(type(field), tz)
+        elif isinstance(field, serializers.PrimaryKeyRelatedField):
+            getter, convert = attrgetter(f"{source}_id"), _identity
+        elif isinstance(
+            field, (serializers.RelatedField, serializers.ManyRelatedField)
+        ):
+            getter, convert = field.get_attribute, field.to_representation
+        elif type(field) is serializers.DateTimeField:
+            convert = _datetime_converter(field, tz)
+        else:
+            convert = FAST_CONVERTERS.get(type(field), field.to_representation)
+        accessors.append((field.field_name, getter, convert))
+
+    def represent(instance):
+        ret = {}
+        for name, getter, convert in accessors:
+            try:
+                value = getter(instance)
+            except ObjectDoesNotExist:
+                value = None
+            ret[name] = None if value is None else convert(value)
+        return ret
+
+    return represent
+
+
+class FastReadSerializer(serializers.BaseSerializer):
+    """
+    Read-only serializer compiled from `source_serializer_class`.
+    Expects related objects to be loaded with select/prefetch_related.
+    For `many=True` the child is created once, so the timezone
+    is resolved once per response.
+    """
+
+    source_serializer_class = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        tz = timezone.get_current_timezone() if settings.USE_TZ else None
+        self.represent = compile_serializer(self.source_serializer_class, tz)
+
+    def to_representation(self, instance):
+        return self.represent(instance)
+
+
+class FastProductSerializer(FastReadSerializer):
+    """Read-only fast path of `ProductSerializer`."""
+
+    source_serializer_class = ProductSerializer
+
+
+class FastSupplierSerializer(FastReadSerializer):
+    """Read-only fast path of `SupplierSerializer`."""
+
+    source_serializer_class = SupplierSerializer
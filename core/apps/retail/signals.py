@@ -0,0 +1,180 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Substr
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+)
+from django.dispatch import receiver
+
+from core.apps.users.models import User
+
+from .caching import (
+    bump_data_versions,
+    CONTACTS,
+    PRODUCTS,
+    SUPPLIERS,
+)
+from .choices import SupplierEventChoices
+from .models import (
+    Contact,
+    Product,
+    Supplier,
+    SupplierEvent,
+)
+from .qr import forget_supplier_qr_digests
+from .serializers import ClientSerializer
+from .statistics import (
+    add_debt_deltas,
+    debt_deltas,
+    supplier_debt_deltas,
+)
+from .visibility import invalidate_visibility
+
+
+@receiver(post_save, sender=Supplier)
+def sync_supplier_hierarchy(
+    sender, instance: Supplier, raw=False, update_fields=None, **kwargs
+):
+    """
+    Keeps materialized `path` and `level` up to date.
+    When a node moves, its whole subtree is re-leveled with one UPDATE.
+    """
+
+    if raw or (update_fields is not None and "supplier" not in update_fields):
+        return
+
+    instance.sync_path()
+
+
+@receiver(post_delete, sender=Supplier)
+def detach_supplier_subtree(sender, instance: Supplier, **kwargs):
+    """Children become roots (FK is SET_NULL), so the subtree loses the prefix."""
+
+    if not instance.path:
+        return
+    Supplier.objects.filter(path__startswith=instance.path).update(
+        path=Substr("path", len(instance.path) + 1),
+        level=F("level") - (instance.level + 1),
+    )
+
+
+@receiver(post_save, sender=Supplier)
+def record_supplier_event(sender, instance: Supplier, created, raw=False, **kwargs):
+    """Single-row changes of tracked fields, bulk writes record events themselves."""
+
+    if raw:
+        return
+    event = instance.change_event(created)
+    if event is not None:
+        event.save()
+
+
+@receiver(post_delete, sender=Supplier)
+def record_supplier_deleted(sender, instance: Supplier, **kwargs):
+    SupplierEvent.objects.create(
+        supplier_id=instance.pk,
+        action=SupplierEventChoices.DELETED,
+        changes={"title": [instance.title, None]},
+    )
+
+
+@receiver(post_save, sender=Supplier)
+def count_supplier_debt(
+    sender, instance: Supplier, created, raw=False, update_fields=None, **kwargs
+):
+    """Running debt statistics, balance changes come from `apply_debt`."""
+
+    if raw:
+        return
+    deltas = supplier_debt_deltas(instance, created, update_fields)
+    if deltas:
+        transaction.on_commit(lambda: add_debt_deltas(deltas))
+
+
+@receiver(post_delete, sender=Supplier)
+def uncount_supplier_debt(sender, instance: Supplier, **kwargs):
+    deltas = debt_deltas([(instance.type_supplier, -1, -instance.debt)])
+    transaction.on_commit(lambda: add_debt_deltas(deltas))
+
+
+@receiver(m2m_changed, sender=Supplier.employees.through)
+def reset_supplier_visibility(sender, instance, action, reverse, pk_set, **kwargs):
+    """Drops cached visible supplier ids of users whose links changed."""
+
+    if action == "pre_clear" and not reverse:
+        # pk_set is empty on clear, remember who loses access
+        instance._cleared_employee_ids = list(
+            instance.employees.values_list("id", flat=True)
+        )
+    elif action in ("post_add", "post_remove", "post_clear"):
+        if reverse:
+            user_ids = [instance.pk]
+        elif action == "post_clear":
+            user_ids = instance._cleared_employee_ids
+        else:
+            user_ids = list(pk_set)
+        # after commit, or a reader caches the old ids under the new version
+        transaction.on_commit(lambda: invalidate_visibility(user_ids))
+
+
+@receiver(post_save, sender=Supplier)
+def reset_supplier_qr(sender, instance: Supplier, **kwargs):
+    """Title is part of the QR payload."""
+
+    transaction.on_commit(lambda: forget_supplier_qr_digests([instance.pk]))
+
+
+@receiver(post_save, sender=Contact)
+def reset_contact_qr(sender, instance: Contact, **kwargs):
+    supplier_ids = list(
+        Supplier.objects.filter(contact=instance).values_list("id", flat=True)
+    )
+    transaction.on_commit(lambda: forget_supplier_qr_digests(supplier_ids))
+
+
+# Versions are bumped after commit, or a concurrent reader caches the old
+# rows under the new version until the next write.
+
+
+@receiver(post_save, sender=Contact)
+@receiver(post_delete, sender=Contact)
+def reset_contact_versions(sender, **kwargs):
+    transaction.on_commit(lambda: bump_data_versions(CONTACTS))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def reset_product_versions(sender, **kwargs):
+    """Products are nested in supplier output too."""
+
+    transaction.on_commit(lambda: bump_data_versions(PRODUCTS, SUPPLIERS))
+
+
+@receiver(post_save, sender=Supplier)
+@receiver(post_delete, sender=Supplier)
+@receiver(post_save, sender=Contact)
+@receiver(post_delete, sender=Contact)
+@receiver(m2m_changed, sender=Supplier.employees.through)
+@receiver(m2m_changed, sender=Supplier.products.through)
+def reset_supplier_versions(sender, action=None, **kwargs):
+    """Anything nested in supplier output drops cached supplier responses."""
+
+    if action is None or action.startswith("post_"):
+        transaction.on_commit(lambda: bump_data_versions(SUPPLIERS))
+
+
+@receiver(post_save, sender=User)
+def reset_employee_versions(sender, instance: User, update_fields=None, **kwargs):
+    """
+    Only employees are nested in supplier output, and only some of their
+    fields, so logins and other users keep the cache.
+    """
+
+    if update_fields is not None and not set(update_fields) & set(
+        ClientSerializer.Meta.fields
+    ):
+        return
+    if instance.supplier_set.exists():
+        transaction.on_commit(lambda: bump_data_versions(SUPPLIERS))
@@ -0,0 +1,312 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.postgres.fields import ArrayField
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import (
+    Aggregate,
+    Avg,
+    Count,
+    FloatField,
+    Max,
+    Min,
+    Sum,
+)
+from django.utils import timezone
+
+from .choices import SupplierChoices
+from .models import Supplier
+
+
+STATISTICS_CACHE_KEY = "retail:debt-statistics"
+STATISTICS_LOCK_KEY = "retail:debt-statistics:lock"
+PERCENTILES = (50, 90, 99)
+
+AGGREGATES = {
+    "count": Count("id"),
+    "total": Sum("debt"),
+    "average": Avg("debt"),
+    "minimum": Min("debt"),
+    "maximum": Max("debt"),
+}
+
+
+class PercentileCont(Aggregate):
+    """PostgreSQL `percentile_cont` of several fractions, one sort for all."""
+
+    function = "percentile_cont"
+    template = (
+        "%(function)s(ARRAY[%(fractions)s]) WITHIN GROUP (ORDER BY %(expressions)s)"
+    )
+
+    def __init__(self, expression, fractions, **extra):
+        super().__init__(
+            expression,
+            fractions=", ".join(str(float(fraction)) for fraction in fractions),
+            output_field=ArrayField(FloatField()),
+            **extra,
+        )
+
+
+def _money(value) -> Decimal:
+    return Decimal(str(value or 0)).quantize(Decimal("0.01"))
+
+
+def _percentile_positions(count: int) -> dict[str, tuple[int, Decimal]]:
+    """
+    Row offset and fraction towards the next row of each percentile,
+    interpolated like `percentile_cont`. Each is one indexed
+    `ORDER BY debt OFFSET n LIMIT 2` query on databases without it.
+    """
+
+    positions = {}
+    for percentile in PERCENTILES:
+        offset, rest = divmod(max(count - 1, 0) * percentile, 100)
+        positions[f"p{percentile}"] = offset, Decimal(rest) / 100
+    return positions
+
+
+def _interpolate(debts: list, fraction: Decimal):
+    if len(debts) < 2:
+        return debts[0]
+    return debts[0] + (debts[1] - debts[0]) * fraction
+
+
+def _ordered_debts():
+    return Supplier.objects.order_by("debt").values_list("debt", flat=True)
+
+
+def _percentile_aggregate() -> dict:
+    if connection.vendor != "postgresql":
+        return {}
+    return {"percentiles": PercentileCont("debt", [p / 100 for p in PERCENTILES])}
+
+
+def _by_type():
+    return (
+        Supplier.objects.order_by("type_supplier")
+        .values("type_supplier")
+        .annotate(
+            count=AGGREGATES["count"],
+            total=AGGREGATES["total"],
+            average=AGGREGATES["average"],
+        )
+    )
+
+
+def _snapshot(totals: dict, percentiles: dict, by_type) -> dict:
+    return {
+        "count": totals["count"],
+        "total": _money(totals["total"]),
+        "average": _money(totals["average"]),
+        "minimum": _money(totals["minimum"]),
+        "maximum": _money(totals["maximum"]),
+        "percentiles": {name: _money(value) for name, value in percentiles.items()},
+        "by_type": [
+            {
+                "type_supplier": row["type_supplier"],
+                "count": row["count"],
+                "total": _money(row["total"]),
+                "average": _money(row["average"]),
+            }
+            for row in by_type
+        ],
+        "computed_at": timezone.now(),
+    }
+
+
+def compute_debt_statistics() -> dict:
+    """Full scan of suppliers, builds the statistics snapshot."""
+
+    totals = Supplier.objects.aggregate(**AGGREGATES, **_percentile_aggregate())
+    if "percentiles" in totals:
+        values = totals["percentiles"] or [0] * len(PERCENTILES)
+        percentiles = {f"p{p}": value for p, value in zip(PERCENTILES, values)}
+    else:
+        percentiles = {}
+        for name, (offset, fraction) in _percentile_positions(totals["count"]).items():
+            debts = list(_ordered_debts()[offset : offset + 2])
+            percentiles[name] = _interpolate(debts, fraction) if debts else 0
+    return _snapshot(totals, percentiles, _by_type())
+
+
+async def acompute_debt_statistics() -> dict:
+    """`compute_debt_statistics` with the async ORM."""
+
+    totals = await Supplier.objects.aaggregate(**AGGREGATES, **_percentile_aggregate())
+    if "percentiles" in totals:
+        values = totals["percentiles"] or [0] * len(PERCENTILES)
+        percentiles = {f"p{p}": value for p, value in zip(PERCENTILES, values)}
+    else:
+        percentiles = {}
+        for name, (offset, fraction) in _percentile_positions(totals["count"]).items():
+            debts = [debt async for debt in _ordered_debts()[offset : offset + 2]]
+            percentiles[name] = _interpolate(debts, fraction) if debts else 0
+    by_type = [row async for row in _by_type()]
+    return _snapshot(totals, percentiles, by_type)
+
+
+# Running aggregates.
+# Count and total debt of every supplier type are cache counters (totals in
+# kopecks), moved after commit by deltas: `apply_debt` for balances, signals
+# and bulk writes for created, deleted and retyped suppliers. Minimum, maximum
+# and percentiles need a sort, they are refreshed on a schedule together with
+# the counters, which also fixes drift of deltas lost meanwhile.
+# A stale snapshot is refreshed by one reader under a lock while the others
+# keep serving it. Only a cold cache is computed by every reader.
+
+
+def _counter_keys(type_supplier: int) -> tuple[str, str]:
+    return (
+        f"retail:debt-statistics:count:{type_supplier}",
+        f"retail:debt-statistics:total:{type_supplier}",
+    )
+
+
+COUNTER_KEYS = [
+    key for choice in SupplierChoices.values for key in _counter_keys(choice)
+]
+
+
+def _counters(snapshot: dict) -> dict[str, int]:
+    counters = dict.fromkeys(COUNTER_KEYS, 0)
+    for row in snapshot["by_type"]:
+        count_key, total_key = _counter_keys(row["type_supplier"])
+        counters[count_key] = row["count"]
+        counters[total_key] = int(row["total"] * 100)
+    return counters
+
+
+def _with_counters(snapshot: dict, counters: dict[str, int]) -> dict:
+    """Snapshot with count, total, average and types of the counters."""
+
+    by_type = []
+    for choice in SupplierChoices.values:
+        count_key, total_key = _counter_keys(choice)
+        if counters[count_key] > 0:
+            total = Decimal(counters[total_key]) / 100
+            by_type.append(
+                {
+                    "type_supplier": choice,
+                    "count": counters[count_key],
+                    "total": _money(total),
+                    "average": _money(total / counters[count_key]),
+                }
+            )
+    count = sum(row["count"] for row in by_type)
+    total = sum((row["total"] for row in by_type), Decimal(0))
+    return {
+        **snapshot,
+        "count": count,
+        "total": _money(total),
+        "average": _money(total / count if count else 0),
+        "by_type": by_type,
+    }
+
+
+def debt_deltas(rows) -> list[tuple[int, int, Decimal]]:
+    """Rows `(type_supplier, count, total)` merged by type, zeros dropped."""
+
+    merged = {}
+    for type_supplier, count, total in rows:
+        old_count, old_total = merged.get(type_supplier, (0, Decimal(0)))
+        merged[type_supplier] = old_count + count, old_total + _money(total)
+    return [
+        (type_supplier, count, total)
+        for type_supplier, (count, total) in merged.items()
+        if count or total
+    ]
+
+
+def supplier_debt_deltas(
+    supplier: Supplier, created: bool = False, update_fields=None
+) -> list[tuple[int, int, Decimal]]:
+    """
+    Deltas of a saved supplier against type and debt loaded from the
+    database. Nothing when they were not loaded, the refresh catches up.
+    """
+
+    new = supplier.type_supplier, _money(supplier.debt)
+    if created:
+        supplier._loaded_debt = new
+        return debt_deltas([(new[0], 1, new[1])])
+    loaded = getattr(supplier, "_loaded_debt", None)
+    if loaded is None:
+        return []
+    if update_fields is not None:
+        new = (
+            new[0] if "type_supplier" in update_fields else loaded[0],
+            new[1] if "debt" in update_fields else loaded[1],
+        )
+    supplier._loaded_debt = new
+    return debt_deltas([(loaded[0], -1, -loaded[1]), (new[0], 1, new[1])])
+
+
+def add_debt_deltas(deltas) -> None:
+    """Moves the counters, call after commit."""
+
+    try:
+        for type_supplier, count, total in deltas:
+            count_key, total_key = _counter_keys(type_supplier)
+            if count:
+                cache.incr(count_key, count)
+            if total:
+                cache.incr(total_key, int(total * 100))
+    except ValueError:
+        # counters were evicted, the next reader recomputes everything
+        cache.delete(STATISTICS_CACHE_KEY)
+
+
+def _is_fresh(snapshot: dict) -> bool:
+    age = timezone.now() - snapshot["computed_at"]
+    return age < timedelta(seconds=settings.RETAIL_STATISTICS_TIMEOUT)
+
+
+def refresh_debt_statistics() -> dict:
+    """Recomputes snapshot and counters and stores them in the cache."""
+
+    snapshot = compute_debt_statistics()
+    cache.set_many({STATISTICS_CACHE_KEY: snapshot, **_counters(snapshot)}, None)
+    return snapshot
+
+
+async def arefresh_debt_statistics() -> dict:
+    snapshot = await acompute_debt_statistics()
+    await cache.aset_many({STATISTICS_CACHE_KEY: snapshot, **_counters(snapshot)}, None)
+    return snapshot
+
+
+def get_debt_statistics() -> dict:
+    """Cached snapshot with running counters, refreshed by one process."""
+
+    found = cache.get_many([STATISTICS_CACHE_KEY, *COUNTER_KEYS])
+    cached = found.pop(STATISTICS_CACHE_KEY, None)
+    if cached is None or len(found) < len(COUNTER_KEYS):
+        return refresh_debt_statistics()
+    if _is_fresh(cached) or not cache.add(
+        STATISTICS_LOCK_KEY, True, settings.RETAIL_STATISTICS_LOCK_TIMEOUT
+    ):
+        return _with_counters(cached, found)
+    try:
+        return refresh_debt_statistics()
+    finally:
+        cache.delete(STATISTICS_LOCK_KEY)
+
+
+async def aget_debt_statistics() -> dict:
+    """`get_debt_statistics` for async views."""
+
+    found = await cache.aget_many([STATISTICS_CACHE_KEY, *COUNTER_KEYS])
+    cached = found.pop(STATISTICS_CACHE_KEY, None)
+    if cached is None or len(found) < len(COUNTER_KEYS):
+        return await arefresh_debt_statistics()
+    if _is_fresh(cached) or not await cache.aadd(
+        STATISTICS_LOCK_KEY, True, settings.RETAIL_STATISTICS_LOCK_TIMEOUT
+    ):
+        return _with_counters(cached, found)
+    try:
+        return await arefresh_debt_statistics()
+    finally:
+        await cache.adelete(STATISTICS_LOCK_KEY)
@@ -1,48 +1,351 @@
-import random
-from decimal import Decimal
-from io import BytesIO
+import logging
+import time
 
 from django.conf import settings
-from django.core.files.base import ContentFile
-from django.core.mail import EmailMessage
-from django.db.models import F
+from django.core.mail import (
+    EmailMessage,
+    get_connection,
+)
+from django.db.models import (
+    Max,
+    Min,
+)
+from django.utils import timezone
 
-import qrcode
-from celery import shared_task
+from celery import (
+    chord,
+    shared_task,
+)
 
-from .models import Supplier
+from .caching import (
+    bump_data_versions,
+    SUPPLIERS,
+)
+from .choices import (
+    DebtJobStatusChoices,
+    DebtTransactionChoices,
+)
+from .debt import debt_lock
+from .jobs import (
+    finish_job,
+    plan_job,
+    run_debt_job,
+    shard_timings,
+    stale_jobs,
+    start_clear_job,
+    start_debt_job,
+)
+from .ledger import compact_debt_ledger as compact_ledger
+from .models import (
+    DebtJob,
+    Supplier,
+)
+from .partitions import (
+    is_supported,
+    maintain_partitions as maintain_time_partitions,
+)
+from .qr import (
+    contact_payload,
+    render_many,
+)
+from .serializers import DebtJobShardSerializer
+from .statistics import refresh_debt_statistics
 
 
-@shared_task
-def increase_debt():
+logger = logging.getLogger(__name__)
+
+
+def _run_scheduled_job(task, kind: int, low: int, high: int, chunk_size=None):
+    """
+    Runs a whole-table job of the scheduled operation under a lock:
+    a late or duplicated beat run is skipped, an interrupted job is continued.
+    With `RETAIL_DEBT_SHARDS` > 1 the planned job fans out as a chord
+    of shard tasks, the lock is held until the shards are dispatched and
+    a job still running is not dispatched again. A failed or stale job
+    is dispatched again, its finished chunks are kept.
+    """
+
+    with debt_lock(f"debt-job:{kind}") as acquired:
+        if not acquired:
+            return None
+        job = (
+            DebtJob.objects.filter(kind=kind)
+            .exclude(status=DebtJobStatusChoices.DONE)
+            .order_by("id")
+            .first()
+        )
+        shards = settings.RETAIL_DEBT_SHARDS
+        if job is None:
+            job = start_debt_job(kind, {"filters": {}}, low, high, shards=shards)
+        elif (
+            job.shards > 1
+            and job.status != DebtJobStatusChoices.FAILED
+            and not stale_jobs().filter(pk=job.pk).exists()
+        ):
+            return None
+
+        if job.shards > 1:
+            job = plan_job(job.pk, chunk_size)
+            DebtJob.objects.filter(pk=job.pk).update(
+                status=DebtJobStatusChoices.RUNNING, error="", updated=timezone.now()
+            )
+            chord(
+                process_debt_shard.s(job.pk, shard, chunk_size)
+                for shard in range(job.shards)
+            )(finish_debt_job.s(job.pk).on_error(fail_debt_job.s(job.pk)))
+            return {"job": job.pk, "rows": job.total, "shards": job.shards}
+
+        started = time.perf_counter()
+        job = run_debt_job(job.pk, chunk_size, worker=task.request.hostname or "")
+    return {
+        "job": job.pk,
+        "rows": job.processed,
+        "chunks": job.chunks.count(),
+        "entries": job.changed,
+        "elapsed": round(time.perf_counter() - started, 3),
+    }
+
+
+@shared_task(bind=True)
+def increase_debt(self, chunk_size=None):
     """Increases suppliers debt by random number from 5 to 500, every 3 hours."""
-    suppliers = Supplier.objects.only("id", "debt")
-    for supplier in suppliers:
-        amount = Decimal(str(round(random.uniform(5, 500), 2)))
-        Supplier.objects.filter(id=supplier.id).update(debt=F("debt") + amount)
+    summary = _run_scheduled_job(
+        self, DebtTransactionChoices.INCREASE, 5, 500, chunk_size
+    )
+    if summary is None:
+        logger.info("Увеличение долгов уже выполняется")
+    elif "shards" in summary:
+        logger.info(
+            f"Увеличение долгов у {summary['rows']} поставщиков "
+            f"запущено в {summary['shards']} шардах"
+        )
+    else:
+        logger.info(
+            f"Долги увеличены у {summary['rows']} поставщиков за {summary['elapsed']} с"
+        )
+    return summary
+
+
+@shared_task(bind=True)
+def decrease_debt(self, chunk_size=None):
+    """Reduces debt by random number from 100 to 10000 every day at 6:30."""
+    summary = _run_scheduled_job(
+        self, DebtTransactionChoices.DECREASE, 100, 10000, chunk_size
+    )
+    if summary is None:
+        logger.info("Уменьшение долгов уже выполняется")
+    elif "shards" in summary:
+        logger.info(
+            f"Уменьшение долгов у {summary['rows']} поставщиков "
+            f"запущено в {summary['shards']} шардах"
+        )
+    else:
+        logger.info(
+            f"Долги уменьшены у {summary['rows']} поставщиков за {summary['elapsed']} с"
+        )
+    return summary
+
 
-    print(f"Долги увеличены у {suppliers.count()} поставщиков")
+@shared_task(bind=True, acks_late=True, reject_on_worker_lost=True)
+def process_debt_shard(self, job_id, shard, chunk_size=None):
+    """Runs chunks of one shard of a `DebtJob`, returns the shard timing."""
+    job = run_debt_job(
+        job_id, chunk_size, worker=self.request.hostname or "", shard=shard
+    )
+    timings = {row["shard"]: row for row in shard_timings(job)}
+    return DebtJobShardSerializer(timings[shard]).data if shard in timings else {}
 
 
 @shared_task
-def decrease_debt():
-    """Reduces debt by random number from 100 to 10000 every day at 6:30."""
-    suppliers = Supplier.objects.only("id", "debt")
+def finish_debt_job(shards, job_id):
+    """
+    Chord callback of a sharded job: marks it done, drops cached responses
+    and returns the summary with per-shard timing.
+    """
+    job = finish_job(job_id)
+    bump_data_versions(SUPPLIERS)
+
+    timing = job.chunks.aggregate(started=Min("started"), finished=Max("finished"))
+    elapsed = 0
+    if timing["started"] is not None:
+        elapsed = (timing["finished"] - timing["started"]).total_seconds()
+    summary = {
+        "job": job.pk,
+        "rows": job.processed,
+        "chunks": job.chunks.count(),
+        "entries": job.changed,
+        "elapsed": round(elapsed, 3),
+        "shards": shards,
+    }
+    logger.info(
+        f"{job.get_kind_display()}: {summary['rows']} поставщиков "
+        f"в {len(shards)} шардах за {summary['elapsed']} с"
+    )
+    return summary
+
+
+@shared_task
+def fail_debt_job(request, exc, traceback, job_id):
+    """
+    Error callback of a sharded job chord: a shard failed or was lost,
+    the job is failed and the next scheduled run dispatches it again.
+    """
+    DebtJob.objects.filter(pk=job_id).exclude(status=DebtJobStatusChoices.DONE).update(
+        status=DebtJobStatusChoices.FAILED, error=str(exc), updated=timezone.now()
+    )
+    logger.error(f"Задача {job_id} завершилась с ошибкой: {exc}")
+
+
+def _process_job(task, job_id) -> int:
+    def publish(job):
+        task.update_state(
+            state="PROGRESS",
+            meta={"job": job.pk, "processed": job.processed, "total": job.total},
+        )
+
+    job = run_debt_job(job_id, on_progress=publish, worker=task.request.hostname or "")
+    return job.changed
+
+
+@shared_task(bind=True, acks_late=True, reject_on_worker_lost=True)
+def process_debt_job(self, job_id):
+    """
+    Runs a `DebtJob` or joins workers already running it, chunks are claimed
+    with SKIP LOCKED. Progress is kept in the job and published as
+    `PROGRESS` task state.
+    """
+    return _process_job(self, job_id)
+
+
+@shared_task(bind=True, acks_late=True, reject_on_worker_lost=True)
+def async_clear_data(self, job_id):
+    """
+    Clears debt of a `DebtJob` selection, see `process_debt_job`.
+    Messages queued before jobs carry a list of supplier ids instead,
+    they run as a job of these ids. Accepted for one release.
+    """
+    if isinstance(job_id, list):
+        job_id = start_clear_job({"ids": job_id}).pk
+    changed = _process_job(self, job_id)
+    logger.info(f"Обнулен долг для {changed} поставщиков")
+    return changed
+
+
+@shared_task
+def resume_debt_jobs():
+    """Re-queues unfinished debt jobs without progress, every 10 minutes."""
+    job_ids = list(stale_jobs().values_list("id", flat=True))
+    for job_id in job_ids:
+        process_debt_job.delay(job_id)
+    return job_ids
+
+
+@shared_task
+def compact_debt_ledger():
+    """Writes monthly balance snapshots of the debt ledger, every day at 3:00."""
+    snapshots = compact_ledger()
+    logger.info(f"Записано {snapshots} снимков задолженности")
+    return snapshots
+
+
+@shared_task
+def refresh_statistics():
+    """Recomputes percentiles and debt counters, every 15 minutes."""
+    snapshot = refresh_debt_statistics()
+    return snapshot["count"]
+
+
+@shared_task
+def maintain_partitions():
+    """Creates partitions ahead and archives expired ones, every day at 4:00."""
+    if not is_supported():
+        return {}
+    report = maintain_time_partitions()
+    for table, changes in report.items():
+        logger.info(
+            f"{table}: создано {len(changes['created'])}, "
+            f"архивировано {len(changes['archived'])} партиций"
+        )
+    return report
 
-    for supplier in suppliers:
-        amount = Decimal(str(round(random.uniform(100, 10000), 2)))
-        new_debt = max(Decimal("0"), supplier.debt - amount)
-        Supplier.objects.filter(id=supplier.id).update(debt=new_debt)
 
-    print(f"Долги уменьшены у {suppliers.count()} поставщиков")
+def _qr_message(supplier, email, contact_data, image, connection):
+    return EmailMessage(
+        f"QR-код контактов поставщика {supplier.title}",
+        f"Данные поставщика {supplier.title}:\n{contact_data}",
+        settings.DEFAULT_FROM_EMAIL,
+        [email],
+        attachments=[(f"qr_{supplier.id}.png", image, "image/png")],
+        connection=connection,
+    )
 
 
 @shared_task
-def async_clear_data(supplier_ids):
-    """async clear data for more 20 objects."""
-    updated_count = Supplier.objects.filter(id__in=supplier_ids).update(debt=0)
-    print(f"Обнулен долг для {updated_count} поставщиков")
-    return updated_count
+def send_qr_code_emails(items):
+    """
+    Bulk QR pipeline: renders and emails supplier contact QR codes.
+
+    - Loads all suppliers with contacts in one query
+    - Takes PNGs from the content-addressed cache, renders the rest in a pool
+    - Sends mails over one SMTP connection per batch
+
+    Parameters:
+     - items (list): pairs [email, supplier_id]
+
+    Returns:
+    list: per-item outcome dicts with `email`, `supplier_id`, `status`
+    (`sent`, `not_found` or `error`) and `error` details
+    """
+    supplier_ids = {supplier_id for _, supplier_id in items}
+    suppliers = Supplier.objects.select_related("contact").in_bulk(supplier_ids)
+    payloads = {
+        supplier.id: contact_payload(supplier.title, supplier.contact)
+        for supplier in suppliers.values()
+    }
+    images = render_many(list(payloads.values()))
+
+    outcomes = []
+    batch_size = settings.RETAIL_QR_MAIL_BATCH_SIZE
+    for start in range(0, len(items), batch_size):
+        batch = [
+            {"email": email, "supplier_id": supplier_id, "status": "", "error": ""}
+            for email, supplier_id in items[start : start + batch_size]
+        ]
+        outcomes += batch
+
+        connection = get_connection()
+        try:
+            connection.open()
+        except Exception as e:
+            for outcome in batch:
+                outcome.update(status="error", error=str(e))
+            continue
+
+        try:
+            for outcome in batch:
+                supplier = suppliers.get(outcome["supplier_id"])
+                if supplier is None:
+                    outcome.update(status="not_found", error="Supplier not found")
+                    continue
+                contact_data = payloads[supplier.id]
+                message = _qr_message(
+                    supplier,
+                    outcome["email"],
+                    contact_data,
+                    images[contact_data],
+                    connection,
+                )
+                try:
+                    connection.send_messages([message])
+                    outcome["status"] = "sent"
+                except Exception as e:
+                    outcome.update(status="error", error=str(e))
+        finally:
+            connection.close()
+
+    sent = sum(outcome["status"] == "sent" for outcome in outcomes)
+    logger.info(f"QR-коды отправлены: {sent} из {len(outcomes)}")
+    return outcomes
 
 
 @shared_task
@@ -50,11 +353,7 @@ def send_qr_code_email(email, supplier_id):
     """
     Generates and emails supplier contact QR code.
 
-    End-to-end QR code processing:
-    - Fetches supplier and contact details
-    - Formats contact data for encoding
-    - Generates QR code image
-    - Emails QR code as PNG attachment
+    Single-item wrapper over `send_qr_code_emails`.
 
     Parameters:
      - email (str): Recipient email address
@@ -62,53 +361,11 @@ def send_qr_code_email(email, supplier_id):
 
     Returns:
     str: Success message or error details
-
-    Error Handling:
-    - Catches and returns any exceptions
-    - Includes supplier lookup failure
     """
     try:
-        supplier = Supplier.objects.get(id=supplier_id)
-        contact = supplier.contact
-
-        # data for qr
-        contact_data = f"""
-        {supplier.title}
-        Email: {contact.email}
-        Адрес: {contact.country}, {contact.city}, {contact.street}, {contact.house_number}
-        """
-
-        # gen qr
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(contact_data)
-        qr.make(fit=True)
-
-        img = qr.make_image(fill_color="black", back_color="white")
-
-        # save qr
-        buffer = BytesIO()
-        img.save(buffer, format="PNG")
-        qr_code = ContentFile(buffer.getvalue(), name=f"qr_{supplier_id}.png")
-
-        # send email
-        subject = f"QR-код контактов поставщика {supplier.title}"
-        message = f"Данные поставщика {supplier.title}:\n{contact_data}"
-        from_email = settings.DEFAULT_FROM_EMAIL
-        recipient_list = [email]
-
-        EmailMessage(
-            subject,
-            message,
-            from_email,
-            recipient_list,
-            attachments=[(f"qr_{supplier_id}.png", qr_code.read(), "image/png")],
-        )
-
-        return f"QR-код отправлен на {email}"
+        (outcome,) = send_qr_code_emails([(email, supplier_id)])
     except Exception as e:
         return f"Ошибка при отправке QR-кода: {str(e)}"
+    if outcome["status"] != "sent":
+        return f"Ошибка при отправке QR-кода: {outcome['error']}"
+    return f"QR-код отправлен на {email}"
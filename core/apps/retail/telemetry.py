@@ -0,0 +1,187 @@
+import time
+
+from django.core.cache import cache
+from django.db import connection
+
+from celery import current_app
+from celery.signals import (
+    before_task_publish,
+    task_postrun,
+    task_prerun,
+)
+
+from .metrics import QueryTimer
+from .statistics import PERCENTILES
+
+
+# Telemetry of retail Celery tasks.
+# Signals measure every run: wall time, SQL queries, rows written and the lag
+# between publishing a message and the start of the task. Aggregates are
+# counters in the shared cache (Redis), so runs of all workers add up and
+# the web process reads them: sums and fixed-bucket histograms per task.
+# Connected in the app config `ready`, publishers and workers both need them.
+
+TASK_PREFIX = "core.apps.retail.tasks."
+PUBLISHED_HEADER = "retail_published_at"
+
+# upper bounds of histogram buckets in seconds, the last bucket is unbounded
+DURATION_BUCKETS = (0.1, 0.5, 1, 5, 15, 60, 300, 900, 3600)
+LAG_BUCKETS = (0.01, 0.1, 0.5, 1, 5, 30, 60, 300)
+COUNTERS = ("runs", "failures", "duration_ms", "queries", "rows", "lagged", "lag_ms")
+
+# task id -> (started, query timer, lag), a worker process runs one task at a time
+_running: dict[str, tuple] = {}
+
+
+def _key(task: str, counter: str) -> str:
+    return f"retail:task:{task}:{counter}"
+
+
+def _bucket_keys(task: str, histogram: str, bounds) -> list[str]:
+    return [_key(task, f"{histogram}:{index}") for index in range(len(bounds) + 1)]
+
+
+def _metric_keys(task: str) -> list[str]:
+    return [
+        *(_key(task, counter) for counter in COUNTERS),
+        *_bucket_keys(task, "duration", DURATION_BUCKETS),
+        *_bucket_keys(task, "lag", LAG_BUCKETS),
+    ]
+
+
+def _bucket(value: float, bounds) -> int:
+    for index, bound in enumerate(bounds):
+        if value <= bound:
+            return index
+    return len(bounds)
+
+
+def _incr(key: str, delta: int = 1) -> None:
+    cache.add(key, 0, None)
+    cache.incr(key, delta)
+
+
+def record_run(
+    task: str,
+    seconds: float,
+    queries: int,
+    rows: int,
+    lag: float | None = None,
+    failed: bool = False,
+) -> None:
+    _incr(_key(task, "runs"))
+    if failed:
+        _incr(_key(task, "failures"))
+    _incr(_key(task, "duration_ms"), round(seconds * 1000))
+    _incr(_key(task, "queries"), queries)
+    _incr(_key(task, "rows"), rows)
+    duration_keys = _bucket_keys(task, "duration", DURATION_BUCKETS)
+    _incr(duration_keys[_bucket(seconds, DURATION_BUCKETS)])
+    if lag is not None:
+        _incr(_key(task, "lagged"))
+        _incr(_key(task, "lag_ms"), round(lag * 1000))
+        lag_keys = _bucket_keys(task, "lag", LAG_BUCKETS)
+        _incr(lag_keys[_bucket(lag, LAG_BUCKETS)])
+
+
+@before_task_publish.connect
+def stamp_published(sender=None, headers=None, **kwargs):
+    if sender and sender.startswith(TASK_PREFIX) and headers is not None:
+        headers[PUBLISHED_HEADER] = time.time()
+
+
+@task_prerun.connect
+def start_task_timer(task_id=None, task=None, **kwargs):
+    if not task.name.startswith(TASK_PREFIX):
+        return
+    published = getattr(task.request, PUBLISHED_HEADER, None)
+    lag = max(time.time() - published, 0) if published else None
+    timer = QueryTimer()
+    connection.execute_wrappers.append(timer)
+    _running[task_id] = (time.perf_counter(), timer, lag)
+
+
+@task_postrun.connect
+def finish_task_timer(task_id=None, task=None, state=None, **kwargs):
+    running = _running.pop(task_id, None)
+    if running is None:
+        return
+    started, timer, lag = running
+    if timer in connection.execute_wrappers:
+        connection.execute_wrappers.remove(timer)
+    record_run(
+        task.name[len(TASK_PREFIX) :],
+        time.perf_counter() - started,
+        timer.queries,
+        timer.rows,
+        lag,
+        failed=state == "FAILURE",
+    )
+
+
+def task_names() -> list[str]:
+    return sorted(
+        name[len(TASK_PREFIX) :]
+        for name in current_app.tasks
+        if name.startswith(TASK_PREFIX)
+    )
+
+
+def _histogram(found: dict, task: str, histogram: str, bounds) -> dict:
+    """Bucket counts by upper bound and percentiles as bucket upper bounds."""
+
+    counts = [found.get(key, 0) for key in _bucket_keys(task, histogram, bounds)]
+    labels = [str(bound) for bound in bounds] + ["+Inf"]
+    total = sum(counts)
+    percentiles = {}
+    for percentile in PERCENTILES:
+        cumulative = 0
+        for index, count in enumerate(counts):
+            cumulative += count
+            if total and cumulative * 100 >= total * percentile:
+                # None in the unbounded bucket
+                percentiles[f"p{percentile}"] = (list(bounds) + [None])[index]
+                break
+        else:
+            percentiles[f"p{percentile}"] = None
+    return {"buckets": dict(zip(labels, counts)), **percentiles}
+
+
+def task_metrics() -> list[dict]:
+    """Aggregates of every retail task that has run, the longest total time first."""
+
+    names = task_names()
+    found = cache.get_many([key for name in names for key in _metric_keys(name)])
+
+    metrics = []
+    for name in names:
+        values = {counter: found.get(_key(name, counter), 0) for counter in COUNTERS}
+        if not values["runs"]:
+            continue
+        seconds = values["duration_ms"] / 1000
+        metrics.append(
+            {
+                "task": name,
+                "runs": values["runs"],
+                "failures": values["failures"],
+                "seconds": seconds,
+                "avg_seconds": round(seconds / values["runs"], 3),
+                "queries": values["queries"],
+                "rows": values["rows"],
+                "rows_per_second": (
+                    round(values["rows"] / seconds, 1) if seconds else None
+                ),
+                "avg_lag_seconds": (
+                    round(values["lag_ms"] / values["lagged"] / 1000, 3)
+                    if values["lagged"]
+                    else None
+                ),
+                "duration": _histogram(found, name, "duration", DURATION_BUCKETS),
+                "lag": _histogram(found, name, "lag", LAG_BUCKETS),
+            }
+        )
+    return sorted(metrics, key=lambda row: row["seconds"], reverse=True)
+
+
+def reset_task_metrics() -> None:
+    cache.delete_many([key for name in task_names() for key in _metric_keys(name)])
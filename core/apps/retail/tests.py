@@ -1,4 +1,1616 @@
-from django.test import TestCase
+import csv
+import json
+from datetime import timedelta
+from decimal import Decimal
+from importlib import import_module
+from io import StringIO
+from itertools import count
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import (
+    mock,
+    skipUnless,
+)
 
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import (
+    connection,
+    connections,
+    DatabaseError,
+    transaction,
+)
+from django.db.models import (
+    Count,
+    Max,
+    Sum,
+)
+from django.test import (
+    override_settings,
+    TestCase,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import (
+    PermissionDenied,
+    ValidationError,
+)
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from .caching import (
+    get_data_versions,
+    SUPPLIERS,
+)
+from .choices import (
+    DebtJobStatusChoices,
+    DebtTransactionChoices,
+    SupplierChoices,
+    SupplierEventChoices,
+)
+from .counting import fast_count
+from .debt import (
+    adjust_debt,
+    apply_debt,
+    clear_debt,
+    record_debt_change,
+)
+from .jobs import (
+    plan_job,
+    process_chunk,
+    run_debt_job,
+    selection_spec,
+    spec_queryset,
+    start_debt_job,
+)
+from .ledger import debt_balance_at
+from .management.commands.explain_views import SEQ_SCAN
+from .metrics import (
+    is_write,
+    metrics_snapshot,
+    percentiles,
+    QueryBudgetExceeded,
+    QueryTimer,
+    reset_metrics,
+)
+from .models import (
+    Contact,
+    DebtJob,
+    DebtTransaction,
+    Product,
+    Supplier,
+    SupplierEvent,
+)
+from .network import subtree_totals
+from .pagination import SupplierCursorPagination
+from .partitions import (
+    create_partitions,
+    list_partitions,
+    month_from_now,
+)
+from .qr import (
+    CacheQRStore,
+    get_supplier_qr_digest,
+    remember_supplier_qr_digest,
+    render_many,
+)
+from .serializers import (
+    FastProductSerializer,
+    FastSupplierSerializer,
+    ProductSerializer,
+    SupplierSerializer,
+)
+from .statistics import (
+    get_debt_statistics,
+    refresh_debt_statistics,
+    STATISTICS_LOCK_KEY,
+)
+from .tasks import (
+    async_clear_data,
+    fail_debt_job,
+    finish_debt_job,
+    increase_debt,
+)
+from .visibility import (
+    filter_visible,
+    visibility_version,
+    visible_supplier_ids,
+)
+
+
+User = get_user_model()
+
+
+_numbers = count(1)
+
+
+def make_supplier(title="Поставщик", parent=None, **kwargs) -> Supplier:
+    number = next(_numbers)
+    contact = Contact.objects.create(
+        email=f"supplier{number}@example.com",
+        country="Россия",
+        city=kwargs.pop("city", "Москва"),
+        street="Тверская",
+        house_number=str(number),
+    )
+    kwargs.setdefault(
+        "type_supplier",
+        SupplierChoices.FACTORY if parent is None else SupplierChoices.DISTRIBUTOR,
+    )
+    return Supplier.objects.create(
+        title=title, contact=contact, supplier=parent, **kwargs
+    )
+
+
+class SelectionSpecTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.found = {make_supplier(f"Альфа {number}").pk for number in range(3)}
+        for number in range(2):
+            make_supplier(f"Бета {number}", type_supplier=SupplierChoices.DISTRIBUTOR)
+
+    def test_search_falls_back_to_ids(self):
+        queryset = Supplier.objects.filter(title__icontains="Альфа")
+        spec = selection_spec(queryset, {"q": ["Альфа"]})
+
+        self.assertEqual(set(spec["ids"]), self.found)
+        self.assertEqual(
+            set(spec_queryset(spec).values_list("id", flat=True)), self.found
+        )
+
+    def test_empty_filters_of_filtered_queryset_fall_back_to_ids(self):
+        queryset = Supplier.objects.filter(title__icontains="Альфа")
+
+        self.assertEqual(set(selection_spec(queryset, {})["ids"]), self.found)
+
+    def test_unfiltered_changelist_selects_table(self):
+        self.assertEqual(selection_spec(Supplier.objects.all(), {}), {"filters": {}})
+
+    def test_allowed_filters_are_kept(self):
+        queryset = Supplier.objects.filter(type_supplier=SupplierChoices.DISTRIBUTOR)
+        spec = selection_spec(queryset, {"type_supplier__exact": ["1"]})
+
+        self.assertEqual(spec, {"filters": {"type_supplier__exact": 1}})
+        self.assertEqual(spec_queryset(spec).count(), 2)
+
+
+class SupplierAdminTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser("admin", "admin@example.com", "pass")
+        cls.found = {
+            make_supplier(f"Альфа {number}", debt=10).pk for number in range(25)
+        }
+        for number in range(5):
+            make_supplier(f"Бета {number}", debt=10)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    @mock.patch("core.apps.retail.admin.async_clear_data")
+    def test_clear_debt_across_search_selects_found_suppliers(self, task):
+        url = reverse("admin:retail_supplier_changelist") + "?q=Альфа"
+        response = self.client.post(
+            url,
+            {
+                "action": "clear_debt",
+                "select_across": "1",
+                "index": "0",
+                "_selected_action": list(self.found)[:1],
+            },
+        )
+
+        self.assertEqual(response.status_code, 302)
+        job = DebtJob.objects.get()
+        task.delay.assert_called_once_with(job.pk)
+        self.assertEqual(
+            set(spec_queryset(job.spec).values_list("id", flat=True)), self.found
+        )
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        url = reverse("admin:retail_supplier_changelist")
+        parent = Supplier.objects.get(title="Бета 0")
+        children = Supplier.objects.filter(title__startswith="Альфа")
+        children.filter(title="Альфа 0").update(supplier=parent)
+        self.client.get(url)  # fills the cached filter choices
+
+        with CaptureQueriesContext(connection) as one_parent:
+            self.client.get(url)
+        children.update(supplier=parent)
+        with CaptureQueriesContext(connection) as parents:
+            response = self.client.get(url)
+
+        self.assertEqual(len(parents), len(one_parent))
+        self.assertContains(response, "Бета 0", count=26)
+
+
+class DebtLedgerTests(TestCase):
+    def setUp(self):
+        self.supplier = make_supplier(debt=Decimal("100.00"))
+        self.other = make_supplier(debt=Decimal("5.00"))
+
+    def entries(self, supplier) -> list[Decimal]:
+        return list(
+            DebtTransaction.objects.filter(supplier=supplier)
+            .order_by("id")
+            .values_list("amount", flat=True)
+        )
+
+    def test_every_changed_balance_has_entry(self):
+        entries = apply_debt(
+            DebtTransactionChoices.DECREASE,
+            {self.supplier.pk: Decimal("30"), self.other.pk: Decimal("10")},
+        )
+
+        self.supplier.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual(entries, 2)
+        self.assertEqual(self.supplier.debt, Decimal("70.00"))
+        self.assertEqual(self.other.debt, Decimal("0.00"))
+        self.assertEqual(self.entries(self.supplier), [Decimal("-30.00")])
+        # floored at zero, the entry is the applied change
+        self.assertEqual(self.entries(self.other), [Decimal("-5.00")])
+
+    def test_unchanged_balance_has_no_entry(self):
+        apply_debt(DebtTransactionChoices.CLEAR, {self.other.pk: Decimal(0)})
+
+        self.assertEqual(
+            apply_debt(DebtTransactionChoices.CLEAR, {self.other.pk: Decimal(0)}), 0
+        )
+        self.assertEqual(self.entries(self.other), [Decimal("-5.00")])
+
+    def test_ledger_sums_to_balance(self):
+        record_debt_change(
+            self.supplier, DebtTransactionChoices.OPENING, self.supplier.debt
+        )
+        amounts = {self.supplier.pk: Decimal("12.50")}
+        apply_debt(DebtTransactionChoices.INCREASE, amounts)
+        apply_debt(DebtTransactionChoices.DECREASE, amounts)
+        apply_debt(DebtTransactionChoices.INCREASE, amounts)
+
+        self.supplier.refresh_from_db()
+        self.assertEqual(sum(self.entries(self.supplier)), self.supplier.debt)
+
+    def test_balance_at_past_moment(self):
+        now = timezone.now()
+        DebtTransaction.objects.create(
+            supplier=self.supplier,
+            kind=DebtTransactionChoices.OPENING,
+            amount=Decimal("100.00"),
+            created=now - timedelta(days=3),
+        )
+        apply_debt(
+            DebtTransactionChoices.INCREASE,
+            {self.supplier.pk: Decimal("20")},
+            created=now - timedelta(days=2),
+        )
+        apply_debt(
+            DebtTransactionChoices.CLEAR,
+            {self.supplier.pk: Decimal(0)},
+            created=now - timedelta(days=1),
+        )
+
+        def balance_at(days):
+            return debt_balance_at(self.supplier.pk, now - timedelta(days=days))
+
+        self.assertEqual(balance_at(4), 0)
+        self.assertEqual(balance_at(2.5), Decimal("100.00"))
+        self.assertEqual(balance_at(1.5), Decimal("120.00"))
+        self.assertEqual(balance_at(0), 0)
+
+
+class DebtAdjustmentTests(TestCase):
+    def setUp(self):
+        self.suppliers = [
+            make_supplier(f"Поставщик {number}", debt=10) for number in range(5)
+        ]
+
+    def debts(self) -> list[Decimal]:
+        return list(Supplier.objects.order_by("id").values_list("debt", flat=True))
+
+    def test_applies_chunk_with_one_update(self):
+        table = connection.ops.quote_name(Supplier._meta.db_table)
+        with CaptureQueriesContext(connection) as queries:
+            summary = adjust_debt(5, 5, chunk_size=2)
+
+        self.assertEqual(summary["rows"], 5)
+        self.assertEqual(summary["chunks"], 3)
+        self.assertEqual(summary["entries"], 5)
+        updates = [query for query in queries if f"UPDATE {table}" in query["sql"]]
+        self.assertEqual(len(updates), 3)
+        self.assertEqual(self.debts(), [Decimal("15.00")] * 5)
+
+    def test_decrease_is_floored_at_zero(self):
+        summary = adjust_debt(100, 100, decrease=True, chunk_size=2)
+
+        self.assertEqual(summary["entries"], 5)
+        self.assertEqual(self.debts(), [Decimal("0.00")] * 5)
+        self.assertEqual(
+            set(DebtTransaction.objects.values_list("amount", flat=True)),
+            {Decimal("-10.00")},
+        )
+        self.assertEqual(adjust_debt(100, 100, decrease=True)["entries"], 0)
+
+    def test_clears_selection_only(self):
+        selected = [supplier.pk for supplier in self.suppliers[:3]]
+
+        summary = clear_debt(Supplier.objects.filter(pk__in=selected), chunk_size=2)
+
+        self.assertEqual((summary["rows"], summary["chunks"]), (3, 2))
+        self.assertEqual(self.debts(), [Decimal("0.00")] * 3 + [Decimal("10.00")] * 2)
+
+
+@mock.patch("core.apps.retail.views.send_qr_code_emails")
+class SupplierQRCodeBulkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("employee", "employee@example.com")
+        cls.own = make_supplier("Свой")
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.own.employees.add(cls.user)
+        cls.foreign = make_supplier("Чужой")
+        cls.url = reverse("generate-qr-bulk")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def items(self, *suppliers):
+        return {
+            "items": [
+                {"supplier_id": supplier.pk, "email": "to@example.com"}
+                for supplier in suppliers
+            ]
+        }
+
+    def test_starts_task_for_visible_suppliers(self, task):
+        task.delay.return_value.id = "task-id"
+
+        response = self.client.post(self.url, self.items(self.own), format="json")
+
+        self.assertEqual(response.status_code, 202)
+        task.delay.assert_called_once_with([("to@example.com", self.own.pk)])
+
+    def test_requires_authentication(self, task):
+        self.client.force_authenticate(None)
+
+        response = self.client.post(self.url, self.items(self.own), format="json")
+
+        self.assertEqual(response.status_code, 401)
+        task.delay.assert_not_called()
+
+    def test_rejects_suppliers_of_other_users(self, task):
+        response = self.client.post(
+            self.url, self.items(self.own, self.foreign), format="json"
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.data["items"]), [1])
+        task.delay.assert_not_called()
+
+    def test_rejects_too_many_items(self, task):
+        items = [self.own] * (settings.RETAIL_QR_BULK_MAX_ITEMS + 1)
+
+        response = self.client.post(self.url, self.items(*items), format="json")
+
+        self.assertEqual(response.status_code, 400)
+        task.delay.assert_not_called()
+
+
+@override_settings(RETAIL_DEBT_SHARDS=4)
+@mock.patch("core.apps.retail.tasks.chord")
+class ShardedDebtJobTests(TestCase):
+    def setUp(self):
+        for number in range(8):
+            make_supplier(f"Поставщик {number}", debt=10)
+        self.job = start_debt_job(
+            DebtTransactionChoices.INCREASE, {"filters": {}}, 5, 500, shards=4
+        )
+        plan_job(self.job.pk, chunk_size=2)
+
+    def fail(self):
+        fail_debt_job(None, RuntimeError("Шард упал"), None, self.job.pk)
+        self.job.refresh_from_db()
+
+    def test_failed_job_is_dispatched_again(self, chord):
+        self.fail()
+        self.assertEqual(self.job.status, DebtJobStatusChoices.FAILED)
+        self.assertEqual(self.job.error, "Шард упал")
+
+        summary = increase_debt.apply().result
+
+        self.assertEqual(summary, {"job": self.job.pk, "rows": 8, "shards": 4})
+        self.assertEqual(len(list(chord.call_args.args[0])), 4)
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, DebtJobStatusChoices.RUNNING)
+        self.assertEqual(self.job.error, "")
+
+    def test_running_job_is_not_dispatched_twice(self, chord):
+        self.assertIsNone(increase_debt.apply().result)
+        chord.assert_not_called()
+
+        self.fail()
+        increase_debt.apply()
+        self.assertIsNone(increase_debt.apply().result)
+        self.assertEqual(chord.call_count, 1)
+
+    def test_chord_records_failure(self, chord):
+        self.fail()
+        increase_debt.apply()
+
+        callback = chord.return_value.call_args.args[0]
+        (errback,) = callback.options["link_error"]
+        self.assertEqual(errback["task"], fail_debt_job.name)
+        self.assertEqual(tuple(errback["args"]), (self.job.pk,))
+
+
+class DebtJobClaimingTests(TestCase):
+    def setUp(self):
+        for number in range(5):
+            make_supplier(f"Поставщик {number}", debt=10)
+        self.job = start_debt_job(
+            DebtTransactionChoices.INCREASE, {"filters": {}}, 5, 5
+        )
+
+    def test_resumed_job_skips_finished_chunks(self):
+        plan_job(self.job.pk, chunk_size=2)
+        first = process_chunk(self.job, "worker-1")
+
+        job = run_debt_job(self.job.pk, worker="worker-2")
+
+        self.assertEqual(job.status, DebtJobStatusChoices.DONE)
+        self.assertEqual((job.processed, job.changed), (5, 5))
+        self.assertEqual(
+            list(job.chunks.order_by("first_id").values_list("worker", flat=True)),
+            ["worker-1", "worker-2", "worker-2"],
+        )
+        self.assertEqual(first.rows, 2)
+        # every supplier is changed once
+        self.assertEqual(
+            set(Supplier.objects.values_list("debt", flat=True)), {Decimal("15.00")}
+        )
+        self.assertEqual(DebtTransaction.objects.count(), 5)
+
+    def test_scheduled_job_is_skipped_while_locked(self):
+        name = f"debt-job:{DebtTransactionChoices.INCREASE}"
+        if connection.vendor == "postgresql":
+            # advisory locks are per session, hold it from another one
+            other = connections.create_connection("default")
+            self.addCleanup(other.close)
+            with other.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_lock(hashtext(%s))", [name])
+        else:
+            cache.add(f"retail:lock:{name}", 1)
+            self.addCleanup(cache.delete, f"retail:lock:{name}")
+
+        self.assertIsNone(increase_debt.apply().result)
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, DebtJobStatusChoices.PENDING)
+
+    def test_admin_edit_keeps_concurrent_change(self):
+        admin = User.objects.create_superuser("admin", "admin@example.com", "pass")
+        self.client.force_login(admin)
+        supplier = Supplier.objects.order_by("id").first()
+        product = Product.objects.create(name="Телефон", model="X1")
+        # a job changes the debt after the form was opened with 10
+        Supplier.objects.filter(pk=supplier.pk).update(debt=50)
+
+        response = self.client.post(
+            reverse("admin:retail_supplier_change", args=[supplier.pk]),
+            {
+                "title": "Переименован",
+                "type_supplier": supplier.type_supplier,
+                "contact": supplier.contact_id,
+                "debt": "30.00",
+                "initial-debt": "10.00",
+                "employees": [admin.pk],
+                "products": [product.pk],
+            },
+        )
+
+        self.assertEqual(response.status_code, 302)
+        supplier.refresh_from_db()
+        self.assertEqual(supplier.title, "Переименован")
+        self.assertEqual(supplier.debt, Decimal("70.00"))
+        self.assertEqual(
+            list(
+                DebtTransaction.objects.filter(supplier=supplier).values_list(
+                    "kind", "amount"
+                )
+            ),
+            [(DebtTransactionChoices.ADJUSTMENT, Decimal("20.00"))],
+        )
+
+
+class ClearDataTaskTests(TestCase):
+    def setUp(self):
+        self.suppliers = [
+            make_supplier(f"Поставщик {number}", debt=10) for number in range(3)
+        ]
+        self.selected = [supplier.pk for supplier in self.suppliers[:2]]
+
+    def debts(self) -> list[Decimal]:
+        return list(Supplier.objects.order_by("id").values_list("debt", flat=True))
+
+    def test_clears_job_selection(self):
+        job = start_debt_job(DebtTransactionChoices.CLEAR, {"ids": self.selected})
+
+        self.assertEqual(async_clear_data.apply(args=(job.pk,)).result, 2)
+        job.refresh_from_db()
+        self.assertEqual(job.status, DebtJobStatusChoices.DONE)
+        self.assertEqual(self.debts(), [Decimal("0.00")] * 2 + [Decimal("10.00")])
+
+    def test_accepts_queued_supplier_ids(self):
+        self.assertEqual(async_clear_data.apply(args=(self.selected,)).result, 2)
+
+        job = DebtJob.objects.get()
+        self.assertEqual(job.kind, DebtTransactionChoices.CLEAR)
+        self.assertEqual(job.spec, {"ids": self.selected})
+        self.assertEqual(job.status, DebtJobStatusChoices.DONE)
+        self.assertEqual(self.debts(), [Decimal("0.00")] * 2 + [Decimal("10.00")])
+
+
+class SupplierHistoryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user("staff", is_staff=True)
+        cls.employee = User.objects.create_user("employee")
+        supplier = make_supplier("Удаленный")
+        with cls.captureOnCommitCallbacks(execute=True):
+            supplier.employees.add(cls.employee)
+        cls.supplier_id = supplier.pk
+        supplier.delete()
+        cls.url = reverse("supplier-history", args=[cls.supplier_id])
+
+    def test_staff_reads_events_of_deleted_supplier(self):
+        client = APIClient()
+        client.force_authenticate(self.staff)
+
+        response = client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [event["action"] for event in response.data["events"]],
+            [SupplierEventChoices.DELETED, SupplierEventChoices.CREATED],
+        )
+
+    def test_former_employee_gets_not_found(self):
+        client = APIClient()
+        client.force_authenticate(self.employee)
+
+        self.assertEqual(client.get(self.url).status_code, 404)
+
+
+@skipUnless(connection.vendor == "postgresql", "Партиции только в PostgreSQL")
+class PartitionTableTests(TestCase):
+    table = "retail_partition_test"
+
+    def execute(self, sql, params=None):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall() if cursor.description else None
+
+    def test_time_series_tables_are_partitioned(self):
+        for model in (DebtTransaction, SupplierEvent):
+            self.assertTrue(list_partitions(model._meta.db_table))
+            self.assertEqual(create_partitions(model._meta.db_table), [])
+
+    def test_rows_past_partitions_are_kept_in_default_partition(self):
+        table = DebtTransaction._meta.db_table
+        entry = DebtTransaction.objects.create(
+            supplier=make_supplier(),
+            kind=DebtTransactionChoices.INCREASE,
+            amount=Decimal(10),
+            created=month_from_now(settings.RETAIL_PARTITIONS_AHEAD + 2),
+        )
+        default = f"SELECT COUNT(*) FROM {table}_default"
+        self.assertEqual(self.execute(default), [(1,)])
+
+        created = create_partitions(table, settings.RETAIL_PARTITIONS_AHEAD + 2)
+
+        self.assertEqual(len(created), 2)
+        self.assertEqual(self.execute(default), [(0,)])
+        self.assertEqual(self.execute(f"SELECT COUNT(*) FROM {created[-1]}"), [(1,)])
+        self.assertTrue(DebtTransaction.objects.filter(pk=entry.pk).exists())
+
+    def test_partition_table_keeps_rows_identity_and_constraints(self):
+        supplier = make_supplier()
+        self.execute(
+            f"CREATE TABLE {self.table} ("
+            "id bigint GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY, "
+            "supplier_id bigint NOT NULL REFERENCES retail_supplier (id) "
+            "DEFERRABLE INITIALLY DEFERRED, "
+            "created timestamptz NOT NULL)"
+        )
+        self.execute(
+            f"CREATE INDEX partition_test_created_idx ON {self.table} (created)"
+        )
+        # the last row is past the partitions created ahead
+        for days in (-70, 0, 400):
+            self.execute(
+                f"INSERT INTO {self.table} (supplier_id, created) "
+                "VALUES (%s, now() + %s * interval '1 day')",
+                [supplier.pk, days],
+            )
+        # a migration never converts rows inserted in its own transaction
+        self.execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+        migration = import_module("core.apps.retail.migrations.0007_time_partitions")
+        with connection.schema_editor() as editor:
+            migration.partition_table(editor, self.table, "created", month_from_now(1))
+
+        self.assertGreaterEqual(len(list_partitions(self.table)), 15)
+        self.assertEqual(self.execute(f"SELECT COUNT(*) FROM {self.table}"), [(3,)])
+        self.assertEqual(
+            self.execute(
+                f"INSERT INTO {self.table} (supplier_id, created) "
+                "VALUES (%s, now()) RETURNING id",
+                [supplier.pk],
+            ),
+            [(4,)],
+        )
+        constraints = dict(
+            self.execute(
+                "SELECT contype, pg_get_constraintdef(oid) FROM pg_constraint "
+                "WHERE conrelid = %s::regclass",
+                [self.table],
+            )
+        )
+        self.assertEqual(constraints["p"], "PRIMARY KEY (id, created)")
+        self.assertIn("REFERENCES retail_supplier(id)", constraints["f"])
+        self.assertEqual(
+            self.execute(
+                "SELECT indexname FROM pg_indexes WHERE indexname = %s",
+                ["partition_test_created_idx"],
+            ),
+            [("partition_test_created_idx",)],
+        )
+
+
+class SupplierPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("employee", "employee@example.com")
+        with cls.captureOnCommitCallbacks(execute=True):
+            for number in range(3):
+                make_supplier(f"Поставщик {number}").employees.add(cls.user)
+        cls.url = reverse("node-list")
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_counts_first_page_only(self):
+        first = self.client.get(self.url, {"country": "Россия", "page_size": 2})
+        self.assertEqual(first.data["count"], 3)
+
+        with mock.patch("core.apps.retail.pagination.fast_count") as fast_count:
+            second = self.client.get(first.data["next"])
+        fast_count.assert_not_called()
+        self.assertNotIn("count", second.data)
+        self.assertEqual(len(second.data["results"]), 1)
+
+    def test_async_pages_match(self):
+        token = Token.objects.create(user=self.user)
+        client = APIClient(HTTP_AUTHORIZATION=f"Token {token.key}")
+        url = reverse("async-suppliers")
+        first = client.get(url, {"country": "Россия", "page_size": 2}).json()
+        second = client.get(first["next"]).json()
+
+        self.assertEqual(first["count"], 3)
+        self.assertEqual(
+            [row["title"] for row in first["results"] + second["results"]],
+            list(Supplier.objects.values_list("title", flat=True)),
+        )
+        self.assertNotIn("count", second)
+
+    def test_async_pages_use_async_orm(self):
+        token = Token.objects.create(user=self.user)
+        client = APIClient(HTTP_AUTHORIZATION=f"Token {token.key}")
+        url = reverse("async-suppliers")
+        with mock.patch.object(
+            SupplierCursorPagination, "paginate_queryset", side_effect=AssertionError
+        ):
+            first = client.get(url, {"country": "Россия", "page_size": 2}).json()
+            second = client.get(first["next"]).json()
+            previous = client.get(second["previous"]).json()
+
+        self.assertEqual(previous["results"], first["results"])
+        self.assertIsNone(previous["previous"])
+        self.assertIsNone(second["next"])
+
+    def test_lists_suppliers_by_product(self):
+        product = Product.objects.create(name="Телефон", model="X1")
+        Supplier.objects.get(title="Поставщик 0").products.add(product)
+
+        response = self.client.get(
+            reverse("suppliers-by-product-list"), {"product_id": product.pk}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [row["title"] for row in response.data["results"]], ["Поставщик 0"]
+        )
+
+    def test_pages_ties_by_id(self):
+        released = timezone.now()
+        products = [
+            Product.objects.create(
+                name=f"Товар {number}", model="X", date_product_release=released
+            )
+            for number in range(5)
+        ]
+        names, url = [], reverse("product-list") + "?page_size=2"
+        while url:
+            response = self.client.get(url)
+            names += [row["name"] for row in response.data["results"]]
+            url = response.data["next"]
+        self.assertEqual(names, [product.name for product in reversed(products)])
+
+    def test_counts_next_page_on_request(self):
+        first = self.client.get(self.url, {"country": "Россия", "page_size": 2})
+        second = self.client.get(first.data["next"] + "&with_count=1")
+        self.assertEqual(second.data["count"], 3)
+
+
+@mock.patch("core.apps.retail.counting.planned_count", return_value=500000)
+class FastCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for number in range(3):
+            make_supplier(f"Поставщик {number}")
+
+    def setUp(self):
+        cache.clear()
+
+    def test_exact_below_threshold(self, planned_count):
+        queryset = Supplier.objects.filter(title__startswith="Поставщик")
+        with override_settings(RETAIL_ESTIMATED_COUNT_THRESHOLD=10):
+            self.assertEqual(fast_count(queryset), 3)
+        planned_count.assert_not_called()
+
+    def test_estimate_at_threshold(self, planned_count):
+        queryset = Supplier.objects.filter(title__startswith="Поставщик")
+        with override_settings(RETAIL_ESTIMATED_COUNT_THRESHOLD=3):
+            self.assertEqual(fast_count(queryset), 500000)
+
+
+class SupplierPathTests(TestCase):
+    def test_deep_path_saves(self):
+        parent = make_supplier("Дистрибьютор")
+        deep_path = "1234567/" * 40 + f"{parent.pk}/"
+        Supplier.objects.filter(pk=parent.pk).update(path=deep_path, level=40)
+
+        child = make_supplier("Магазин", parent=parent)
+        child.refresh_from_db()
+        self.assertEqual(child.path, f"{deep_path}{child.pk}/")
+        self.assertEqual(child.level, 41)
+
+    @override_settings(RETAIL_SUPPLIER_MAX_LEVEL=3)
+    def test_limits_depth_with_subtree(self):
+        root = make_supplier("Завод")
+        leaf = make_supplier("Сеть", parent=make_supplier("Дистрибьютор", parent=root))
+        moved = make_supplier("Магазин", type_supplier=SupplierChoices.DISTRIBUTOR)
+        make_supplier("Предприниматель", parent=moved)
+
+        moved.supplier = leaf
+        with self.assertRaisesMessage(ValidationError, "глубже 3 уровней"):
+            moved.clean()
+        moved.supplier = root
+        moved.clean()
+
+    def test_refuses_move_under_own_subtree(self):
+        root = make_supplier("Дистрибьютор", type_supplier=SupplierChoices.DISTRIBUTOR)
+        grandchild = make_supplier("Магазин", parent=make_supplier("Сеть", parent=root))
+
+        root.supplier = grandchild
+        with self.assertRaisesMessage(ValidationError, "своим потомком"):
+            root.save()
+
+
+class SupplierUpdateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("employee", "employee@example.com")
+        cls.root = make_supplier(
+            "Дистрибьютор", type_supplier=SupplierChoices.DISTRIBUTOR
+        )
+        cls.child = make_supplier("Сеть", parent=cls.root)
+        cls.grandchild = make_supplier("Магазин", parent=cls.child)
+        with cls.captureOnCommitCallbacks(execute=True):
+            for supplier in (cls.root, cls.child, cls.grandchild):
+                supplier.employees.add(cls.user)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def patch(self, supplier, data):
+        url = reverse("node-detail", args=[supplier.pk]) + "?country=Россия"
+        return self.client.patch(url, data, format="json")
+
+    def test_rejects_cycle(self):
+        response = self.patch(self.root, {"supplier": self.grandchild.pk})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.data["supplier"], ["Поставщик не может быть своим потомком!"]
+        )
+        self.root.refresh_from_db()
+        self.assertEqual(self.root.path, f"{self.root.pk}/")
+
+    @override_settings(RETAIL_SUPPLIER_MAX_LEVEL=2)
+    def test_rejects_too_deep(self):
+        other = make_supplier("Сеть 2", parent=self.root)
+        with self.captureOnCommitCallbacks(execute=True):
+            other.employees.add(self.user)
+        response = self.patch(self.child, {"supplier": other.pk})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("глубже 2 уровней", response.data["supplier"][0])
+
+    def test_moves(self):
+        response = self.patch(self.grandchild, {"supplier": self.root.pk})
+        self.assertEqual(response.status_code, 200)
+        self.grandchild.refresh_from_db()
+        self.assertEqual(self.grandchild.path, f"{self.root.pk}/{self.grandchild.pk}/")
+
+    def test_rejects_invisible_parent(self):
+        other = make_supplier("Чужой дистрибьютор")
+        response = self.patch(
+            self.child, {"supplier": other.pk, "contact": {"city": "Казань"}}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["supplier"], ["Поставщик не найден."])
+        self.child.refresh_from_db()
+        self.assertEqual(self.child.supplier_id, self.root.pk)
+        self.assertEqual(self.child.contact.city, "Москва")
+
+
+class SupplierNetworkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("employee", "employee@example.com")
+        cls.root = make_supplier("Завод", debt=Decimal(100))
+        cls.child = make_supplier("Дистрибьютор", parent=cls.root, debt=Decimal(50))
+        cls.hidden = make_supplier("Сеть", parent=cls.child, debt=Decimal(20))
+        cls.leaf = make_supplier("Магазин", parent=cls.hidden, debt=Decimal(5))
+        with cls.captureOnCommitCallbacks(execute=True):
+            for supplier in (cls.child, cls.leaf):
+                supplier.employees.add(cls.user)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, name, supplier, **params):
+        return self.client.get(reverse(f"network-{name}", args=[supplier.pk]), params)
+
+    def test_subtree_returns_suppliers_of_user_only(self):
+        response = self.get("subtree", self.child)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [item["id"] for item in response.data["items"]],
+            [self.child.pk, self.leaf.pk],
+        )
+        self.assertEqual(response.data["count"], 2)
+        self.assertEqual(response.data["total_debt"], "55.00")
+
+    def test_ancestors_skip_foreign_suppliers(self):
+        response = self.get("ancestors", self.leaf)
+
+        self.assertEqual(
+            [item["id"] for item in response.data], [self.leaf.pk, self.child.pk]
+        )
+
+    def test_stream(self):
+        response = self.get("subtree", self.child, stream="true")
+
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(
+            [json.loads(line)["title"] for line in lines], ["Дистрибьютор", "Магазин"]
+        )
+
+    def test_foreign_root_is_not_found(self):
+        self.assertEqual(self.get("subtree", self.root).status_code, 404)
+
+    @override_settings(ALLOWED_HOSTS=["testserver"])
+    def test_schema_builds_without_warnings(self):
+        with self.assertNoLogs("drf_yasg", "WARNING"):
+            response = self.client.get("/swagger/?format=openapi")
+        self.assertEqual(response.status_code, 200)
+
+
+class FastSerializerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            "employee", "employee@example.com", first_name="Иван"
+        )
+        cls.root = make_supplier("Завод", debt=Decimal("1234.50"))
+        cls.child = make_supplier("Дистрибьютор", parent=cls.root)
+        cls.root.products.add(
+            Product.objects.create(name="Телефон", model="X1"),
+            Product.objects.create(
+                name="Планшет",
+                model="T2",
+                date_product_release=timezone.now() - timedelta(days=400),
+            ),
+        )
+        with cls.captureOnCommitCallbacks(execute=True):
+            for supplier in (cls.root, cls.child):
+                supplier.employees.add(cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def suppliers(self):
+        return Supplier.objects.select_related("contact").prefetch_related(
+            "employees", "products"
+        )
+
+    def assertSameOutput(self, fast, regular):
+        self.assertEqual(json.loads(JSONRenderer().render(fast)), regular)
+        self.assertEqual(list(fast), list(regular))
+
+    def test_matches_supplier_serializer(self):
+        suppliers = self.suppliers()
+        for timezone_name in ("UTC", "Europe/Moscow"):
+            with self.subTest(timezone=timezone_name), timezone.override(timezone_name):
+                fast = FastSupplierSerializer(suppliers, many=True).data
+                regular = SupplierSerializer(suppliers, many=True).data
+                self.assertSameOutput(fast, json.loads(JSONRenderer().render(regular)))
+                self.assertIsNone(fast[-1]["supplier"])
+                self.assertEqual(len(fast[-1]["products"]), 2)
+
+    def test_matches_product_serializer(self):
+        products = Product.objects.all()
+        with timezone.override("Europe/Moscow"):
+            fast = FastProductSerializer(products, many=True).data
+            regular = ProductSerializer(products, many=True).data
+        self.assertSameOutput(fast, json.loads(JSONRenderer().render(regular)))
+
+    def test_list_and_retrieve_match_regular_output(self):
+        url = reverse("node-list")
+        listed = self.client.get(url, {"country": "Россия"}).json()["results"]
+        retrieved = self.client.get(
+            reverse("node-detail", args=[self.root.pk]), {"country": "Россия"}
+        ).json()
+
+        regular = json.loads(
+            JSONRenderer().render(SupplierSerializer(self.suppliers(), many=True).data)
+        )
+        self.assertEqual(listed, regular)
+        self.assertEqual(retrieved, regular[-1])
+
+
+class SupplierExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("employee", "employee@example.com")
+        cls.own = [make_supplier(f"Свой {number}") for number in range(3)]
+        cls.own[0].products.add(Product.objects.create(name="Телефон", model="X1"))
+        cls.foreign = make_supplier("Чужой")
+        cls.abroad = make_supplier("Зарубежный")
+        Contact.objects.filter(pk=cls.abroad.contact_id).update(country="Беларусь")
+        with cls.captureOnCommitCallbacks(execute=True):
+            for supplier in (*cls.own, cls.abroad):
+                supplier.employees.add(cls.user)
+        cls.url = reverse("node-export")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def export(self, **params) -> tuple:
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b"".join(response.streaming_content).decode()
+
+    def expected(self, suppliers) -> list:
+        suppliers = Supplier.objects.filter(
+            pk__in=[supplier.pk for supplier in suppliers]
+        ).order_by("id")
+        data = SupplierSerializer(suppliers, many=True).data
+        return json.loads(JSONRenderer().render(data))
+
+    @override_settings(RETAIL_EXPORT_CHUNK_SIZE=2)
+    def test_streams_visible_suppliers_as_ndjson(self):
+        response, content = self.export()
+
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertIn('filename="suppliers.ndjson"', response["Content-Disposition"])
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(rows, self.expected([*self.own, self.abroad]))
+
+    def test_filters_by_country(self):
+        _, content = self.export(country="Беларусь")
+
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([row["title"] for row in rows], [self.abroad.title])
+
+    def test_flattens_contact_in_csv(self):
+        response, content = self.export(export_format="csv", country="Россия")
+
+        self.assertEqual(response["Content-Type"], "text/csv")
+        header, *rows = csv.reader(content.splitlines())
+        self.assertIn("contact_city", header)
+        self.assertNotIn("contact", header)
+        rows = [dict(zip(header, row)) for row in rows]
+        expected = self.expected(self.own)
+        self.assertEqual(
+            [row["title"] for row in rows], [data["title"] for data in expected]
+        )
+        self.assertEqual(rows[0]["contact_city"], expected[0]["contact"]["city"])
+        self.assertEqual(json.loads(rows[0]["products"]), expected[0]["products"])
+
+    def test_rejects_unknown_format(self):
+        response = self.client.get(self.url, {"export_format": "xml"})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("export_format", response.json())
+
+
+class DataVersionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("employee", "employee@example.com")
+        self.supplier = make_supplier()
+
+    def version(self) -> int:
+        return get_data_versions([SUPPLIERS])[SUPPLIERS]
+
+    def test_bumped_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.supplier.title = "Новый завод"
+            self.supplier.save()
+        self.assertEqual(self.version(), 0)
+        for callback in callbacks:
+            callback()
+        self.assertGreater(self.version(), 0)
+
+    def test_login_keeps_version(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.supplier.employees.add(self.user)
+        version = self.version()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.last_login = timezone.now()
+            self.user.save(update_fields=["last_login"])
+        self.assertEqual(self.version(), version)
+
+    def test_employee_change_bumps_version(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.first_name = "Иван"
+            self.user.save()
+        self.assertEqual(self.version(), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.supplier.employees.add(self.user)
+        version = self.version()
+        self.assertGreater(version, 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.first_name = "Пётр"
+            self.user.save()
+        self.assertGreater(self.version(), version)
+
+
+class SupplierQRDigestTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.supplier = make_supplier("Завод")
+
+    def test_expires(self):
+        with mock.patch.object(cache, "set", wraps=cache.set) as cache_set:
+            remember_supplier_qr_digest(self.supplier.pk, "digest")
+        self.assertEqual(cache_set.call_args.args[2], settings.RETAIL_QR_CACHE_TIMEOUT)
+
+    def test_forgotten_after_commit(self):
+        remember_supplier_qr_digest(self.supplier.pk, "digest")
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.supplier.title = "Новый завод"
+            self.supplier.save()
+            self.assertEqual(get_supplier_qr_digest(self.supplier.pk), "digest")
+        for callback in callbacks:
+            callback()
+        self.assertIsNone(get_supplier_qr_digest(self.supplier.pk))
+
+    def test_contact_change_forgotten_after_commit(self):
+        remember_supplier_qr_digest(self.supplier.pk, "digest")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.supplier.contact.city = "Казань"
+            self.supplier.contact.save()
+        self.assertIsNone(get_supplier_qr_digest(self.supplier.pk))
+
+
+@override_settings(RETAIL_QR_POOL_THRESHOLD=2)
+@mock.patch("core.apps.retail.qr.get_qr_store", CacheQRStore)
+class QRRenderTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    @mock.patch("core.apps.retail.qr.ProcessPoolExecutor")
+    @mock.patch("core.apps.retail.qr.current_process")
+    def test_daemonic_worker_renders_serially(self, process, executor):
+        process.return_value.daemon = True
+
+        with self.assertLogs("core.apps.retail.qr", "WARNING") as logs:
+            images = render_many(["Первый", "Второй"])
+
+        executor.assert_not_called()
+        self.assertIn("2 QR-кодов", logs.output[0])
+        self.assertEqual(set(images), {"Первый", "Второй"})
+        self.assertTrue(images["Первый"].startswith(b"\x89PNG"))
+
+    @mock.patch("core.apps.retail.qr.ProcessPoolExecutor")
+    def test_stored_images_are_not_rendered(self, executor):
+        first = render_many(["Первый"])
+
+        self.assertEqual(render_many(["Первый"]), first)
+        executor.assert_not_called()
+
+
+class SupplierVisibilityTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("employee", "employee@example.com")
+        self.supplier = make_supplier("Завод")
+
+    def test_invalidated_after_commit(self):
+        version = visibility_version(self.user)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.supplier.employees.add(self.user)
+            self.assertEqual(visibility_version(self.user), version)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(visible_supplier_ids(self.user), {self.supplier.pk})
+
+    def test_clear_invalidated_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.supplier.employees.add(self.user)
+        self.assertEqual(visible_supplier_ids(self.user), {self.supplier.pk})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.supplier.employees.clear()
+        self.assertEqual(visible_supplier_ids(self.user), frozenset())
+
+    def test_large_sets_are_filtered_by_subquery(self):
+        suppliers = [self.supplier, make_supplier("Дистрибьютор"), make_supplier()]
+        make_supplier("Чужой")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.supplier_set.add(*suppliers)
+        expected = {supplier.pk for supplier in suppliers}
+
+        for limit, clause in ((10, " IN ("), (2, "EXISTS")):
+            with (
+                self.subTest(limit=limit),
+                self.settings(RETAIL_VISIBILITY_IN_LIMIT=limit),
+            ):
+                queryset = filter_visible(Supplier.objects.all(), self.user)
+                self.assertIn(clause, str(queryset.query))
+                self.assertEqual(set(queryset.values_list("pk", flat=True)), expected)
+
+
+class SupplierBulkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("employee", "employee@example.com")
+        cls.own = make_supplier("Свой")
+        cls.foreign = make_supplier("Чужой")
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.own.employees.add(cls.user)
+        cls.url = reverse("node-bulk")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def new_item(self, number, **kwargs):
+        return {
+            "title": f"Узел {number}",
+            "type_supplier": SupplierChoices.DISTRIBUTOR,
+            "contact": {
+                "email": f"bulk{number}@example.com",
+                "country": "Россия",
+                "city": "Москва",
+                "street": "Тверская",
+                "house_number": str(number),
+            },
+            **kwargs,
+        }
+
+    def test_rejects_invisible_parent(self):
+        response = self.client.post(
+            self.url,
+            {"items": [self.new_item(1, supplier=self.foreign.pk)]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.data["items"][0]["supplier"], ["Поставщик не найден."]
+        )
+        self.assertFalse(self.foreign.children.exists())
+
+    def test_long_chain_inside_batch(self):
+        items = [self.new_item(0, ref="0", supplier=self.own.pk)]
+        items += [
+            self.new_item(number, ref=str(number), supplier_ref=str(number - 1))
+            for number in range(1, 150)
+        ]
+        items.reverse()  # children refer forward to their parents
+        response = self.client.post(self.url, {"items": items}, format="json")
+        self.assertEqual(response.status_code, 201)
+
+        last = Supplier.objects.get(pk=response.data["items"][0]["id"])
+        self.assertEqual(last.level, 150)
+        self.assertTrue(last.path.startswith(self.own.path))
+
+    @override_settings(RETAIL_SUPPLIER_MAX_LEVEL=3)
+    def test_limits_depth_of_new_chains(self):
+        items = [self.new_item(0, ref="0", supplier=self.own.pk)]
+        items += [
+            self.new_item(number, ref=str(number), supplier_ref=str(number - 1))
+            for number in range(1, 4)
+        ]
+        response = self.client.post(self.url, {"items": items}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.data["items"]), [3])
+
+    def test_rolls_back_whole_batch(self):
+        suppliers = Supplier.objects.count()
+        items = [self.new_item(1, ref="a"), self.new_item(2, supplier_ref="a")]
+        items[0]["type_supplier"] = SupplierChoices.FACTORY
+        with mock.patch(
+            "core.apps.retail.bulk.SupplierEvent.objects.bulk_create",
+            side_effect=DatabaseError,
+        ):
+            with self.assertRaises(DatabaseError):
+                self.client.post(self.url, {"items": items}, format="json")
+        self.assertEqual(Supplier.objects.count(), suppliers)
+        self.assertFalse(Contact.objects.filter(email="bulk1@example.com").exists())
+
+
+class DebtStatisticsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for debt in (0, 10, 20, 30, 40):
+            make_supplier(f"Должник {debt}", debt=Decimal(debt))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_interpolates_percentiles(self):
+        self.assertEqual(
+            get_debt_statistics()["percentiles"],
+            {"p50": Decimal("20.00"), "p90": Decimal("36.00"), "p99": Decimal("39.60")},
+        )
+
+    def test_counters_follow_committed_changes(self):
+        get_debt_statistics()
+        with self.captureOnCommitCallbacks(execute=True):
+            supplier = make_supplier("Новый должник", debt=Decimal(1000))
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_debt(DebtTransactionChoices.INCREASE, {supplier.pk: Decimal("5")})
+        supplier = Supplier.objects.get(pk=supplier.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            supplier.type_supplier = SupplierChoices.DISTRIBUTOR
+            supplier.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            Supplier.objects.get(title="Должник 10").delete()
+
+        with self.assertNumQueries(0):
+            statistics = get_debt_statistics()
+        self.assertEqual(statistics["count"], 5)
+        self.assertEqual(statistics["total"], Decimal("1095.00"))
+        self.assertEqual(
+            statistics["by_type"],
+            [
+                {
+                    "type_supplier": SupplierChoices.FACTORY,
+                    "count": 4,
+                    "total": Decimal("90.00"),
+                    "average": Decimal("22.50"),
+                },
+                {
+                    "type_supplier": SupplierChoices.DISTRIBUTOR,
+                    "count": 1,
+                    "total": Decimal("1005.00"),
+                    "average": Decimal("1005.00"),
+                },
+            ],
+        )
+        self.assertEqual(refresh_debt_statistics()["by_type"], statistics["by_type"])
+
+    def test_uncommitted_changes_are_not_counted(self):
+        get_debt_statistics()
+        supplier = Supplier.objects.get(title="Должник 10")
+        with self.captureOnCommitCallbacks() as callbacks:
+            apply_debt(DebtTransactionChoices.CLEAR, {supplier.pk: Decimal(0)})
+        self.assertEqual(get_debt_statistics()["total"], Decimal("100.00"))
+        for callback in callbacks:
+            callback()
+        self.assertEqual(get_debt_statistics()["total"], Decimal("90.00"))
+
+    @override_settings(RETAIL_STATISTICS_TIMEOUT=0)
+    def test_serves_stale_percentiles_while_refreshing(self):
+        stale = get_debt_statistics()
+        make_supplier("Новый должник", debt=Decimal(1000))
+
+        cache.add(STATISTICS_LOCK_KEY, True)  # another process is refreshing
+        with self.assertNumQueries(0):
+            self.assertEqual(get_debt_statistics()["percentiles"], stale["percentiles"])
+
+        cache.delete(STATISTICS_LOCK_KEY)
+        self.assertEqual(get_debt_statistics()["percentiles"]["p50"], Decimal("25.00"))
+
+
+@override_settings(RETAIL_QUERY_BUDGET_RAISE=True)
+class RequestMetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("employee", "employee@example.com")
+        cls.supplier = make_supplier("Завод")
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.supplier.employees.add(cls.user)
+        cls.url = reverse("node-detail", args=[cls.supplier.pk]) + "?country=Россия"
+
+    def setUp(self):
+        cache.clear()
+        reset_metrics()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def patch(self):
+        return self.client.patch(self.url, {"title": "Новый завод"}, format="json")
+
+    def test_read_budgets_skip_writes(self):
+        with self.settings(RETAIL_QUERY_BUDGETS={"node-detail": 1}):
+            self.assertEqual(self.patch().status_code, 200)
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get(self.url)
+
+    def test_writes_have_own_budgets(self):
+        with self.settings(RETAIL_QUERY_BUDGETS={"node-detail:PATCH": 1}):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.patch()
+
+    def test_samples_are_keyed_by_method_of_writes(self):
+        self.client.get(self.url)
+        self.patch()
+
+        rows = {row["view"]: row for row in metrics_snapshot()}
+        self.assertEqual(set(rows), {"node-detail", "node-detail:PATCH"})
+        self.assertEqual(rows["node-detail"]["budget"], 10)
+        self.assertIsNone(rows["node-detail:PATCH"]["budget"])
+
+    def test_nearest_rank_percentiles(self):
+        self.assertEqual(
+            percentiles(list(range(10, 0, -1))),
+            {"p50": 5, "p90": 9, "p99": 10, "max": 10},
+        )
+        self.assertEqual(percentiles([7])["p50"], 7)
+
+
+class QueryTimerTests(TestCase):
+    def test_classifies_writes(self):
+        ledger = (
+            "WITH v(id, amount) AS (VALUES (1, 2)), new AS ("
+            'UPDATE "retail_supplier" AS s SET debt = s.debt + v.amount FROM v, '
+            '(SELECT s.id FROM "retail_supplier" AS s ORDER BY s.id '
+            "FOR UPDATE OF s) AS old WHERE s.id = v.id RETURNING s.id) "
+            'INSERT INTO "retail_debttransaction" SELECT id FROM new'
+        )
+        for sql, write in (
+            ('SELECT "id" FROM "retail_supplier"', False),
+            ("WITH RECURSIVE tree(id) AS (SELECT 1) SELECT id FROM tree", False),
+            ("WITH t AS (SELECT id FROM s FOR UPDATE OF s) SELECT * FROM t", False),
+            ('SAVEPOINT "s1_x1"', False),
+            ('RELEASE SAVEPOINT "s1_x1"', False),
+            ('INSERT INTO "retail_contact" ("email") VALUES (%s)', True),
+            ('  update "retail_supplier" SET "title" = %s', True),
+            ('DELETE FROM "retail_supplier"', True),
+            (ledger, True),
+        ):
+            with self.subTest(sql=sql):
+                self.assertIs(is_write(sql), write)
+
+    def test_counts_rows_of_writes_only(self):
+        root = make_supplier("Завод")
+        for number in range(3):
+            make_supplier(f"Дистрибьютор {number}", parent=root)
+
+        timer = QueryTimer()
+        with connection.execute_wrapper(timer), transaction.atomic():
+            subtree_totals(root.pk)
+            Supplier.objects.filter(pk=root.pk).update(title="Новый завод")
+        self.assertEqual(timer.rows, 1)
+
+
+class BenchmarkCommandTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("employee", "employee@example.com")
+        root = make_supplier("Завод", debt=Decimal(100))
+        make_supplier("Дистрибьютор", parent=root, debt=Decimal(50))
+        product = Product.objects.create(name="Телефон", model="X1")
+        root.products.add(product)
+        with cls.captureOnCommitCallbacks(execute=True):
+            root.employees.add(cls.user)
+
+    def benchmark(self, *cases, **options):
+        options = {"repeat": 1, "warmup": 0, "no_memory": True, "yes": True, **options}
+        stdout = StringIO()
+        with override_settings(ALLOWED_HOSTS=["retail.example.com"]):
+            call_command(
+                "benchmark",
+                *[f"--only={case}" for case in cases],
+                stdout=stdout,
+                **options,
+            )
+        return stdout.getvalue()
+
+    def test_endpoints_answer(self):
+        output = self.benchmark("node-list", "admin:retail_supplier_changelist")
+        self.assertIn("node-list: 200", output)
+        self.assertIn("admin:retail_supplier_changelist: 200", output)
+        self.assertFalse(User.objects.filter(username="benchmark-admin").exists())
+
+    def test_fails_on_error_status(self):
+        with mock.patch(
+            "core.apps.retail.views.SupplierViewSet.list", side_effect=PermissionDenied
+        ):
+            with self.assertRaisesMessage(CommandError, "1 failure(s)"):
+                self.benchmark("node-list")
+
+    def test_runs_tasks_and_rolls_back(self):
+        debts = list(Supplier.objects.values_list("debt", flat=True))
+        with mock.patch(
+            "core.apps.retail.tasks.finish_debt_job.run", wraps=finish_debt_job.run
+        ) as finish:
+            output = self.benchmark("job:increase_debt", "job:compact_debt_ledger")
+        self.assertIn("job:increase_debt: SUCCESS", output)
+        self.assertIn("job:compact_debt_ledger: SUCCESS", output)
+        finish.assert_called_once()
+        self.assertEqual(list(Supplier.objects.values_list("debt", flat=True)), debts)
+        self.assertFalse(DebtJob.objects.exists())
+
+
+class ExplainViewsCommandTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("employee", "employee@example.com")
+        root = make_supplier("Завод", debt=Decimal(100))
+        make_supplier("Дистрибьютор", parent=root, debt=Decimal(50))
+        root.products.add(Product.objects.create(name="Телефон", model="X1"))
+        with cls.captureOnCommitCallbacks(execute=True):
+            root.employees.add(cls.user)
+
+    def setUp(self):
+        directory = TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / "report.json"
+
+    def explain_views(self, *args) -> str:
+        stdout = StringIO()
+        call_command("explain_views", *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_saved_report_is_its_own_baseline(self):
+        output = self.explain_views("--save", str(self.path))
+
+        report = json.loads(self.path.read_text())
+        self.assertEqual(
+            set(report), {"suppliers", "statistics", "suppliers-by-product", "products"}
+        )
+        for name, result in report.items():
+            self.assertIn(f"{name}: {result['time_ms']} ms", output)
+        output = self.explain_views("--baseline", str(self.path), "--threshold", "1000")
+        self.assertIn("No regressions", output)
+
+    @mock.patch(
+        "core.apps.retail.management.commands.explain_views.Command.explain",
+        return_value={"time_ms": 1.0, "seq_scans": ["retail_supplier"], "plan": ""},
+    )
+    def test_fails_on_slowdown_and_new_sequential_scans(self, explain):
+        self.path.write_text(
+            json.dumps({"products": {"time_ms": 0.5, "seq_scans": []}})
+        )
+        stdout = StringIO()
+
+        with self.assertRaisesMessage(CommandError, "2 regression(s) found"):
+            call_command("explain_views", "--baseline", str(self.path), stdout=stdout)
+        self.assertIn("REGRESSION products: 0.5 ms -> 1.0 ms", stdout.getvalue())
+        self.assertIn(
+            "REGRESSION products: new sequential scans: retail_supplier",
+            stdout.getvalue(),
+        )
+
+    def test_requires_supplier_employees(self):
+        with self.assertRaisesMessage(CommandError, "run fill_bd first"):
+            self.explain_views("--user", "nobody")
+
+    def test_finds_sequential_scans_of_both_backends(self):
+        plan = "\n".join(
+            [
+                "Seq Scan on retail_contact c  (cost=0.00..1.01 rows=1 width=8)",
+                "SCAN retail_product",
+                "SEARCH retail_supplier USING INDEX supplier_debt_idx (debt>?)",
+                "SCAN retail_supplier USING INDEX supplier_order_idx",
+            ]
+        )
+
+        tables = {table for groups in SEQ_SCAN.findall(plan) for table in groups}
+
+        self.assertEqual(tables - {""}, {"retail_contact", "retail_product"})
+
+
+class FillBdBulkTests(TestCase):
+    def fill_bd(self, *args) -> str:
+        stdout = StringIO()
+        call_command("fill_bd", "--bulk", "--workers", "1", *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_builds_hierarchy_by_levels(self):
+        output = self.fill_bd(
+            "--suppliers=12",
+            "--users=3",
+            "--products=4",
+            "--batch-size=5",
+            "--depth-weights=1,2,3",
+        )
+
+        self.assertIn(
+            "Successfully created 12 suppliers, 3 users and 4 products", output
+        )
+        self.assertEqual(
+            list(
+                Supplier.objects.values_list("level")
+                .annotate(total=Count("id"))
+                .order_by("level")
+            ),
+            [(0, 2), (1, 4), (2, 6)],
+        )
+        suppliers = Supplier.objects.select_related("supplier")
+        for supplier in suppliers:
+            with self.subTest(supplier=supplier.pk):
+                if supplier.level == 0:
+                    self.assertEqual(supplier.type_supplier, SupplierChoices.FACTORY)
+                    self.assertEqual(supplier.path, f"{supplier.pk}/")
+                else:
+                    self.assertEqual(supplier.supplier.level, supplier.level - 1)
+                    self.assertEqual(
+                        supplier.path, f"{supplier.supplier.path}{supplier.pk}/"
+                    )
+                self.assertTrue(supplier.employees.exists())
+                self.assertTrue(supplier.products.exists())
+        self.assertEqual(
+            DebtTransaction.objects.aggregate(total=Sum("amount"))["total"],
+            Supplier.objects.aggregate(total=Sum("debt"))["total"],
+        )
+        self.assertEqual(get_debt_statistics()["count"], 12)
+
+    def test_rejects_empty_sizes(self):
+        for option in ("--suppliers", "--batch-size", "--workers"):
+            with (
+                self.subTest(option=option),
+                self.assertRaisesMessage(CommandError, f"{option} must be at least 1"),
+            ):
+                self.fill_bd(f"{option}=0")
+        with self.assertRaisesMessage(CommandError, "all zero"):
+            self.fill_bd("--depth-weights=0,0")
+        self.assertFalse(User.objects.exists())
+
+    def test_resets_sequences(self):
+        self.fill_bd("--suppliers=3", "--users=1", "--products=1")
+
+        supplier = make_supplier("После заполнения")
+
+        self.assertGreater(
+            supplier.pk,
+            Supplier.objects.exclude(pk=supplier.pk).aggregate(Max("id"))["id__max"],
+        )
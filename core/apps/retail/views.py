@@ -1,4 +1,17 @@
-from django.db.models import Avg
+import json
+
+from django.http import (
+    Http404,
+    HttpResponse,
+    StreamingHttpResponse,
+)
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.utils.http import (
+    http_date,
+    parse_etags,
+    parse_http_date_safe,
+)
 from rest_framework import (
     generics,
     permissions,
@@ -6,21 +19,198 @@ from rest_framework import (
     views,
     viewsets,
 )
+from rest_framework.decorators import action
 from rest_framework.response import Response
 
+from .caching import (
+    get_cached_response,
+    get_changed_at,
+    get_data_versions,
+    PRODUCTS,
+    response_digest,
+    set_cached_response,
+    SUPPLIERS,
+)
+from .exports import export_suppliers
+from .jobs import shard_timings
+from .ledger import debt_balance_at
+from .metrics import (
+    metrics_snapshot,
+    reset_metrics,
+)
 from .models import (
+    DebtJob,
+    DebtTransaction,
     Product,
     Supplier,
+    SupplierEvent,
+)
+from .network import (
+    iter_ancestors,
+    iter_subtree,
+    subtree_totals,
+)
+from .pagination import (
+    ProductCursorPagination,
+    SupplierCursorPagination,
+)
+from .qr import (
+    contact_payload,
+    get_qr_store,
+    get_supplier_qr_digest,
+    qr_digest,
+    remember_supplier_qr_digest,
+    render_many,
 )
 from .serializers import (
+    DebtBalanceQuerySerializer,
+    DebtBalanceSerializer,
+    DebtJobSerializer,
+    DebtStatisticsSerializer,
+    DebtTransactionSerializer,
+    EndpointMetricsSerializer,
+    FastProductSerializer,
+    FastSupplierSerializer,
+    NetworkQuerySerializer,
     ProductSerializer,
+    SupplierBulkResultSerializer,
+    SupplierBulkSerializer,
+    SupplierEventSerializer,
+    SupplierExportSerializer,
+    SupplierHistoryQuerySerializer,
+    SupplierNodeSerializer,
+    SupplierQRBulkRequestSerializer,
+    SupplierQRImageSerializer,
     SupplierQRRequestSerializer,
     SupplierSerializer,
+    SupplierSubtreeSerializer,
+    TaskMetricsSerializer,
+)
+from .statistics import get_debt_statistics
+from .tasks import (
+    send_qr_code_email,
+    send_qr_code_emails,
+)
+from .telemetry import (
+    reset_task_metrics,
+    task_metrics,
+)
+from .visibility import (
+    filter_visible,
+    visibility_version,
+    visible_supplier_ids,
 )
-from .tasks import send_qr_code_email
 
 
-class SupplierViewSet(viewsets.ModelViewSet):
+class FastReadMixin:
+    """
+    Uses `read_serializer_class` for GET requests.
+    Writes and schema generation keep the regular `serializer_class`.
+    """
+
+    read_serializer_class = None
+
+    def get_serializer_class(self):
+        if (
+            self.read_serializer_class is not None
+            and self.request.method == "GET"
+            and not getattr(self, "swagger_fake_view", False)
+        ):
+            return self.read_serializer_class
+        return super().get_serializer_class()
+
+
+class CachedReadMixin:
+    """
+    Conditional GET and server-side cache of `list` and `retrieve`.
+
+    ETag is a hash of the request (action, kwargs, query params, user)
+    and data versions of `cache_resources`, plus the visibility version
+    of the user when `cache_visibility` is set. A matching `If-None-Match`
+    gets 304 from cache lookups only, without queries or serialization.
+    Response data is cached under the same hash.
+
+    Last-Modified is the latest `updated` of served objects
+    or the last change of `cache_resources`.
+    """
+
+    cache_resources = ()
+    cache_visibility = False
+
+    def get_serializer(self, *args, **kwargs):
+        self.served = args[0] if args else None
+        return super().get_serializer(*args, **kwargs)
+
+    def get_cache_digest(self, request) -> str:
+        versions = get_data_versions(self.cache_resources)
+        if self.cache_visibility:
+            versions["visibility"] = visibility_version(request.user)
+        return response_digest(
+            view=type(self).__name__,
+            host=request.get_host(),
+            action=getattr(self, "action", None),
+            kwargs=self.kwargs,
+            params=sorted(request.query_params.lists()),
+            user=request.user.pk,
+            versions=versions,
+        )
+
+    def get_last_modified(self):
+        served = self.served
+        if served is not None and not isinstance(served, (list, tuple)):
+            served = [served]
+        times = [
+            instance.updated
+            for instance in served or ()
+            if getattr(instance, "updated", None) is not None
+        ]
+        changed_at = get_changed_at(self.cache_resources)
+        if changed_at is not None:
+            times.append(changed_at)
+        return max(times, default=None)
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        etag = f'"{self.get_cache_digest(request)}"'
+        if_none_match = request.headers.get("If-None-Match")
+        entry = None
+        if if_none_match and etag in parse_etags(if_none_match):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            digest = etag.strip('"')
+            entry = get_cached_response(digest)
+            if entry is None:
+                response = handler(request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                entry = set_cached_response(
+                    digest, response.data, self.get_last_modified()
+                )
+            since = parse_http_date_safe(request.headers.get("If-Modified-Since", ""))
+            if (
+                not if_none_match
+                and since is not None
+                and entry["last_modified"] is not None
+                and int(entry["last_modified"].timestamp()) <= since
+            ):
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+            else:
+                response = Response(entry["data"])
+
+        response["ETag"] = etag
+        if entry is not None and entry["last_modified"] is not None:
+            response["Last-Modified"] = http_date(entry["last_modified"].timestamp())
+        response["Cache-Control"] = "private, no-cache"
+        patch_vary_headers(response, ["Authorization"])
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+
+class SupplierViewSet(CachedReadMixin, FastReadMixin, viewsets.ModelViewSet):
     """
     API endpoint managing suppliers with country-based filtering.
     Implements CRUD for suppliers, only authenticated users.
@@ -29,43 +219,95 @@ class SupplierViewSet(viewsets.ModelViewSet):
     - Uses select_related for contact to optimize queries
     - Uses prefetch_related for employees and retail
     - Returns empty queryset if no country parameter provided
+    - `export` streams suppliers of the user as NDJSON or CSV
+    - `bulk` creates and updates many suppliers in one transaction
+    - list and retrieve support ETag / Last-Modified and are cached
     """
 
     serializer_class = SupplierSerializer
+    read_serializer_class = FastSupplierSerializer
+    pagination_class = SupplierCursorPagination
     permission_classes = [permissions.IsAuthenticated]
+    cache_resources = (SUPPLIERS,)
+    cache_visibility = True
 
     def get_queryset(self):
         country = self.request.query_params.get("country")
         if not country:
             return Supplier.objects.none()
-        return (
+        return filter_visible(
             Supplier.objects.select_related("contact")
             .prefetch_related("employees", "products")
-            .filter(contact__country__iexact=country, employees=self.request.user)
+            .filter(contact__country__iexact=country),
+            self.request.user,
         )
 
+    @action(detail=False, methods=["get"])
+    def export(self, request):
+        serializer = SupplierExportSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
 
-class DebtAboveAverageListView(generics.ListAPIView):
+        queryset = filter_visible(Supplier.objects.order_by("id"), request.user)
+        if "country" in params:
+            queryset = queryset.filter(contact__country__iexact=params["country"])
+        return export_suppliers(queryset, params["export_format"])
+
+    @action(detail=False, methods=["post"])
+    def bulk(self, request):
+        serializer = SupplierBulkSerializer(
+            data=request.data, context=self.get_serializer_context()
+        )
+        serializer.is_valid(raise_exception=True)
+        suppliers = serializer.save()
+        results = [
+            {"id": supplier.pk, "path": supplier.path, "created": "id" not in item}
+            for item, supplier in zip(serializer.validated_data["items"], suppliers)
+        ]
+        return Response(
+            {"items": SupplierBulkResultSerializer(results, many=True).data},
+            status=status.HTTP_201_CREATED,
+        )
+
+
+class DebtAboveAverageListView(CachedReadMixin, FastReadMixin, generics.ListAPIView):
     """
     API endpoint returns suppliers with debt above average.
     Only authenticated users, available read-only of suppliers.
     Includes query optimization with select_related and prefetch_related.
+
+    Average debt is taken from the cached statistics snapshot,
+    which is also returned in the `statistics` key.
     """
 
     serializer_class = SupplierSerializer
+    read_serializer_class = FastSupplierSerializer
+    pagination_class = SupplierCursorPagination
     permission_classes = [permissions.IsAuthenticated]
+    cache_resources = (SUPPLIERS,)
+    cache_visibility = True
 
     def get_queryset(self):
-        avg_debt = Supplier.objects.aggregate(avg_debt=Avg("debt"))["avg_debt"]
-        print(f"Current user: {self.request.user}")
-        return (
+        self.statistics = get_debt_statistics()
+        return filter_visible(
             Supplier.objects.select_related("contact")
             .prefetch_related("employees", "products")
-            .filter(debt__gt=avg_debt, employees__in=[self.request.user])
+            .filter(debt__gt=self.statistics["average"]),
+            self.request.user,
         )
 
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        response.data = {
+            "statistics": DebtStatisticsSerializer(self.statistics).data,
+            **response.data,
+        }
+        return response
+
 
-class SupplierByProductViewSet(viewsets.ReadOnlyModelViewSet):
+class SupplierByProductViewSet(
+    CachedReadMixin, FastReadMixin, viewsets.ReadOnlyModelViewSet
+):
     """
     API endpoint returns suppliers by product ID
     Only authenticated users, available read-only of suppliers.
@@ -77,8 +319,13 @@ class SupplierByProductViewSet(viewsets.ReadOnlyModelViewSet):
     """
 
     serializer_class = SupplierSerializer
+    read_serializer_class = FastSupplierSerializer
+    pagination_class = SupplierCursorPagination
     permission_classes = [permissions.IsAuthenticated]
 
+    cache_resources = (SUPPLIERS,)
+    cache_visibility = True
+
     def get_queryset(self):
         product_id = self.request.query_params.get("product_id")
 
@@ -90,24 +337,85 @@ class SupplierByProductViewSet(viewsets.ReadOnlyModelViewSet):
         except (TypeError, ValueError):
             return Supplier.objects.none()
 
-        return (
-            Supplier.objects.filter(
-                products__id=product_id, employees=self.request.user
-            )
+        return filter_visible(
+            Supplier.objects.filter(products__id=product_id)
             .select_related("contact")
-            .prefetch_related("employees", "products")
+            .prefetch_related("employees", "products"),
+            self.request.user,
+        )
+
+
+class SupplierNetworkViewSet(viewsets.GenericViewSet):
+    """
+    API endpoint traversing the supply network of a supplier.
+    Only authenticated users, root and returned suppliers must be
+    suppliers of the user.
+
+    Endpoints:
+    - `subtree` - supplier and all descendants with aggregated debt
+    - `ancestors` - chain of suppliers up to the factory
+
+    Query parameters:
+    - `max_depth` - limits recursion depth
+    - `stream` - streams rows as NDJSON from a server-side cursor
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = SupplierNodeSerializer
+
+    def get_queryset(self):
+        if getattr(self, "swagger_fake_view", False):
+            return Supplier.objects.none()
+        return filter_visible(Supplier.objects.only("id"), self.request.user)
+
+    def get_params(self) -> dict:
+        serializer = NetworkQuerySerializer(data=self.request.query_params)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
+
+    @staticmethod
+    def stream(rows) -> StreamingHttpResponse:
+        lines = (
+            json.dumps(SupplierNodeSerializer(row).data, ensure_ascii=False) + "\n"
+            for row in rows
         )
+        return StreamingHttpResponse(lines, content_type="application/x-ndjson")
+
+    @action(detail=True, methods=["get"])
+    def subtree(self, request, pk=None):
+        supplier = self.get_object()
+        params = self.get_params()
+        max_depth = params.get("max_depth")
+        rows = iter_subtree(supplier.pk, max_depth, request.user.pk)
+        if params["stream"]:
+            return self.stream(rows)
 
+        totals = subtree_totals(supplier.pk, max_depth, request.user.pk)
+        return Response(SupplierSubtreeSerializer({**totals, "items": rows}).data)
 
-class ProductViewSet(viewsets.ModelViewSet):
+    @action(detail=True, methods=["get"])
+    def ancestors(self, request, pk=None):
+        supplier = self.get_object()
+        params = self.get_params()
+        rows = iter_ancestors(supplier.pk, params.get("max_depth"), request.user.pk)
+        if params["stream"]:
+            return self.stream(rows)
+        return Response(SupplierNodeSerializer(rows, many=True).data)
+
+
+class ProductViewSet(CachedReadMixin, FastReadMixin, viewsets.ModelViewSet):
     """
     API endpoint returns retail.
     Implements CRUD for retail, only authenticated users.
+    List and retrieve support ETag / Last-Modified and are cached.
     """
 
     queryset = Product.objects.all()
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = ProductSerializer
+    read_serializer_class = FastProductSerializer
+    pagination_class = ProductCursorPagination
+    cache_resources = (PRODUCTS,)
 
 
 class SupplierQRCodeAPIView(views.APIView):
@@ -144,3 +452,230 @@ class SupplierQRCodeAPIView(views.APIView):
                     {"error": "Supplier not found"}, status=status.HTTP_404_NOT_FOUND
                 )
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class SupplierQRCodeBulkAPIView(views.APIView):
+    """
+    API endpoint generating and emailing QR codes for many suppliers.
+
+    Accepts POST requests with:
+    - `items`: list of `supplier_id` and `email` pairs
+
+    Processes the batch asynchronously via one Celery task.
+    Per-item outcomes are available in the task result.
+    Only authenticated users, for suppliers available to them.
+
+    Responses:
+    - `202 Accepted`: Task started, returns `task_id`
+    - `400 Bad Request`: Invalid input data, too many items
+      or suppliers not available for the user
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        serializer = SupplierQRBulkRequestSerializer(
+            data=request.data, context={"request": request}
+        )
+        serializer.is_valid(raise_exception=True)
+        items = [
+            (item["email"], item["supplier_id"])
+            for item in serializer.validated_data["items"]
+        ]
+        result = send_qr_code_emails.delay(items)
+        return Response(
+            {"status": "QR code generation started", "task_id": result.id},
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+
+class SupplierDebtBalanceAPIView(views.APIView):
+    """
+    API endpoint returning supplier debt balance at a moment.
+    The balance is read from the debt ledger: the latest monthly
+    snapshot and ledger entries after it.
+
+    Query parameters:
+    - `at` - moment of the balance, defaults to now
+
+    Responses:
+    - `200 OK`: `supplier_id`, `at`, `balance`
+    - `404 Not Found`: supplier is not available for the user
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, supplier_id: int):
+        if supplier_id not in visible_supplier_ids(request.user):
+            raise Http404
+        serializer = DebtBalanceQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        at = serializer.validated_data.get("at") or timezone.now()
+        balance = debt_balance_at(supplier_id, at)
+        return Response(
+            DebtBalanceSerializer(
+                {"supplier_id": supplier_id, "at": at, "balance": balance}
+            ).data
+        )
+
+
+class RequestMetricsAPIView(views.APIView):
+    """
+    API endpoint with rolling request metrics of this process, admins only.
+    Every endpoint by URL name: query count, DB time, serialization time
+    and total latency percentiles, query budget and requests over it.
+
+    Responses:
+    - `GET 200 OK`: list of endpoints, the slowest first
+    - `DELETE 204 No Content`: metrics are reset
+    """
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(EndpointMetricsSerializer(metrics_snapshot(), many=True).data)
+
+    def delete(self, request):
+        reset_metrics()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class TaskMetricsAPIView(views.APIView):
+    """
+    API endpoint with telemetry of retail Celery tasks, admins only.
+    Aggregated over all workers: runs, failures, wall time, SQL queries,
+    rows written, rows per second and queue lag with histograms.
+
+    Responses:
+    - `GET 200 OK`: list of tasks, the longest total time first
+    - `DELETE 204 No Content`: telemetry is reset
+    """
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(TaskMetricsSerializer(task_metrics(), many=True).data)
+
+    def delete(self, request):
+        reset_task_metrics()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class DebtJobRetrieveView(generics.RetrieveAPIView):
+    """
+    API endpoint polled for progress of a background debt job, admins only.
+    Returns `status`, `total`, `processed`, `changed`, `progress` in percent
+    and `shard_timings` with workers and elapsed seconds of every shard.
+    """
+
+    queryset = DebtJob.objects.all()
+    serializer_class = DebtJobSerializer
+    permission_classes = [permissions.IsAdminUser]
+
+    def get_object(self):
+        job = super().get_object()
+        job.shard_timings = shard_timings(job)
+        return job
+
+
+class SupplierHistoryAPIView(views.APIView):
+    """
+    API endpoint returning debt ledger entries and change events
+    of a supplier for a bounded period, newest first.
+    History tables are partitioned by month on PostgreSQL, the period
+    bounds prune the scan to the partitions of the period.
+
+    Events are kept after the supplier is deleted, staff users
+    read the history of any supplier, deleted ones too.
+
+    Query parameters:
+    - `since`, `until` - bounds of the period, by default the last 30 days
+
+    Responses:
+    - `200 OK`: `supplier_id`, `since`, `until`, `debt`, `events`
+    - `404 Not Found`: supplier is not available for the user
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, supplier_id: int):
+        if not request.user.is_staff and supplier_id not in visible_supplier_ids(
+            request.user
+        ):
+            raise Http404
+        serializer = SupplierHistoryQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        period = serializer.validated_data
+        bounds = {"created__gt": period["since"], "created__lte": period["until"]}
+
+        debt = DebtTransaction.objects.filter(supplier_id=supplier_id, **bounds)
+        events = SupplierEvent.objects.filter(supplier_id=supplier_id, **bounds)
+        return Response(
+            {
+                "supplier_id": supplier_id,
+                "since": serializer.data["since"],
+                "until": serializer.data["until"],
+                "debt": DebtTransactionSerializer(
+                    debt.order_by("-created"), many=True
+                ).data,
+                "events": SupplierEventSerializer(
+                    events.order_by("-created"), many=True
+                ).data,
+            }
+        )
+
+
+class SupplierQRImageAPIView(views.APIView):
+    """
+    API endpoint serving supplier contact QR code as PNG.
+
+    Images are content-addressed by payload and render parameters,
+    the digest is used as ETag. A request with matching `If-None-Match`
+    gets `304 Not Modified` without touching the image store.
+    The image is rendered only when contact or supplier title changed.
+
+    Query parameters:
+    - `box_size`, `border` - render parameters
+
+    Responses:
+    - `200 OK`: PNG image
+    - `304 Not Modified`: client copy is current
+    - `404 Not Found`: supplier is not available for the user
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_payload(self, supplier_id: int) -> str:
+        supplier = (
+            Supplier.objects.select_related("contact").filter(pk=supplier_id).first()
+        )
+        if supplier is None:
+            raise Http404
+        return contact_payload(supplier.title, supplier.contact)
+
+    def get(self, request, supplier_id: int):
+        if supplier_id not in visible_supplier_ids(request.user):
+            raise Http404
+        serializer = SupplierQRImageSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+
+        payload = None
+        digest = get_supplier_qr_digest(supplier_id, **params)
+        if digest is None:
+            payload = self.get_payload(supplier_id)
+            digest = qr_digest(payload, **params)
+            remember_supplier_qr_digest(supplier_id, digest, **params)
+
+        etag = f'"{digest}"'
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            image = get_qr_store().get_many([digest]).get(digest)
+            if image is None:
+                payload = payload or self.get_payload(supplier_id)
+                image = render_many([payload], **params)[payload]
+            response = HttpResponse(image, content_type="image/png")
+        response["ETag"] = etag
+        response["Cache-Control"] = "private, no-cache"
+        return response
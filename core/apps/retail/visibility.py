@@ -0,0 +1,128 @@
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import (
+    Exists,
+    OuterRef,
+)
+
+from .models import Supplier
+
+
+# Two tiers:
+# - in-process LRU: user_id -> (version, ids), no network round trip on hit
+# - shared cache (Redis): per-user version counter and ids of each version
+# Invalidation bumps the shared version, so stale LRU entries of other
+# processes are detected by a single version GET.
+
+_lru: OrderedDict[int, tuple[int, frozenset[int]]] = OrderedDict()
+_lock = threading.Lock()
+
+
+def _version_key(user_id: int) -> str:
+    return f"retail:visible-suppliers:{user_id}:version"
+
+
+def _ids_key(user_id: int, version: int) -> str:
+    return f"retail:visible-suppliers:{user_id}:{version}"
+
+
+def _remember(user_id: int, version: int, ids: frozenset[int]) -> None:
+    with _lock:
+        _lru[user_id] = (version, ids)
+        _lru.move_to_end(user_id)
+        while len(_lru) > settings.RETAIL_VISIBILITY_LRU_SIZE:
+            _lru.popitem(last=False)
+
+
+def visibility_version(user) -> int:
+    """Changes whenever the set of visible suppliers of user changes."""
+
+    return cache.get(_version_key(user.pk), 0)
+
+
+def _local_ids(user_id: int, version: int) -> frozenset[int] | None:
+    with _lock:
+        local = _lru.get(user_id)
+    if local is not None and local[0] == version:
+        return local[1]
+    return None
+
+
+def _employee_ids(user_id: int):
+    return Supplier.employees.through.objects.filter(user_id=user_id).values_list(
+        "supplier_id", flat=True
+    )
+
+
+def visible_supplier_ids(user) -> frozenset[int]:
+    """Ids of suppliers where user is an employee, built lazily."""
+
+    version = visibility_version(user)
+    ids = _local_ids(user.pk, version)
+    if ids is not None:
+        return ids
+
+    ids = cache.get(_ids_key(user.pk, version))
+    if ids is None:
+        ids = frozenset(_employee_ids(user.pk))
+        cache.set(_ids_key(user.pk, version), ids, settings.RETAIL_VISIBILITY_TIMEOUT)
+    _remember(user.pk, version, ids)
+    return ids
+
+
+async def avisible_supplier_ids(user) -> frozenset[int]:
+    """`visible_supplier_ids` for async views."""
+
+    version = await cache.aget(_version_key(user.pk), 0)
+    ids = _local_ids(user.pk, version)
+    if ids is not None:
+        return ids
+
+    ids = await cache.aget(_ids_key(user.pk, version))
+    if ids is None:
+        ids = frozenset([pk async for pk in _employee_ids(user.pk)])
+        await cache.aset(
+            _ids_key(user.pk, version), ids, settings.RETAIL_VISIBILITY_TIMEOUT
+        )
+    _remember(user.pk, version, ids)
+    return ids
+
+
+def _employee_exists(user_id: int) -> Exists:
+    return Exists(
+        Supplier.employees.through.objects.filter(
+            supplier_id=OuterRef("pk"), user_id=user_id
+        )
+    )
+
+
+def filter_visible(queryset, user):
+    """
+    Filters suppliers by the cached id set instead of joining employees.
+    Sets above `RETAIL_VISIBILITY_IN_LIMIT` ids would bind as many
+    parameters, they are filtered by an EXISTS over employees instead.
+    """
+
+    ids = visible_supplier_ids(user)
+    if len(ids) > settings.RETAIL_VISIBILITY_IN_LIMIT:
+        return queryset.filter(_employee_exists(user.pk))
+    return queryset.filter(pk__in=ids)
+
+
+async def afilter_visible(queryset, user):
+    ids = await avisible_supplier_ids(user)
+    if len(ids) > settings.RETAIL_VISIBILITY_IN_LIMIT:
+        return queryset.filter(_employee_exists(user.pk))
+    return queryset.filter(pk__in=ids)
+
+
+def invalidate_visibility(user_ids) -> None:
+    for user_id in user_ids:
+        key = _version_key(user_id)
+        cache.add(key, 0, None)
+        cache.incr(key)
+        with _lock:
+            _lru.pop(user_id, None)
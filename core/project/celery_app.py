@@ -28,4 +28,20 @@ app.conf.beat_schedule = {
         "task": "core.apps.retail.tasks.decrease_debt",
         "schedule": crontab(minute=30, hour=6),
     },
+    "compact-debt-ledger-daily-at-3": {
+        "task": "core.apps.retail.tasks.compact_debt_ledger",
+        "schedule": crontab(minute=0, hour=3),
+    },
+    "maintain-partitions-daily-at-4": {
+        "task": "core.apps.retail.tasks.maintain_partitions",
+        "schedule": crontab(minute=0, hour=4),
+    },
+    "refresh-statistics-every-15-minutes": {
+        "task": "core.apps.retail.tasks.refresh_statistics",
+        "schedule": crontab(minute="*/15"),
+    },
+    "resume-debt-jobs-every-10-minutes": {
+        "task": "core.apps.retail.tasks.resume_debt_jobs",
+        "schedule": crontab(minute="*/10"),
+    },
 }
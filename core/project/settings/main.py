@@ -51,6 +51,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.apps.retail.middleware.RequestMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -175,6 +176,14 @@ EMAIL_FROM_DEFAULT = env("EMAIL_FROM_DEFAULT")
 import pytz
 
 
+# CACHE
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": env("CACHE_URL", default="redis://localhost:6379/1"),
+    }
+}
+
 # CELERY
 CELERY_BROKER_URL = env("CELERY_BROKER_URL", default="redis://localhost:6379/0")
 CELERY_RESULT_BACKEND = env("CELERY_RESULT_BACKEND", default="redis://localhost:6379/0")
@@ -184,6 +193,75 @@ CELERY_RESULT_SERIALIZER = env("CELERY_RESULT_SERIALIZER", default="json")
 CELERY_TIMEZONE = env("CELERY_TIMEZONE", default="UTC")
 SERVER_TIMEZONE = pytz.UTC
 
+# RETAIL
+RETAIL_DEBT_CHUNK_SIZE = env.int("RETAIL_DEBT_CHUNK_SIZE", default=5000)
+RETAIL_NETWORK_MAX_DEPTH = env.int("RETAIL_NETWORK_MAX_DEPTH", default=50)
+RETAIL_NETWORK_FETCH_SIZE = env.int("RETAIL_NETWORK_FETCH_SIZE", default=2000)
+RETAIL_PAGE_SIZE = env.int("RETAIL_PAGE_SIZE", default=50)
+RETAIL_MAX_PAGE_SIZE = env.int("RETAIL_MAX_PAGE_SIZE", default=500)
+RETAIL_EXPORT_CHUNK_SIZE = env.int("RETAIL_EXPORT_CHUNK_SIZE", default=1000)
+RETAIL_STATISTICS_TIMEOUT = env.int("RETAIL_STATISTICS_TIMEOUT", default=60 * 60)
+RETAIL_STATISTICS_LOCK_TIMEOUT = env.int("RETAIL_STATISTICS_LOCK_TIMEOUT", default=60)
+RETAIL_VISIBILITY_TIMEOUT = env.int("RETAIL_VISIBILITY_TIMEOUT", default=60 * 60)
+RETAIL_VISIBILITY_LRU_SIZE = env.int("RETAIL_VISIBILITY_LRU_SIZE", default=1024)
+RETAIL_VISIBILITY_IN_LIMIT = env.int("RETAIL_VISIBILITY_IN_LIMIT", default=1000)
+RETAIL_QR_WORKERS = env.int("RETAIL_QR_WORKERS", default=4)
+RETAIL_QR_POOL_THRESHOLD = env.int("RETAIL_QR_POOL_THRESHOLD", default=20)
+RETAIL_QR_CACHE_TIMEOUT = env.int("RETAIL_QR_CACHE_TIMEOUT", default=60 * 60 * 24)
+RETAIL_QR_STORE = env("RETAIL_QR_STORE", default="filesystem")  # or "cache"
+RETAIL_QR_CACHE_DIR = env("RETAIL_QR_CACHE_DIR", default=str(BASE_DIR / "var" / "qr"))
+RETAIL_QR_CACHE_SIZE = env.int("RETAIL_QR_CACHE_SIZE", default=10000)
+RETAIL_QR_MAIL_BATCH_SIZE = env.int("RETAIL_QR_MAIL_BATCH_SIZE", default=100)
+RETAIL_QR_BULK_MAX_ITEMS = env.int("RETAIL_QR_BULK_MAX_ITEMS", default=1000)
+RETAIL_BULK_MAX_ITEMS = env.int("RETAIL_BULK_MAX_ITEMS", default=5000)
+# paths of 200 levels of 10-digit ids still fit a btree index row
+RETAIL_SUPPLIER_MAX_LEVEL = env.int("RETAIL_SUPPLIER_MAX_LEVEL", default=200)
+RETAIL_RESPONSE_CACHE_TIMEOUT = env.int("RETAIL_RESPONSE_CACHE_TIMEOUT", default=600)
+RETAIL_DEBT_COMPACT_AFTER_DAYS = env.int("RETAIL_DEBT_COMPACT_AFTER_DAYS", default=31)
+RETAIL_PARTITIONS_AHEAD = env.int("RETAIL_PARTITIONS_AHEAD", default=3)  # months
+RETAIL_PARTITIONS_RETAIN = env.int("RETAIL_PARTITIONS_RETAIN", default=24)  # months
+RETAIL_PARTITIONS_ARCHIVE_SCHEMA = env(
+    "RETAIL_PARTITIONS_ARCHIVE_SCHEMA", default="retail_archive"
+)
+RETAIL_HISTORY_MAX_DAYS = env.int("RETAIL_HISTORY_MAX_DAYS", default=366)
+RETAIL_DEBT_JOB_STALE_AFTER = env.int("RETAIL_DEBT_JOB_STALE_AFTER", default=15 * 60)
+RETAIL_DEBT_LOCK_TIMEOUT = env.int("RETAIL_DEBT_LOCK_TIMEOUT", default=6 * 60 * 60)
+RETAIL_DEBT_SHARDS = env.int("RETAIL_DEBT_SHARDS", default=4)  # 1 - one task
+# counts of admin and API listings from this many rows are PostgreSQL estimates
+RETAIL_ESTIMATED_COUNT_THRESHOLD = env.int(
+    "RETAIL_ESTIMATED_COUNT_THRESHOLD", default=100000
+)
+RETAIL_COUNT_CACHE_TIMEOUT = env.int("RETAIL_COUNT_CACHE_TIMEOUT", default=30)
+RETAIL_ADMIN_FILTER_TIMEOUT = env.int("RETAIL_ADMIN_FILTER_TIMEOUT", default=60 * 60)
+RETAIL_METRICS_ENABLED = env.bool("RETAIL_METRICS_ENABLED", default=True)
+RETAIL_METRICS_WINDOW = env.int("RETAIL_METRICS_WINDOW", default=1000)  # per endpoint
+# SQL queries allowed per request by URL name, "name=count,..." in env;
+# reads only, writes are budgeted as "name:METHOD", e.g. "node-detail:PATCH"
+RETAIL_QUERY_BUDGETS = env.dict(
+    "RETAIL_QUERY_BUDGETS",
+    cast={"value": int},
+    default={
+        "node-list": 10,
+        "node-detail": 10,
+        "product-list": 5,
+        "product-detail": 5,
+        "statistics": 12,
+        "suppliers-by-product-list": 10,
+        "network-subtree": 10,
+        "network-ancestors": 10,
+        "supplier-debt": 5,
+        "supplier-history": 5,
+        "debt-job": 5,
+        "async-suppliers": 10,
+        "async-products": 5,
+        "async-statistics": 12,
+        "async-suppliers-by-product": 10,
+        "admin:retail_supplier_changelist": 20,
+    },
+)
+# raise QueryBudgetExceeded instead of logging, for tests
+RETAIL_QUERY_BUDGET_RAISE = env.bool("RETAIL_QUERY_BUDGET_RAISE", default=False)
+
 # UNFOLD
 UNFOLD = {
     "SITE_TITLE": "My Admin Dashboard",
@@ -23,23 +23,39 @@ from django.urls import (
 from django.views.generic.base import RedirectView
 from rest_framework.routers import DefaultRouter
 
+from core.apps.retail.async_views import (
+    AsyncDebtAboveAverageListView,
+    AsyncProductListView,
+    AsyncSupplierByProductListView,
+    AsyncSupplierListView,
+)
 from core.apps.retail.views import (
     DebtAboveAverageListView,
+    DebtJobRetrieveView,
     ProductViewSet,
+    RequestMetricsAPIView,
     SupplierByProductViewSet,
+    SupplierDebtBalanceAPIView,
+    SupplierHistoryAPIView,
+    SupplierNetworkViewSet,
     SupplierQRCodeAPIView,
+    SupplierQRCodeBulkAPIView,
+    SupplierQRImageAPIView,
     SupplierViewSet,
+    TaskMetricsAPIView,
 )
 
 from .yasg import urlpatterns as doc_urls
 
 
 router = DefaultRouter()
-router.register(r"suppliers", SupplierViewSet, basename="node")
-router.register(r"products", ProductViewSet, basename="product")
+# before "suppliers", otherwise "by_product" is taken as a supplier pk
 router.register(
     r"suppliers/by_product", SupplierByProductViewSet, basename="suppliers-by-product"
 )
+router.register(r"suppliers", SupplierViewSet, basename="node")
+router.register(r"network", SupplierNetworkViewSet, basename="network")
+router.register(r"products", ProductViewSet, basename="product")
 
 
 urlpatterns = [
@@ -49,6 +65,44 @@ urlpatterns = [
     path("api/", include(router.urls)),
     path("api/statistics/", DebtAboveAverageListView.as_view(), name="statistics"),
     path("api/generate-qr/", SupplierQRCodeAPIView.as_view(), name="generate-qr"),
+    path(
+        "api/generate-qr/bulk/",
+        SupplierQRCodeBulkAPIView.as_view(),
+        name="generate-qr-bulk",
+    ),
+    path(
+        "api/qr/<int:supplier_id>/",
+        SupplierQRImageAPIView.as_view(),
+        name="supplier-qr",
+    ),
+    path(
+        "api/debt/<int:supplier_id>/",
+        SupplierDebtBalanceAPIView.as_view(),
+        name="supplier-debt",
+    ),
+    path("api/debt/jobs/<int:pk>/", DebtJobRetrieveView.as_view(), name="debt-job"),
+    path("api/metrics/", RequestMetricsAPIView.as_view(), name="metrics"),
+    path("api/metrics/tasks/", TaskMetricsAPIView.as_view(), name="task-metrics"),
+    path(
+        "api/history/<int:supplier_id>/",
+        SupplierHistoryAPIView.as_view(),
+        name="supplier-history",
+    ),
+    # async read endpoints, served natively by the ASGI application
+    path(
+        "api/async/suppliers/", AsyncSupplierListView.as_view(), name="async-suppliers"
+    ),
+    path(
+        "api/async/suppliers/by_product/",
+        AsyncSupplierByProductListView.as_view(),
+        name="async-suppliers-by-product",
+    ),
+    path(
+        "api/async/statistics/",
+        AsyncDebtAboveAverageListView.as_view(),
+        name="async-statistics",
+    ),
+    path("api/async/products/", AsyncProductListView.as_view(), name="async-products"),
 ]
 
 urlpatterns += doc_urls